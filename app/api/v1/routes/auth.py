@@ -23,11 +23,9 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 @router.post("/register", response_model=APIResponse[LoginResponse])
 @standardize_response
 def register_user(*, db: Session = Depends(get_db), user_in: UserCreate):
-    print("Incoming request:", user_in.model_dump())
     user_exists = user_crud.get_by_phone(db, phone_number=user_in.phone_number)
     if user_exists:
         raise HTTPException(status_code=400, detail="Phone Number already exists")
-    print("Incoming request",user_in)
     if user_in.role == UserRole.official:
         missing_fields = []
         if not user_in.sponsor_name:
@@ -99,16 +97,12 @@ def login_user(user_in: UserLogin, db: Session = Depends(get_db)):
 @router.post("/admin/login", response_model=APIResponse[AdminLoginResponse])
 @standardize_response
 def admin_login(db: Session = Depends(get_db),form_data: OAuth2PasswordRequestForm = Depends()):
-    print("Admin login attempt with username:", form_data.username)
     admin = user_crud.authenticate_admin(db, username=form_data.username, password=form_data.password)
     if not admin:
-        print("Admin authentication failed")
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    print("Admin authenticated successfully. ID:", admin.id, "Role:", admin.role)
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(admin.id, expires_delta=access_token_expires)
-    print("Created access token:", access_token)
     response_data = AdminLoginResponse(access_token=access_token, token_type="bearer", user=admin)
     return success_response(
         data=response_data,
@@ -0,0 +1,101 @@
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.crud.campaign_crud import campaign_crud
+from app.database.session import get_db
+from app.dependencies.auth_dependency import get_current_user
+from app.models.user import User, UserRole
+from app.schemas.api_response import success_response, APIResponse
+from app.schemas.campaign_schema import CampaignCreate, CampaignOut, CampaignPreview, CampaignSegment
+from app.services.campaign_service import compile_segment, campaign_targets
+
+router = APIRouter(prefix="/campaigns", tags=["Campaigns"])
+
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Only admins can manage campaigns")
+    return current_user
+
+
+@router.post("/preview", response_model=APIResponse[CampaignPreview])
+def preview_campaign_audience(
+    segment: CampaignSegment,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Count the users a segment matches right now"""
+    audience = campaign_crud.count_audience(db, compile_segment(segment))
+    return success_response({"audience": audience}, "Audience counted successfully")
+
+
+@router.post("/", response_model=APIResponse[CampaignOut])
+def create_campaign(
+    request: CampaignCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Create a notification campaign for a segment of users (admin only)
+
+    Unless `start` is false the campaign starts right away; it is sent in the background,
+    poll GET /campaigns/{campaign_id} for progress and delivery stats.
+    """
+    campaign = campaign_crud.create(
+        db,
+        obj_in=request,
+        created_by=current_user.id,
+        rate_per_minute=request.rate_per_minute or settings.campaign_default_rate_per_minute
+    )
+    if request.start:
+        campaign = campaign_crud.start(db, campaign, total_targets=campaign_crud.count_audience(db, campaign_targets(campaign)))
+    return success_response(campaign_crud.to_out(db, campaign), "Campaign created successfully")
+
+
+@router.get("/", response_model=APIResponse[list[CampaignOut]])
+def get_campaigns(
+    current_page: int = Query(1, ge=1, description="Current page number"),
+    limit: int = Query(25, ge=1, le=25),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    skip = (current_page - 1) * limit
+    items = [campaign_crud.to_out(db, campaign) for campaign in campaign_crud.get_all(db, skip=skip, limit=limit)]
+    total_pages = math.ceil(campaign_crud.count_all(db) / limit)
+    return success_response(items, "Campaigns fetched successfully", total_pages=total_pages)
+
+
+@router.get("/{campaign_id}", response_model=APIResponse[CampaignOut])
+def get_campaign(campaign_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    """Get a campaign with its progress and delivery stats"""
+    campaign = campaign_crud.get(db, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return success_response(campaign_crud.to_out(db, campaign), "Campaign fetched successfully")
+
+
+@router.post("/{campaign_id}/start", response_model=APIResponse[CampaignOut])
+def start_campaign(campaign_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    """Start a draft campaign or resume a paused one from where it stopped"""
+    campaign = campaign_crud.get(db, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if campaign.status not in ("draft", "paused", "failed"):
+        raise HTTPException(status_code=400, detail=f"Campaign is {campaign.status}")
+    campaign = campaign_crud.start(db, campaign, total_targets=campaign_crud.count_audience(db, campaign_targets(campaign)))
+    return success_response(campaign_crud.to_out(db, campaign), "Campaign started")
+
+
+@router.post("/{campaign_id}/pause", response_model=APIResponse[CampaignOut])
+def pause_campaign(campaign_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    """Pause a running campaign after its current batch"""
+    campaign = campaign_crud.get(db, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    if campaign.status != "running":
+        raise HTTPException(status_code=400, detail=f"Campaign is {campaign.status}")
+    campaign = campaign_crud.pause(db, campaign)
+    return success_response(campaign_crud.to_out(db, campaign), "Campaign paused")
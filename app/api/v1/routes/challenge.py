@@ -1,24 +1,30 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
 from typing import List, Optional
 
 from app.core.decorators import standardize_response
 from app.database.session import get_db
 from app.dependencies.auth_dependency import get_current_user, get_current_user_optional
 from app.models.user import User
-from app.models.challenge import ChallengeType, ChallengeStatus, UserChallenge
+from app.models.challenge import ChallengeType, ChallengeStatus
+from app.models.challenge_ranking import LeaderboardMetric
 from app.crud.challenge_crud import challenge_crud
 from app.crud.reward_crud import reward_crud
+from app.services.challenge_catalog import challenge_catalog
+from app.services.challenge_leaderboard import challenge_leaderboard
+from app.services.challenge_progress_sweep import challenge_progress_sweep
 from app.schemas.api_response import success_response, APIResponse
 from app.schemas.challenge_schema import (
     ChallengeCreate, ChallengeUpdate, ChallengeRead,
     UserChallengeCreate, UserChallengeRead, UserChallengeUpdate,
-    ChallengeStatsResponse, RewardSummaryResponse
+    ChallengeStatsResponse, RewardSummaryResponse, LeaderboardEntry, LeaderboardRankResponse
 )
 import math
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/challenges", tags=["Challenges"])
 
 @router.post("/", response_model=APIResponse[ChallengeRead])
@@ -62,60 +68,12 @@ def get_all_challenges(
     if include_inactive and current_user.role.value != "admin":
         include_inactive = False
     
-    # Get all challenges
     skip = (current_page - 1) * limit
-    challenges = challenge_crud.get_all_challenges(db=db, skip=skip, limit=limit, include_inactive=include_inactive)
-    total_items = challenge_crud.count_all_challenges(db=db, include_inactive=include_inactive)
+    rows, total_items = challenge_crud.get_challenges_with_participation(
+        db=db, user_id=current_user.id, include_inactive=include_inactive, skip=skip, limit=limit
+    )
     total_pages = math.ceil(total_items / limit) if limit else 1
-    
-    # Get user's participation status for these challenges
-    challenge_ids = [c.id for c in challenges]
-    user_challenges = db.execute(
-        select(UserChallenge).where(
-            and_(UserChallenge.user_id == current_user.id, 
-                 UserChallenge.challenge_id.in_(challenge_ids))
-        )
-    ).scalars().all()
-    
-    # Create a mapping of challenge_id -> user_challenge
-    user_challenge_map = {uc.challenge_id: uc for uc in user_challenges}
-    
-    # Create flattened response structure
-    flattened_data = []
-    for challenge in challenges:
-        user_challenge = user_challenge_map.get(challenge.id)
-        
-        flattened_item = {
-            # Challenge basic info
-            "id": challenge.id,
-            "title": challenge.title,
-            "description": challenge.description,
-            "type": challenge.type.value,
-            "duration": challenge.duration,
-            "duration_type": challenge.duration_type.value,
-            "reward_time": challenge.reward_time,
-            "reward_time_type": challenge.reward_time_type,
-            "is_active": challenge.is_active,
-            "created_at": challenge.created_at.isoformat(),
-            "updated_at": challenge.updated_at.isoformat(),
-            "duration_display_text": challenge.duration_display_text,
-            "reward_display_text": challenge.reward_display_text,
-            
-            # User progress info (if user has joined)
-            "user_challenge_id": user_challenge.id if user_challenge else None,
-            "status": user_challenge.status.value if user_challenge else "pending",
-            "current_progress": user_challenge.current_progress if user_challenge else 0,
-            "progress_percentage": user_challenge.progress_percentage if user_challenge else 0.0,
-            "progress_display_text": user_challenge.progress_display_text if user_challenge else f"0/{challenge.duration} {challenge.duration_type.value}{'s' if challenge.duration != 1 else ''}",
-            "remaining_actions": user_challenge.remaining_actions if user_challenge else challenge.duration,
-            "started_at": user_challenge.started_at.isoformat() if user_challenge else None,
-            "completed_at": user_challenge.completed_at.isoformat() if user_challenge and user_challenge.completed_at else None,
-            "last_progress_date": user_challenge.last_progress_date.isoformat() if user_challenge and user_challenge.last_progress_date else None,
-            "last_progress_hour": user_challenge.last_progress_hour if user_challenge else None,
-            "is_completed": user_challenge.is_completed if user_challenge else False,
-            "is_user_active": user_challenge.is_active if user_challenge else False
-        }
-        flattened_data.append(flattened_item)
+    flattened_data = [challenge_crud.to_flat(challenge, user_challenge) for challenge, user_challenge in rows]
     
     return success_response(
         data=flattened_data,
@@ -133,64 +91,17 @@ def get_challenges_by_type(
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Get all active challenges by type - Public API with optional user participation status"""
-    # Get all active challenges of this type
     skip = (current_page - 1) * limit
-    challenges = challenge_crud.get_challenges_by_type(db=db, challenge_type=challenge_type, skip=skip, limit=limit)
-    total_items = challenge_crud.count_challenges_by_type(db=db, challenge_type=challenge_type)
+    rows, total_items = challenge_crud.get_challenges_with_participation(
+        db=db, user_id=current_user.id if current_user else None, challenge_type=challenge_type, skip=skip, limit=limit
+    )
     total_pages = math.ceil(total_items / limit) if limit else 1
     
-    # Get user's participation status for these challenges (only if user is authenticated)
-    user_challenge_map = {}
-    if current_user:
-        challenge_ids = [c.id for c in challenges]
-        user_challenges = db.execute(
-            select(UserChallenge).where(
-                and_(UserChallenge.user_id == current_user.id, 
-                     UserChallenge.challenge_id.in_(challenge_ids))
-            )
-        ).scalars().all()
-        
-        # Create a mapping of challenge_id -> user_challenge
-        user_challenge_map = {uc.challenge_id: uc for uc in user_challenges}
-    
-    # Create flattened response structure
+    # User progress info is only there if the user is authenticated and has joined
     flattened_data = []
-    for challenge in challenges:
-        user_challenge = user_challenge_map.get(challenge.id) if current_user else None
-        
-        flattened_item = {
-            # Challenge basic info (always available)
-            "id": challenge.id,
-            "title": challenge.title,
-            "description": challenge.description,
-            "type": challenge.type.value,
-            "duration": challenge.duration,
-            "duration_type": challenge.duration_type.value,
-            "reward_time": challenge.reward_time,
-            "reward_time_type": challenge.reward_time_type,
-            "is_active": challenge.is_active,
-            "created_at": challenge.created_at.isoformat(),
-            "updated_at": challenge.updated_at.isoformat(),
-            "duration_display_text": challenge.duration_display_text,
-            "reward_display_text": challenge.reward_display_text,
-            
-            # User progress info (only if user is authenticated and has joined)
-            "user_challenge_id": user_challenge.id if user_challenge else None,
-            "status": user_challenge.status.value if user_challenge else "pending",
-            "current_progress": user_challenge.current_progress if user_challenge else 0,
-            "progress_percentage": user_challenge.progress_percentage if user_challenge else 0.0,
-            "progress_display_text": user_challenge.progress_display_text if user_challenge else f"0/{challenge.duration} {challenge.duration_type.value}{'s' if challenge.duration != 1 else ''}",
-            "remaining_actions": user_challenge.remaining_actions if user_challenge else challenge.duration,
-            "started_at": user_challenge.started_at.isoformat() if user_challenge else None,
-            "completed_at": user_challenge.completed_at.isoformat() if user_challenge and user_challenge.completed_at else None,
-            "last_progress_date": user_challenge.last_progress_date.isoformat() if user_challenge and user_challenge.last_progress_date else None,
-            "last_progress_hour": user_challenge.last_progress_hour if user_challenge else None,
-            "is_completed": user_challenge.is_completed if user_challenge else False,
-            "is_user_active": user_challenge.is_active if user_challenge else False,
-            
-            # Indicate if user data is available
-            "is_authenticated": current_user is not None
-        }
+    for challenge, user_challenge in rows:
+        flattened_item = challenge_crud.to_flat(challenge, user_challenge)
+        flattened_item["is_authenticated"] = current_user is not None
         flattened_data.append(flattened_item)
     
     return success_response(
@@ -212,48 +123,18 @@ def get_my_challenges(
     """Get current user's challenges with flattened response"""
     skip = (current_page - 1) * limit
     user_challenges = challenge_crud.get_user_challenges(
-        db=db, user_id=current_user.id, status=status, skip=skip, limit=limit
+        db=db, user_id=current_user.id, status=status, skip=skip, limit=limit, with_challenge=False
     )
     total_items = challenge_crud.count_user_challenges(db=db, user_id=current_user.id, status=status)
     total_pages = math.ceil(total_items / limit) if limit else 1
+    challenges = challenge_catalog.get_many(db, {uc.challenge_id for uc in user_challenges})
     
-    # Create flattened response structure
     flattened_data = []
     for uc in user_challenges:
         try:
-            flattened_item = {
-                # Challenge basic info (from challenge)
-                "id": uc.challenge.id,
-                "title": uc.challenge.title,
-                "description": uc.challenge.description,
-                "type": uc.challenge.type.value,
-                "duration": uc.challenge.duration,
-                "duration_type": uc.challenge.duration_type.value,
-                "reward_time": uc.challenge.reward_time,
-                "reward_time_type": uc.challenge.reward_time_type,
-                "is_active": uc.challenge.is_active,
-                "created_at": uc.challenge.created_at.isoformat(),
-                "updated_at": uc.challenge.updated_at.isoformat(),
-                "duration_display_text": uc.challenge.duration_display_text,
-                "reward_display_text": uc.challenge.reward_display_text,
-                
-                # User progress info (from user_challenge)
-                "user_challenge_id": uc.id,
-                "status": uc.status.value,
-                "current_progress": uc.current_progress,
-                "progress_percentage": uc.progress_percentage,
-                "progress_display_text": uc.progress_display_text,
-                "remaining_actions": uc.remaining_actions,
-                "started_at": uc.started_at.isoformat(),
-                "completed_at": uc.completed_at.isoformat() if uc.completed_at else None,
-                "last_progress_date": uc.last_progress_date.isoformat() if uc.last_progress_date else None,
-                "last_progress_hour": uc.last_progress_hour,
-                "is_completed": uc.is_completed,
-                "is_user_active": uc.is_active
-            }
-            flattened_data.append(flattened_item)
+            flattened_data.append(challenge_crud.to_flat(challenges[uc.challenge_id], uc))
         except Exception as e:
-            print(f"Error flattening user challenge {uc.id}: {e}")
+            logger.warning("Skipping unflattenable user challenge", extra={"user_challenge_id": uc.id, "error": str(e)})
             continue
     
     return success_response(
@@ -306,6 +187,39 @@ def get_my_rewards(
     )
 
 
+@router.get("/leaderboard", response_model=APIResponse[List[LeaderboardEntry]])
+@standardize_response
+def get_leaderboard(
+    metric: LeaderboardMetric = Query(LeaderboardMetric.completions),
+    challenge_type: Optional[ChallengeType] = Query(None, description="Leave out for the global leaderboard"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Top users by completions, current streak or progress, per challenge type or global"""
+    entries = challenge_leaderboard.top(db=db, challenge_type=challenge_type, metric=metric, limit=limit)
+    return success_response(
+        data=entries,
+        message="Leaderboard retrieved successfully"
+    )
+
+
+@router.get("/leaderboard/me", response_model=APIResponse[LeaderboardRankResponse])
+@standardize_response
+def get_my_leaderboard_rank(
+    metric: LeaderboardMetric = Query(LeaderboardMetric.completions),
+    challenge_type: Optional[ChallengeType] = Query(None, description="Leave out for the global leaderboard"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Current user's score and rank on a leaderboard"""
+    rank = challenge_leaderboard.rank(db=db, user_id=current_user.id, challenge_type=challenge_type, metric=metric)
+    return success_response(
+        data=LeaderboardRankResponse(**rank),
+        message="Leaderboard rank retrieved successfully"
+    )
+
+
 @router.get("/{challenge_id}", response_model=APIResponse[ChallengeRead])
 @standardize_response
 def get_challenge_by_id(
@@ -313,7 +227,7 @@ def get_challenge_by_id(
     db: Session = Depends(get_db)
 ):
     """Get a specific challenge by ID"""
-    challenge = challenge_crud.get_challenge_by_id(db=db, challenge_id=challenge_id)
+    challenge = challenge_catalog.get(db, challenge_id)
     
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
@@ -377,37 +291,7 @@ def join_challenge(
         db=db, user_id=current_user.id, challenge_id=challenge_id
     )
     
-    # Create flattened response structure
-    flattened_data = {
-        # Challenge basic info
-        "id": user_challenge.challenge.id,
-        "title": user_challenge.challenge.title,
-        "description": user_challenge.challenge.description,
-        "type": user_challenge.challenge.type.value,
-        "duration": user_challenge.challenge.duration,
-        "duration_type": user_challenge.challenge.duration_type.value,
-        "reward_time": user_challenge.challenge.reward_time,
-        "reward_time_type": user_challenge.challenge.reward_time_type,
-        "is_active": user_challenge.challenge.is_active,
-        "created_at": user_challenge.challenge.created_at.isoformat(),
-        "updated_at": user_challenge.challenge.updated_at.isoformat(),
-        "duration_display_text": user_challenge.challenge.duration_display_text,
-        "reward_display_text": user_challenge.challenge.reward_display_text,
-        
-        # User progress info
-        "user_challenge_id": user_challenge.id,
-        "status": user_challenge.status.value,
-        "current_progress": user_challenge.current_progress,
-        "progress_percentage": user_challenge.progress_percentage,
-        "progress_display_text": user_challenge.progress_display_text,
-        "remaining_actions": user_challenge.remaining_actions,
-        "started_at": user_challenge.started_at.isoformat(),
-        "completed_at": user_challenge.completed_at.isoformat() if user_challenge.completed_at else None,
-        "last_progress_date": user_challenge.last_progress_date.isoformat() if user_challenge.last_progress_date else None,
-        "last_progress_hour": user_challenge.last_progress_hour,
-        "is_completed": user_challenge.is_completed,
-        "is_user_active": user_challenge.is_active
-    }
+    flattened_data = challenge_crud.to_flat(challenge_catalog.get(db, challenge_id), user_challenge)
     
     return success_response(
         data=flattened_data,
@@ -479,60 +363,14 @@ def update_challenge_progress(
     current_user: User = Depends(get_current_user)
 ):
     """Update challenge progress manually (action-based) - returns flattened response"""
-    user_challenge = challenge_crud.get_user_challenge_by_id(db=db, user_challenge_id=user_challenge_id)
-    if not user_challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
-    
-    if user_challenge.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You can only update your own challenges")
-    
-    # Call the new action-based update_progress method
-    result = user_challenge.update_progress()
-    
-    if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["message"])
-    
-    # Save changes to database
-    db.commit()
-    db.refresh(user_challenge)
-    if user_challenge.status == ChallengeStatus.completed:
-        challenge_crud.create_challenge_reward(db, user_challenge)
+    user_challenge, challenge, result = challenge_crud.update_challenge_progress(
+        db=db, user_challenge_id=user_challenge_id, user_id=current_user.id
+    )
     
-    # Create flattened response structure
-    flattened_data = {
-        # Challenge basic info
-        "id": user_challenge.challenge.id,
-        "title": user_challenge.challenge.title,
-        "description": user_challenge.challenge.description,
-        "type": user_challenge.challenge.type.value,
-        "duration": user_challenge.challenge.duration,
-        "duration_type": user_challenge.challenge.duration_type.value,
-        "reward_time": user_challenge.challenge.reward_time,
-        "reward_time_type": user_challenge.challenge.reward_time_type,
-        "is_active": user_challenge.challenge.is_active,
-        "created_at": user_challenge.challenge.created_at.isoformat(),
-        "updated_at": user_challenge.challenge.updated_at.isoformat(),
-        "duration_display_text": user_challenge.challenge.duration_display_text,
-        "reward_display_text": user_challenge.challenge.reward_display_text,
-        
-        # User progress info
-        "user_challenge_id": user_challenge.id,
-        "status": user_challenge.status.value,
-        "current_progress": user_challenge.current_progress,
-        "progress_percentage": user_challenge.progress_percentage,
-        "progress_display_text": user_challenge.progress_display_text,
-        "remaining_actions": user_challenge.remaining_actions,
-        "started_at": user_challenge.started_at.isoformat(),
-        "completed_at": user_challenge.completed_at.isoformat() if user_challenge.completed_at else None,
-        "last_progress_date": user_challenge.last_progress_date.isoformat() if user_challenge.last_progress_date else None,
-        "last_progress_hour": user_challenge.last_progress_hour,
-        "is_completed": user_challenge.is_completed,
-        "is_user_active": user_challenge.is_active,
-        
-        # Additional progress info
-        "completed": result.get("completed", False),
-        "message": result["message"]
-    }
+    flattened_data = challenge_crud.to_flat(challenge, user_challenge)
+    # Additional progress info
+    flattened_data["completed"] = result.get("completed", False)
+    flattened_data["message"] = result["message"]
     
     return success_response(
         data=flattened_data,
@@ -550,9 +388,9 @@ def update_all_challenges_progress(
     if current_user.role.value != "admin":
         raise HTTPException(status_code=403, detail="Only admins can trigger global progress updates")
     
-    completed_count = challenge_crud.update_all_active_challenges_progress(db=db)
+    stats = challenge_progress_sweep.run()
     
     return success_response(
-        data={"completed_challenges": completed_count},
-        message=f"Updated all active challenges. {completed_count} challenges completed."
+        data={"completed_challenges": stats["completed"], **stats},
+        message=f"Updated all active challenges. {stats['completed']} challenges completed."
     )
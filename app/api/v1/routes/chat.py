@@ -1,6 +1,7 @@
 from typing import List, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, Path
 from typing import List
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from app.core.decorators import standardize_response
 from app.core.websocket_manager import manager
@@ -10,8 +11,13 @@ from app.database.session import get_db
 from app.dependencies.auth_dependency import get_current_user, check_user_permissions
 from app.models.user import User, UserRole
 from app.schemas.api_response import success_response, APIResponse
-from app.schemas.chat_schema import ChatRoomCreate, MessageCreate, ChatRoomRead, MessageRead, ChatRoomWithUser, ChatRoomWithMessages, MessageWithDetails
+from app.schemas.chat_schema import ChatRoomCreate, MessageCreate, ChatRoomRead, MessageRead, ChatRoomWithUser, ChatRoomWithMessages, MessageWithDetails, ChatInboxPage, ChatSearchPage
+from app.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
 import math
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -51,19 +57,17 @@ def create_chat_room(*, db: Session = Depends(get_db), current_user: User = Depe
             expert = user_crud.get_by_phone(db, phone_number="+923158244152")
         except Exception as e:
             # If anything goes wrong (e.g., user table empty) fallback to load-balancer
-            print(f"Phone-based expert mapping failed: {e}")
+            logger.warning("Phone-based expert mapping failed", extra={"error": str(e)})
             expert = None
 
         # Fallback to least-busy expert selection if mapping didn’t return an expert
         if expert is None:
-            print(f"Finding expert for user {current_user.username} (ID: {current_user.id}) via load balancer")
-            expert = chat_room_crud.find_least_busy_expert(db)
+            expert = chat_room_crud.find_least_busy_expert(db, online_ids=manager.online_user_ids())
 
         if expert:
-            print(f"Assigned expert {expert.username} (ID: {expert.id}) to chat room")
             room_data.expert_id = expert.id
         else:
-            print("No expert found to assign to chat room")
+            logger.warning("No expert found to assign to chat room", extra={"user_id": current_user.id})
     
     # Create the chat room
     chat_room = chat_room_crud.create_chat_room(db, obj_in=room_data)
@@ -130,6 +134,75 @@ def my_chat_rooms(
         total_pages=total_pages
     )
 
+@router.get("/inbox", response_model=APIResponse[ChatInboxPage])
+@standardize_response
+def get_inbox(
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(25, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_user_permissions(UserRole.admin, UserRole.expert))
+):
+    """Get the inbox (all active rooms for admins, assigned rooms for experts) with last message and unread counts"""
+    before = None
+    if cursor:
+        updated_at, room_id = decode_cursor(cursor, 2)
+        before = (datetime.fromisoformat(updated_at), room_id)
+
+    expert_id = current_user.id if current_user.role == UserRole.expert else None
+    items = chat_room_crud.get_inbox(db, viewer_id=current_user.id, expert_id=expert_id, before=before, limit=limit)
+
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1]["updated_at"], items[-1]["id"])
+
+    return success_response(
+        data={"items": items, "next_cursor": next_cursor},
+        message="Inbox retrieved successfully"
+    )
+
+
+@router.get("/search", response_model=APIResponse[ChatSearchPage])
+@standardize_response
+def search_messages(
+    q: str = Query(..., min_length=2, max_length=200, description="Words to search for"),
+    room_id: Optional[int] = Query(None),
+    participant_id: Optional[int] = Query(None, description="Only rooms this user or expert takes part in"),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(25, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_user_permissions(UserRole.admin, UserRole.expert))
+):
+    """Search chat history (all rooms for admins, assigned rooms for experts), best match first"""
+    after = None
+    if cursor:
+        rank, message_id = decode_cursor(cursor, 2)
+        after = (rank, message_id)
+
+    expert_id = current_user.id if current_user.role == UserRole.expert else None
+    items = message_crud.search_messages(
+        db,
+        query=q,
+        expert_id=expert_id,
+        room_id=room_id,
+        participant_id=participant_id,
+        date_from=date_from,
+        date_to=date_to,
+        after=after,
+        limit=limit,
+    )
+
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1]["rank"], items[-1]["id"])
+
+    return success_response(
+        data={"items": items, "next_cursor": next_cursor},
+        message="Messages retrieved successfully"
+    )
+
+
 @router.get("/rooms/{room_id}", response_model=APIResponse[ChatRoomWithMessages])
 @standardize_response
 def get_chat_room(
@@ -159,19 +232,58 @@ def get_chat_room(
     # Get paginated messages with product/office details
     skip = (current_page - 1) * limit
     messages_with_details = message_crud.get_messages_with_details(db, room_id=room_id, skip=skip, limit=limit)
-    total_messages = message_crud.count_messages_in_room(db, room_id=room_id)
+    watermarks = message_crud.get_read_watermarks(db, room_id=room_id)
+    message_crud.apply_read_state(messages_with_details, watermarks)
+    total_db_messages = message_crud.count_messages_in_room(db, room_id=room_id)
+
+    # Older history continues in the archive once the database rows run out
+    archived_messages = []
+    if len(messages_with_details) < limit:
+        archived_messages = message_crud.get_archived_messages(
+            room_id=room_id,
+            skip=max(0, skip - total_db_messages),
+            limit=limit - len(messages_with_details),
+            watermarks=watermarks,
+        )
+    total_messages = total_db_messages + message_crud.count_archived_messages(room_id=room_id)
     total_pages = math.ceil(total_messages / limit) if limit else 1
     
     # Replace the messages in chat_room with paginated detailed messages
     chat_room.messages = messages_with_details
+    data = chat_room
+    if archived_messages:
+        data = jsonable_encoder(chat_room)
+        data["messages"].extend(archived_messages)
     
     return success_response(
-        data=chat_room,
+        data=data,
         message="Chat room retrieved successfully",
         total_pages=total_pages
     )
 
 
+@router.post("/rooms/{room_id}/close", response_model=APIResponse[ChatRoomRead])
+@standardize_response
+def close_chat_room(
+    room_id: int = Path(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_user_permissions(UserRole.admin, UserRole.expert))
+):
+    """Close a chat room (admin, or the assigned expert)"""
+    chat_room = chat_room_crud.get_chat_room(db, room_id=room_id)
+    if not chat_room:
+        raise HTTPException(status_code=404, detail="Chat room not found")
+
+    if current_user.role != UserRole.admin and current_user.id != chat_room.expert_id:
+        raise HTTPException(status_code=403, detail="You don't have access to this chat room")
+
+    chat_room = chat_room_crud.close_chat_room(db, room_id=room_id)
+    return success_response(
+        data=chat_room,
+        message="Chat room closed successfully"
+    )
+
+
 @router.get("/rooms", response_model=APIResponse[List[ChatRoomRead]])
 @standardize_response
 def get_chat_rooms(
@@ -197,10 +309,27 @@ def get_chat_rooms(
     )
 
 
+@router.get("/admin/connections", response_model=APIResponse[dict])
+@standardize_response
+def get_connection_stats(
+    current_user: User = Depends(check_user_permissions(UserRole.admin))
+):
+    """Get open chat socket counts and approximate memory use for this worker"""
+    return success_response(
+        data=manager.connection_stats(),
+        message="Connection stats retrieved successfully"
+    )
+
+
 # WebSocket endpoint for real-time chat
 @router.websocket("/ws/{room_id}/{user_id}")
 async def chat_endpoint(websocket: WebSocket, room_id: int, user_id: int, db: Session = Depends(get_db)):
     """WebSocket endpoint for real-time chat"""
+    # Refuse new sockets when this worker is full so clients retry on another one
+    if manager.at_capacity():
+        await websocket.close(code=1013, reason="Server is at capacity")
+        return
+
     # Get user and validate
     user = user_crud.get_user_by_id(db, user_id=user_id)
     if not user:
@@ -214,28 +343,24 @@ async def chat_endpoint(websocket: WebSocket, room_id: int, user_id: int, db: Se
         return
     
     # Validate user access to the chat room
-    print(f"User {user.id} (role: {user.role}) attempting to access room {room_id}")
-    print(f"Room details - User ID: {chat_room.user_id}, Expert ID: {chat_room.expert_id}")
-    
     if user.role != UserRole.admin and user.id != chat_room.user_id and user.id != chat_room.expert_id:
-        print(f"Access denied: User {user.id} (role: {user.role}) does not have permission for room {room_id}")
+        logger.warning("Chat room access denied", extra={"user_id": user.id, "room_id": room_id})
         await websocket.close(code=1008, reason="Access denied to this chat room")
         return
-    print(f"Access granted: User {user.id} (role: {user.role}) has permission for room {room_id}")
     
     # Connect to the room
-    await manager.connect(websocket, room_id, user.id, user.role)
+    await manager.connect(websocket, db, user, chat_room)
     
     try:
         # Process messages
         while True:
-            data = await websocket.receive_text()
+            data = await manager.receive_frame(websocket)
             await manager.process_message(websocket, data, db)
     except WebSocketDisconnect:
         # Handle disconnection
         manager.disconnect(websocket)
-    except Exception as e:
-        print(f"Error in WebSocket connection: {str(e)}")
+    except Exception:
+        logger.exception("Chat socket failed", extra={"user_id": user.id, "room_id": room_id})
         manager.disconnect(websocket)
 
 
@@ -0,0 +1,58 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.crud.scheduled_job_run_crud import scheduled_job_run_crud
+from app.database.session import get_db
+from app.dependencies.auth_dependency import get_current_user
+from app.models.user import User, UserRole
+from app.schemas.api_response import success_response, APIResponse
+from app.services.scheduler import job_scheduler
+
+router = APIRouter(prefix="/jobs", tags=["Scheduled Jobs"])
+
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Only admins can manage scheduled jobs")
+    return current_user
+
+
+@router.get("/", response_model=APIResponse[List[dict]])
+def list_jobs(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    """Scheduled jobs with their schedule, next slot on this worker and latest run"""
+    last_runs = scheduled_job_run_crud.get_last_runs(db)
+    jobs = [
+        {
+            "name": job.name,
+            "description": job.description,
+            "schedule": job.schedule.expression,
+            "next_run_at": job.next_run_at,
+            "last_run": scheduled_job_run_crud.to_out(last_runs[job.name]) if job.name in last_runs else None,
+        }
+        for job in job_scheduler.jobs.values()
+    ]
+    return success_response(jobs, "Scheduled jobs retrieved successfully")
+
+
+@router.get("/{job_name}/runs", response_model=APIResponse[List[dict]])
+def get_job_runs(
+    job_name: str,
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Latest runs of a job with their duration and result"""
+    if job_name not in job_scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    runs = scheduled_job_run_crud.get_runs(db, job_name=job_name, limit=limit)
+    return success_response([scheduled_job_run_crud.to_out(run) for run in runs], "Job runs retrieved successfully")
+
+
+@router.post("/{job_name}/run", response_model=APIResponse[dict])
+def run_job(job_name: str, current_user: User = Depends(require_admin)):
+    """Run a job now in the background; its run shows up in /jobs/{job_name}/runs"""
+    if not job_scheduler.trigger(job_name):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return success_response({"job_name": job_name}, "Job started")
@@ -1,17 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database.session import get_db
-from app.schemas.notification_schema import NotificationCreate, NotificationOut, BroadcastNotificationRequest
+from app.schemas.notification_schema import NotificationCreate, NotificationOut, NotificationPage, BroadcastNotificationRequest
 from app.schemas.api_response import success_response, APIResponse
 from app.crud.notification_crud import notification_crud
 from app.models.user import User, UserRole
 from app.dependencies.auth_dependency import get_current_user
 from app.utils.notification_helper import send_notification
 from app.services.firebase_service import firebase_notification_service
+from app.services.broadcast_service import broadcast_service
 from app.crud.user_crud import user_crud
+from app.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
 from typing import Optional
 import json
 import math
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -78,6 +84,61 @@ def get_my_notifications(
     return success_response(items, "Your notifications fetched successfully", total_pages=total_pages)
 
 
+@router.get("/me/inbox", response_model=APIResponse[NotificationPage])
+def get_my_inbox(
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(25, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get your notifications newest first, keyset-paged without counting the whole list"""
+    before = None
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor, 2)
+        try:
+            before = (datetime.fromisoformat(created_at), int(notification_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items = notification_crud.get_page_for_user(db, current_user.id, before=before, limit=limit)
+
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+
+    return success_response(
+        {"items": [NotificationOut.model_validate(item) for item in items], "next_cursor": next_cursor},
+        "Your notifications fetched successfully"
+    )
+
+
+@router.get("/me/unread-count", response_model=APIResponse[dict])
+def get_my_unread_count(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Get your unread notification count, for the home screen badge"""
+    unread_count = notification_crud.get_unread_count(db, current_user.id)
+    return success_response({"unread_count": unread_count}, "Unread count fetched successfully")
+
+
+@router.post("/me/read-all", response_model=APIResponse[dict])
+def mark_all_my_notifications_read(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Mark all your notifications as read"""
+    marked = notification_crud.mark_all_read(db, current_user.id)
+    return success_response({"marked_read": marked, "unread_count": 0}, "Notifications marked as read")
+
+
+@router.post("/{notification_id}/read", response_model=APIResponse[NotificationOut])
+def mark_notification_read(
+    notification_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mark one of your notifications as read"""
+    notification = notification_crud.mark_read(db, notification_id, current_user.id)
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return success_response(notification, "Notification marked as read")
+
+
 @router.get("/", response_model=APIResponse[list[NotificationOut]])
 def get_all_notifications(
     current_page: int = Query(1, ge=1, description="Current page number"),
@@ -114,139 +175,41 @@ def delete_notification(notification_id: int, db: Session = Depends(get_db)):
 @router.post("/broadcast", response_model=APIResponse[dict])
 def broadcast_notification(
     request: BroadcastNotificationRequest,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Broadcast notification to all users (admin only)
     Optional role_filter: "user" or "expert" to target specific roles
+
+    The broadcast runs in the background; poll GET /notifications/broadcast/{job_id} for progress.
     """
     # Check if user is admin
     if current_user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Only admins can send broadcast notifications")
-    
-    print(f"📢 BROADCAST: Admin {current_user.username or current_user.id} sending broadcast notification")
-    print(f"📝 Title: {request.title}")
-    print(f"📄 Body: {request.body}")
-    print(f"🎯 Role Filter: {request.role_filter or 'All users'}")
-    
-    try:
-        # Get all users
-        all_users = user_crud.get_all_users(db)
-        
-        # Filter users based on role_filter
-        if request.role_filter:
-            if request.role_filter.lower() == "user":
-                target_users = [user for user in all_users if user.role == UserRole.user]
-            elif request.role_filter.lower() == "expert":
-                target_users = [user for user in all_users if user.role == UserRole.expert]
-            else:
-                raise HTTPException(status_code=400, detail="Invalid role_filter. Use 'user' or 'expert'")
-        else:
-            # All users except admins
-            target_users = [user for user in all_users if user.role != UserRole.admin]
-        
-        # Filter users with FCM tokens
-        users_with_tokens = [user for user in target_users if user.fcm_token]
-        fcm_tokens = [user.fcm_token for user in users_with_tokens]
-        
-        print(f"📊 Total target users: {len(target_users)}")
-        print(f"📱 Users with FCM tokens: {len(users_with_tokens)}")
-        
-        if not fcm_tokens:
-            return success_response(
-                {
-                    "notifications_sent": 0,
-                    "total_target_users": len(target_users),
-                    "users_with_tokens": 0,
-                    "role_filter": request.role_filter
-                },
-                "No users with FCM tokens found"
-            )
-        
-        # Save notifications to database for each user
-        saved_count = 0
-        for user in users_with_tokens:
-            try:
-                from app.schemas.notification_schema import NotificationCreate
-                notification_in = NotificationCreate(
-                    title=request.title,
-                    body=request.body,
-                    type="broadcast",
-                    target_user_id=user.id,
-                    sender_id=current_user.id
-                )
-                notification_crud.create(db, notification_in)
-                saved_count += 1
-            except Exception as e:
-                print(f"❌ Failed to save notification for user {user.id}: {e}")
-        
-        # Send multicast notification via Firebase (using optimized method)
-        print(f"🚀 Sending multicast notification to {len(fcm_tokens)} devices...")
-        
-        # Prepare data for Firebase
-        notification_data = {
-            "title":request.title,
-            "body":request.body,
-            "type": "broadcast",
-            "sender_id": str(current_user.id),
-            "sender_username": str(current_user.username or f"User_{current_user.id}"),
-            "role_filter": str(request.role_filter or "all")
-        }
-        
-        print(f"🔍 BROADCAST: Prepared data: {notification_data}")
-        
-        # Send multicast notification
-        firebase_result = firebase_notification_service.send_multicast_notification(
-            tokens=fcm_tokens,
-            title=request.title,
-            body=request.body,
-            data=notification_data
-        )
-        
-        # Clean up invalid tokens if any failed
-        if firebase_result.get("failure_count", 0) > 0 and firebase_result.get("responses"):
-            invalid_tokens = []
-            for i, response in enumerate(firebase_result["responses"]):
-                if not response.success and "not found" in str(response.exception).lower():
-                    invalid_token = fcm_tokens[i]
-                    invalid_tokens.append(invalid_token)
-                    print(f"🧹 CLEANUP: Marking token {invalid_token[:10]}... as invalid")
-            
-            # Remove invalid tokens from database
-            if invalid_tokens:
-                try:
-                    from sqlalchemy import update
-                    stmt = update(User).where(User.fcm_token.in_(invalid_tokens)).values(fcm_token=None)
-                    db.execute(stmt)
-                    db.commit()
-                    print(f"🧹 CLEANUP: Removed {len(invalid_tokens)} invalid tokens from database")
-                except Exception as e:
-                    print(f"❌ CLEANUP ERROR: {str(e)}")
-        
-        print(f"📊 Firebase result: {firebase_result}")
-        
-        result = {
-            "notifications_sent": firebase_result.get("success_count", 0),
-            "notifications_failed": firebase_result.get("failure_count", 0),
-            "total_target_users": len(target_users),
-            "users_with_tokens": len(users_with_tokens),
-            "saved_to_database": saved_count,
-            "role_filter": request.role_filter,
-            "firebase_success": firebase_result.get("success", False)
-        }
-        
-        if firebase_result.get("success"):
-            message = f"Broadcast sent successfully to {result['notifications_sent']} users"
-            print(f"✅ {message}")
-        else:
-            message = f"Broadcast failed: {firebase_result.get('error', 'Unknown error')}"
-            print(f"❌ {message}")
-        
-        return success_response(result, message)
-        
-    except HTTPException:
-        raise  # Re-raise HTTP exceptions as-is
-    except Exception as e:
-        print(f"❌ BROADCAST ERROR: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Broadcast failed: {str(e)}")
+
+    if request.role_filter and request.role_filter.lower() not in ("user", "expert"):
+        raise HTTPException(status_code=400, detail="Invalid role_filter. Use 'user' or 'expert'")
+
+    job = broadcast_service.start(
+        title=request.title,
+        body=request.body,
+        role_filter=request.role_filter,
+        sender=current_user
+    )
+    logger.info(
+        "Broadcast started",
+        extra={"job_id": job.id, "admin_id": current_user.id, "role_filter": request.role_filter or "all"}
+    )
+    return success_response(job.to_dict(), "Broadcast started")
+
+
+@router.get("/broadcast/{job_id}", response_model=APIResponse[dict])
+def get_broadcast_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Get the progress of a broadcast job (admin only)"""
+    if current_user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Only admins can view broadcast notifications")
+
+    job = broadcast_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    return success_response(job.to_dict(), "Broadcast job fetched successfully")
@@ -70,7 +70,7 @@ def get_my_rewards(
     current_user: User = Depends(get_current_user)
 ):
     """Get reward summary for the current user"""
-    reward_summary = reward_crud.get_reward_summary(db=db, user_id=current_user.id)
+    reward_summary = reward_crud.get_reward_summary(db=db, user_id=current_user.id, include_rewards=False)
     
     response_data = RewardSummaryResponse(
         total_rewards=reward_summary["total_rewards"],
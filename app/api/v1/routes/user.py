@@ -56,7 +56,9 @@ def del_user(user_id: int, db: Session = Depends(get_db),
 @router.put("/fcm-token/{user_id}", response_model=APIResponse[UserRead])
 @standardize_response
 def update_fcm_token(user_id: int, token_data: FCMTokenUpdate, db: Session = Depends(get_db)):
-    user = user_crud.update_fcm_token(db=db, user_id=user_id, fcm_token=token_data.fcm_token)
+    user = user_crud.update_fcm_token(
+        db=db, user_id=user_id, fcm_token=token_data.fcm_token, platform=token_data.platform
+    )
     return success_response(
         data=user,
         message="FCM token updated successfully"
@@ -10,6 +10,77 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
 
+    # Logging
+    log_level: str = "INFO"
+    log_json: bool = True  # One JSON object per line, "false" for plain text
+    log_sample_rate: float = 0.01  # Share of per-item debug/info lines (per token, per row) that are kept
+
+    # Chat assignment
+    expert_max_active_rooms: int = 0  # Soft cap on active rooms per expert, 0 disables it
+    expert_load_refresh_seconds: int = 300
+
+    # Chat sockets
+    ws_ping_interval_seconds: int = 25  # Keepalive to every socket
+    ws_ping_timeout_seconds: float = 5  # A socket a ping can't be sent to in this time is reaped
+    ws_ping_concurrency: int = 1000  # Pings in flight at once, so stuck sockets don't hold up the others
+    ws_max_connections_per_worker: int = 20000
+    chat_push_coalesce_seconds: int = 10  # Chat pushes to a recipient within this window are folded into one
+
+    # Chat history archive
+    message_archive_dir: str = "archive/messages"
+    message_archive_after_months: int = 6  # Partitions older than this are archived for inactive rooms
+    message_partitions_ahead: int = 3  # Monthly partitions created ahead of time
+
+    # Broadcast notifications
+    broadcast_chunk_size: int = 500  # FCM multicast limit
+    broadcast_max_parallel_chunks: int = 4
+
+    # Notification transport
+    notification_transport: str = "firebase"  # "firebase", or "stub" to simulate FCM locally
+    firebase_credentials_path: str = "wellness_service_account_key.json"
+    notification_stub_latency_ms: float = 50  # Simulated FCM round trip
+    notification_stub_jitter_ms: float = 20
+    notification_stub_failure_rate: float = 0.0  # Share of sends failing with a retryable error
+    notification_stub_unregistered_rate: float = 0.0  # Share of sends answered with "unregistered"
+
+    # Notification outbox
+    outbox_workers: int = 4
+    outbox_batch_size: int = 50
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_lease_seconds: int = 60  # Claimed rows are retried if a worker dies before this
+    outbox_max_attempts: int = 8
+    outbox_backoff_base_seconds: int = 5
+    outbox_backoff_max_seconds: int = 3600
+    outbox_per_token_per_minute: int = 20
+
+    # Notification campaigns
+    campaign_batch_size: int = 500  # Users enqueued per transaction
+    campaign_default_rate_per_minute: int = 6000
+    campaign_lease_seconds: int = 120  # A crashed runner's campaign is resumed by another after this
+    campaign_poll_interval_seconds: float = 5.0
+    campaign_max_retries: int = 5  # Runs in a row ended by a retryable error before a campaign is marked failed
+    campaign_retry_base_seconds: int = 30  # Doubled per retry, up to campaign_retry_max_seconds
+    campaign_retry_max_seconds: int = 900
+
+    # Challenges
+    challenge_sweep_chunk_size: int = 1000  # User challenges advanced per transaction by the progress sweep
+    leaderboard_refresh_seconds: int = 60  # Ranks reflect progress made on other workers after at most this
+
+    # Device tokens
+    device_token_stale_days: int = 60  # Tokens the app hasn't re-registered for this long are dropped
+
+    # Scheduled jobs, cron expressions in UTC
+    scheduler_enabled: bool = True
+    scheduler_tick_seconds: float = 30
+    scheduler_history_days: int = 30  # Run history kept per job
+    challenge_sweep_cron: str = "0 2 * * *"  # Off-peak
+    reward_expiry_cron: str = "*/15 * * * *"
+    password_reset_cleanup_cron: str = "0 * * * *"
+    challenge_leaderboard_rebuild_cron: str = "0 3 * * *"  # After the progress sweep
+    device_token_prune_cron: str = "30 3 * * *"
+    message_partition_cron: str = "0 1 1 * *"  # Monthly, partitions are kept message_partitions_ahead months ahead
+    scheduler_history_cleanup_cron: str = "0 4 * * *"
+
     class Config:
         env_file = ".env"
 
@@ -1,58 +1,176 @@
+import asyncio
 import json
-from typing import Dict, List, Optional, Set, Any
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Any, Tuple, Union
 from datetime import datetime
 
 from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
 
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for the "msgpack" subprotocol
+    msgpack = None
+
+from app.core.settings import settings
 from app.crud.chat_crud import chat_room_crud, message_crud
+from app.database.session import SessionLocal
+from app.core.cache import shared_product_cache, shared_office_cache
 from app.crud.user_crud import user_crud
+from app.models.chat import ChatRoom
 from app.models.user import UserRole, User
 from app.schemas.chat_schema import WSMessage, WSResponse, MessageCreate
+from app.schemas.product_schema import ProductOut
+from app.schemas.dxn_directory_schema import DXNDirectoryOut
 from app.services.firebase_service import firebase_notification_service
 from app.schemas.notification_schema import NotificationCreate
 from app.crud.notification_crud import notification_crud
-from app.utils.notification_helper import send_notification
+from app.utils.notification_helper import send_coalesced_notification
 from app.crud.product_crud import product_crud
 from app.crud.dxn_directory_crud import dxn_directory_crud
+from app.core.logger import sampled
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ConnectionRecord:
+    """State kept for an open chat socket, loaded once when it connects
+
+    The ORM objects are detached from the session so later commits on the
+    connection's session don't expire them and force a reload.
+    """
+    user_id: int
+    room_id: int
+    role: UserRole
+    user: User
+    chat_room: ChatRoom
+    participants: List[User] = field(default_factory=list)  # Room user and assigned expert
+    connected_at: float = field(default_factory=time.monotonic)
+    wire_format: str = "json"  # "json" (text frames) or "msgpack" (binary frames)
+
+
+@dataclass(slots=True)
+class PendingPush:
+    """Chat messages to a participant not in the room, held for the coalescing window"""
+    recipient: User
+    sender: User
+    body: str
+    count: int = 1
+
+
+WIRE_JSON = "json"
+WIRE_MSGPACK = "msgpack"
+
+
+def encode_frame(payload: Union[BaseModel, Dict[str, Any]], wire_format: str) -> Union[str, bytes]:
+    """Encode an outgoing payload as a JSON text frame or a MessagePack binary frame"""
+    if wire_format == WIRE_MSGPACK:
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump(mode="json")
+        return msgpack.packb(payload)
+    if isinstance(payload, BaseModel):
+        return payload.model_dump_json()
+    return json.dumps(payload)
+
+
+def _wire_formats() -> List[str]:
+    return [WIRE_JSON, WIRE_MSGPACK] if msgpack is not None else [WIRE_JSON]
+
+
+# Application level keepalive frames. They keep proxies from closing quiet sockets and
+# let clients check the link; clients may answer "ping" with "pong" but don't have to.
+# Dead peers are detected by uvicorn's protocol pings (ws_ping_interval / ws_ping_timeout)
+# and by sends failing here
+PING_FRAMES = {wire_format: encode_frame({"type": "ping"}, wire_format) for wire_format in _wire_formats()}
+PONG_FRAMES = {wire_format: encode_frame({"type": "pong"}, wire_format) for wire_format in _wire_formats()}
+
+
+_PER_CONNECTION_SCOPE_KEYS = ("headers", "path", "raw_path", "query_string", "path_params", "client", "subprotocols")
+
+
+def _approx_size(obj: Any, seen: Set[int], depth: int = 0) -> int:
+    """Approximate the memory held by an object and the containers it references"""
+    if id(obj) in seen or depth > 6:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k, seen, depth + 1) + _approx_size(v, seen, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(item, seen, depth + 1) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        # Skip SQLAlchemy instance state, it points at the mapper registry shared by every object
+        size += sum(
+            _approx_size(v, seen, depth + 1) for k, v in vars(obj).items() if not k.startswith("_sa_")
+        )
+    elif hasattr(obj, "__slots__"):
+        size += sum(_approx_size(getattr(obj, slot, None), seen, depth + 1) for slot in obj.__slots__)
+    return size
+
+
+def _process_rss_bytes() -> Optional[int]:
+    """Resident set size of this worker, or None when it can't be read"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak RSS, reported in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
 
 
 class ConnectionManager:
     def __init__(self):
         # Map of room_id -> set of WebSocket connections
         self.active_connections: Dict[int, Set[WebSocket]] = {}
-        # Map of WebSocket -> (user_id, room_id)
-        self.connection_details: Dict[WebSocket, Dict[str, Any]] = {}
+        # Map of WebSocket -> connection record (user, room and participants)
+        self.connection_details: Dict[WebSocket, ConnectionRecord] = {}
+        # Map of user_id -> number of open connections (presence)
+        self.user_connection_counts: Dict[int, int] = {}
+        # Keepalive task, started with the first connection on the worker's event loop
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Map of (room_id, recipient_id) -> chat push waiting for its coalescing window to end
+        self._pending_pushes: Dict[Tuple[int, int], PendingPush] = {}
+        self._push_tasks: Set[asyncio.Task] = set()
+    
+    def at_capacity(self) -> bool:
+        """Check whether this worker already holds the maximum number of sockets"""
+        return len(self.connection_details) >= settings.ws_max_connections_per_worker
+    
+    def online_user_ids(self) -> Set[int]:
+        """Get the IDs of users with at least one open connection on this worker"""
+        return set(self.user_connection_counts)
     
     def is_user_connected(self, user_id: int, room_id: int) -> bool:
         for websocket in self.active_connections.get(room_id, set()):
             details = self.connection_details.get(websocket)
-            if details and details["user_id"] == user_id:
+            if details and details.user_id == user_id:
                 return True
         return False
         
     def send_notifications_to_other_users(
-    self, db: Session, room_id: int, sender: User, message_type: str, message_content: str
+        self, room_id: int, sender: User, message_type: str, message_content: str, participants: List[User]
     ):
-        """Send FCM notifications to other users in the chat room (if not connected)"""
-        try:
-            chat_room = chat_room_crud.get_chat_room(db, room_id=room_id)
-            if not chat_room:
-                return
-            
+        """Queue push notifications for the other participants of the room (if not connected)
 
+        Nothing is written per message: messages to a recipient are counted in memory
+        for `chat_push_coalesce_seconds`, then their tokens are looked up and the burst is
+        saved as one coalesced notification off the event loop.
+        """
+        try:
             # Determine the other participant(s)
-            other_users = []
-            
-            if chat_room.user_id != sender.id:
-                user = user_crud.get_user_by_id(db,user_id= chat_room.user_id)
-                if user:
-                    other_users.append(user)
-                    
-            if chat_room.expert_id and chat_room.expert_id != sender.id:
-                expert = user_crud.get_user_by_id(db, user_id= chat_room.expert_id)
-                if expert:
-                    other_users.append(expert)
+            other_users = [user for user in participants if user.id != sender.id]
             
             # Format message body based on message type
             if message_type == "text":
@@ -68,35 +186,80 @@ class ConnectionManager:
             else:
                 body = "Sent you a message"
 
-
-            # Send individual notifications
+            loop = asyncio.get_running_loop()
             for user in other_users:
-                
-                is_connected = self.is_user_connected(user.id, room_id)
-                
-                if user.fcm_token and not is_connected:
-                    try:
-                        send_notification(
-                            db=db,
-                            title=f"New message",
-                            body=body,
-                            type="chat",
-                            target_user=user,
-                            sender=sender
-                        )
-                    except Exception as e:
-                        pass
-                elif not user.fcm_token:
-                    pass
-                elif is_connected:
-                    pass
+                if self.is_user_connected(user.id, room_id):
+                    continue
+                key = (room_id, user.id)
+                pending = self._pending_pushes.get(key)
+                if pending is not None:
+                    pending.sender = sender
+                    pending.body = body
+                    pending.count += 1
+                    continue
+                self._pending_pushes[key] = PendingPush(recipient=user, sender=sender, body=body)
+                loop.call_later(settings.chat_push_coalesce_seconds, self._flush_push, key)
+
+        except Exception:
+            logger.exception("Chat notifications failed", extra={"room_id": room_id})
+
+    def _flush_push(self, key: Tuple[int, int]):
+        pending = self._pending_pushes.pop(key, None)
+        if pending is None:
+            return
+        task = asyncio.create_task(asyncio.to_thread(self._save_push, key[0], pending))
+        self._push_tasks.add(task)
+        task.add_done_callback(self._push_tasks.discard)
 
+    def _save_push(self, room_id: int, pending: PendingPush):
+        """Save a burst of chat messages as one coalesced notification, on a worker thread"""
+        db = SessionLocal()
+        try:
+            # Bursts in a room fold into one notification and push per recipient, across workers too
+            send_coalesced_notification(
+                db=db,
+                title="New message",
+                body=pending.body,
+                type="chat",
+                target_user=pending.recipient,
+                sender=pending.sender,
+                group_key=f"chat:{room_id}",
+                window_seconds=0,  # Already held for the window here
+                count=pending.count
+            )
         except Exception as e:
-            pass
+            logger.debug(
+                "Chat push failed",
+                extra={"room_id": room_id, "user_id": pending.recipient.id, "error": str(e), **sampled()}
+            )
+        finally:
+            db.close()
+
+    async def flush_pending_pushes(self):
+        """Save the pushes still in their coalescing window, for shutdown"""
+        for key in list(self._pending_pushes):
+            self._flush_push(key)
+        if self._push_tasks:
+            await asyncio.gather(*self._push_tasks, return_exceptions=True)
+
+    def _detach(self, db: Session, *objects):
+        """Detach loaded ORM objects from the session so they stay usable across commits"""
+        for obj in objects:
+            if obj in db:
+                db.expunge(obj)
 
-    async def connect(self, websocket: WebSocket, room_id: int, user_id: int, user_role: UserRole):
+    async def connect(self, websocket: WebSocket, db: Session, user: User, chat_room: ChatRoom):
         """Connect a user to a chat room"""
-        await websocket.accept()
+        # JSON stays the default, MessagePack is used only when the client asks for it
+        wire_format = WIRE_JSON
+        if msgpack is not None and WIRE_MSGPACK in websocket.scope.get("subprotocols", []):
+            wire_format = WIRE_MSGPACK
+        await websocket.accept(subprotocol=WIRE_MSGPACK if wire_format == WIRE_MSGPACK else None)
+        room_id = chat_room.id
+        user_id = user.id
+        
+        participants = chat_room_crud.get_participants(db, chat_room=chat_room)
+        self._detach(db, user, chat_room, *participants)
         
         # Initialize room if it doesn't exist
         if room_id not in self.active_connections:
@@ -106,11 +269,20 @@ class ConnectionManager:
         self.active_connections[room_id].add(websocket)
         
         # Store connection details
-        self.connection_details[websocket] = {
-            "user_id": user_id,
-            "room_id": room_id,
-            "role": user_role
-        }
+        self.connection_details[websocket] = ConnectionRecord(
+            user_id=user_id,
+            room_id=room_id,
+            role=user.role,
+            user=user,
+            chat_room=chat_room,
+            participants=participants,
+            wire_format=wire_format,
+        )
+        self.user_connection_counts[user_id] = self.user_connection_counts.get(user_id, 0) + 1
+        self._ensure_heartbeat()
+
+        # End the read transaction so an idle socket doesn't hold a pooled DB connection
+        db.rollback()
         
         
     def disconnect(self, websocket: WebSocket):
@@ -118,9 +290,8 @@ class ConnectionManager:
         # Get connection details before removing
         details = self.connection_details.get(websocket)
         if details:
-            room_id = details["room_id"]
-            user_id = details["user_id"]
-            user_role = details["role"]
+            room_id = details.room_id
+            user_id = details.user_id
             
             # Remove from active connections
             if room_id in self.active_connections:
@@ -131,8 +302,101 @@ class ConnectionManager:
             
             # Remove connection details
             del self.connection_details[websocket]
+
+            # Update presence
+            remaining = self.user_connection_counts.get(user_id, 0) - 1
+            if remaining > 0:
+                self.user_connection_counts[user_id] = remaining
+            else:
+                self.user_connection_counts.pop(user_id, None)
             
             
+    def _ensure_heartbeat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        """Ping every socket and reap dead ones until the worker has no connections left"""
+        while self.connection_details:
+            await asyncio.sleep(settings.ws_ping_interval_seconds)
+            await self.ping_and_reap()
+
+    async def ping_and_reap(self):
+        """Ping every socket concurrently, reaping the ones the ping can't be sent to
+
+        A socket is alive as long as sends to it succeed: clients that only listen never
+        send a frame, so silence alone isn't a reason to drop them. Each ping gets
+        `ws_ping_timeout_seconds`, so a backpressured socket only holds up its own slot.
+        """
+        slots = asyncio.Semaphore(settings.ws_ping_concurrency)
+
+        async def ping(websocket: WebSocket, details: ConnectionRecord):
+            async with slots:
+                try:
+                    await asyncio.wait_for(
+                        self._send_frame(websocket, PING_FRAMES[details.wire_format]),
+                        timeout=settings.ws_ping_timeout_seconds
+                    )
+                    return
+                except Exception:
+                    pass
+            await self.reap(websocket)
+
+        await asyncio.gather(
+            *(ping(websocket, details) for websocket, details in list(self.connection_details.items())),
+            return_exceptions=True
+        )
+
+    async def reap(self, websocket: WebSocket, reason: str = "Connection lost"):
+        """Drop a dead socket from the manager and try to close it"""
+        self.disconnect(websocket)
+        try:
+            # A stuck socket may not take the close frame either
+            await asyncio.wait_for(websocket.close(code=1001, reason=reason), timeout=settings.ws_ping_timeout_seconds)
+        except Exception:
+            pass
+
+    def connection_stats(self, sample_size: int = 200) -> Dict[str, Any]:
+        """Connection counts and an approximate memory footprint, used to size workers"""
+        by_role: Dict[str, int] = {}
+        for details in self.connection_details.values():
+            by_role[details.role.value] = by_role.get(details.role.value, 0) + 1
+
+        # Sample the record plus the per-connection part of the ASGI scope (the scope
+        # also references the app and router, which every connection shares)
+        sample = list(self.connection_details.items())[:sample_size]
+        sampled_bytes = [
+            _approx_size(details, set()) + _approx_size(
+                {key: websocket.scope.get(key) for key in _PER_CONNECTION_SCOPE_KEYS}, set()
+            )
+            for websocket, details in sample
+        ]
+        total = len(self.connection_details)
+        rss_bytes = _process_rss_bytes()
+        return {
+            "total_connections": total,
+            "max_connections": settings.ws_max_connections_per_worker,
+            "rooms": len(self.active_connections),
+            "online_users": len(self.user_connection_counts),
+            "by_role": by_role,
+            "approx_bytes_per_connection": sum(sampled_bytes) // len(sampled_bytes) if sampled_bytes else 0,
+            "process_rss_bytes": rss_bytes,
+            "rss_bytes_per_connection": rss_bytes // total if rss_bytes and total else None,
+        }
+
+    async def receive_frame(self, websocket: WebSocket) -> Union[str, bytes]:
+        """Receive the next text or binary frame from a socket"""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        return message["text"] if message.get("text") is not None else message["bytes"]
+
+    async def _send_frame(self, websocket: WebSocket, frame: Union[str, bytes]):
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send a message to a specific connection"""
         await websocket.send_text(message)
@@ -140,14 +404,75 @@ class ConnectionManager:
     async def broadcast(self, message: str, room_id: int, exclude: Optional[WebSocket] = None):
         """Broadcast a message to all connections in a room"""
         if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
+            for connection in list(self.active_connections[room_id]):
                 if connection != exclude:  # Don't send back to sender if excluded
-                    await connection.send_text(message)
+                    try:
+                        await connection.send_text(message)
+                    except Exception:
+                        # Half-open socket, drop it instead of failing the whole broadcast
+                        await self.reap(connection)
+
+    async def broadcast_response(self, response: WSResponse, room_id: int, exclude: Optional[WebSocket] = None):
+        """Broadcast a response to a room, encoding it once per wire format in use"""
+        frames: Dict[str, Union[str, bytes]] = {}
+        for connection in list(self.active_connections.get(room_id, ())):
+            if connection == exclude:
+                continue
+            details = self.connection_details.get(connection)
+            wire_format = details.wire_format if details else WIRE_JSON
+            frame = frames.get(wire_format)
+            if frame is None:
+                frame = frames[wire_format] = encode_frame(response, wire_format)
+            try:
+                await self._send_frame(connection, frame)
+            except Exception:
+                await self.reap(connection)
                     
-    async def handle_join(self, message: WSMessage, db: Session):
+    def _get_sender(self, message: WSMessage, db: Session, details: ConnectionRecord) -> Optional[User]:
+        """Get the sender from the connection record, falling back to the database"""
+        if message.sender_id == details.user_id:
+            return details.user
+        return user_crud.get_user_by_id(db, user_id=message.sender_id)
+
+    def _get_participants(self, room_id: int, db: Session, details: ConnectionRecord) -> List[User]:
+        """Get the participants of a room from the connection record, falling back to the database"""
+        if room_id == details.room_id:
+            return details.participants
+        chat_room = chat_room_crud.get_chat_room(db, room_id=room_id)
+        return chat_room_crud.get_participants(db, chat_room=chat_room) if chat_room else []
+
+    def _get_product(self, product_id: int, db: Session) -> Optional[ProductOut]:
+        def load():
+            product = product_crud.get_by_id(db, product_id=product_id)
+            return ProductOut.model_validate(product) if product else None
+        return shared_product_cache.get_or_load(product_id, load)
+
+    def _get_office(self, office_id: int, db: Session) -> Optional[DXNDirectoryOut]:
+        def load():
+            office = dxn_directory_crud.get(db, entry_id=office_id)
+            return DXNDirectoryOut.model_validate(office) if office else None
+        return shared_office_cache.get_or_load(office_id, load)
+
+    async def refresh_room_context(self, room_id: int, db: Session):
+        """Reload the room and its participants for every connection in the room"""
+        connections = self.active_connections.get(room_id)
+        if not connections:
+            return
+        chat_room = chat_room_crud.get_chat_room(db, room_id=room_id)
+        if not chat_room:
+            return
+        participants = chat_room_crud.get_participants(db, chat_room=chat_room)
+        self._detach(db, chat_room, *participants)
+        for websocket in connections:
+            details = self.connection_details.get(websocket)
+            if details:
+                details.chat_room = chat_room
+                details.participants = participants
+
+    async def handle_join(self, message: WSMessage, db: Session, details: ConnectionRecord):
         """Handle a user joining a chat room"""
         # Get user details
-        user = user_crud.get_user_by_id(db, user_id=message.sender_id)
+        user = self._get_sender(message, db, details)
         if not user:
             return None
             
@@ -164,10 +489,10 @@ class ConnectionManager:
         
         return response
         
-    async def handle_message(self, message: WSMessage, db: Session):
+    async def handle_message(self, message: WSMessage, db: Session, details: ConnectionRecord):
         """Handle a new message"""
-        # Get user details from database
-        user = user_crud.get_user_by_id(db, user_id=message.sender_id)
+        # Get user details (cached on the connection)
+        user = self._get_sender(message, db, details)
         
         if not user:
             return WSResponse(
@@ -226,16 +551,17 @@ class ConnectionManager:
 
         
         # Send notifications to other users in the chat room
-        self.send_notifications_to_other_users(db, message.room_id, user, message.type, message.content)
+        participants = self._get_participants(message.room_id, db, details)
+        self.send_notifications_to_other_users(message.room_id, user, message.type, message.content, participants)
         
-        # Get product/office details if applicable
+        # Get product/office details if applicable (shared cache)
         product_details = None
         office_details = None
         
         if message.type == "product" and message.product_id:
-            product_details = product_crud.get_by_id(db, product_id=message.product_id)
+            product_details = self._get_product(message.product_id, db)
         elif message.type == "offices" and message.office_id:
-            office_details = dxn_directory_crud.get(db, entry_id=message.office_id)
+            office_details = self._get_office(message.office_id, db)
         
         # Create response
         response = WSResponse(
@@ -256,6 +582,25 @@ class ConnectionManager:
         
         return response
         
+    async def handle_read(self, message: WSMessage, db: Session, details: ConnectionRecord):
+        """Handle a read receipt by advancing the reader's watermark"""
+        room_id = details.room_id
+        user = details.user
+
+        last_read_message_id = message_crud.mark_messages_as_read(
+            db, room_id=room_id, user_id=user.id, up_to_message_id=message.message_id
+        )
+
+        return WSResponse(
+            type="read",
+            room_id=room_id,
+            sender_id=user.id,
+            sender_name=user.username,
+            sender_role=user.role,
+            timestamp=datetime.utcnow(),
+            message_id=last_read_message_id,
+        )
+
     async def handle_assign_expert(self, message: WSMessage, db: Session):
         """Handle assigning an expert to a chat room"""
         if not message.room_id or not message.content:  # content contains expert_id
@@ -272,6 +617,9 @@ class ConnectionManager:
             expert = user_crud.get_user_by_id(db, user_id=expert_id)
             if not expert:
                 return None
+            
+            # Connections in the room now have a different participant list
+            await self.refresh_room_context(message.room_id, db)
                 
             # Create response
             response = WSResponse(
@@ -288,36 +636,65 @@ class ConnectionManager:
         except ValueError:
             return None
             
-    async def process_message(self, websocket: WebSocket, data: str, db: Session):
+    def _decode(self, data: Union[str, bytes], wire_format: str) -> WSMessage:
+        """Validate an incoming frame straight into a WSMessage"""
+        if isinstance(data, bytes) and wire_format == WIRE_MSGPACK:
+            return WSMessage.model_validate(msgpack.unpackb(data))
+        return WSMessage.model_validate_json(data)
+
+    def _frame_type(self, data: Union[str, bytes], wire_format: str) -> Optional[str]:
+        """Loosely parse a frame that isn't a WSMessage to read its type"""
+        if isinstance(data, bytes) and wire_format == WIRE_MSGPACK:
+            payload = msgpack.unpackb(data)
+        else:
+            payload = json.loads(data)
+        return payload.get("type") if isinstance(payload, dict) else None
+
+    async def process_message(self, websocket: WebSocket, data: Union[str, bytes], db: Session):
         """Process an incoming WebSocket message"""
+        # Get connection details
+        details = self.connection_details.get(websocket)
+        if not details:
+            return
+        wire_format = details.wire_format
+
         try:
-            # Parse the message
-            message_data = json.loads(data)
-            message = WSMessage(**message_data)
-            
-            # Get connection details
-            details = self.connection_details.get(websocket)
-            if not details:
-                return
+            try:
+                message = self._decode(data, wire_format)
+            except ValidationError:
+                # Keepalive frames don't carry the message fields
+                frame_type = self._frame_type(data, wire_format)
+                if frame_type == "ping":
+                    await self._send_frame(websocket, PONG_FRAMES[wire_format])
+                    return
+                if frame_type == "pong":
+                    return
+                raise
                 
             # Handle different message types
             response = None
             if message.type in ["text", "audio", "image", "product", "offices"]:
-                response = await self.handle_message(message, db)
+                response = await self.handle_message(message, db, details)
             elif message.type == "join":
-                response = await self.handle_join(message, db)
-            elif message.type == "assign_expert" and details["role"] == UserRole.admin:
+                response = await self.handle_join(message, db, details)
+            elif message.type == "read":
+                response = await self.handle_read(message, db, details)
+            elif message.type == "assign_expert" and details.role == UserRole.admin:
                 response = await self.handle_assign_expert(message, db)
                 
             # Broadcast the response if available
-            if response and message.room_id in self.active_connections:
-                response_json = response.model_dump_json()
-                await self.broadcast(response_json, message.room_id)
+            if response and response.room_id in self.active_connections:
+                await self.broadcast_response(response, response.room_id)
                 
-        except json.JSONDecodeError:
-            await websocket.send_text(json.dumps({"error": "Invalid JSON format"}))
+        except ValidationError as e:
+            await self._send_frame(websocket, encode_frame({"error": str(e)}, wire_format))
+        except ValueError:
+            # json.JSONDecodeError and msgpack's unpack errors are both ValueErrors
+            error = "Invalid MessagePack format" if isinstance(data, bytes) else "Invalid JSON format"
+            await self._send_frame(websocket, encode_frame({"error": error}, wire_format))
         except Exception as e:
-            await websocket.send_text(json.dumps({"error": str(e)}))
+            logger.exception("Failed to process chat frame", extra={"user_id": details.user_id})
+            await self._send_frame(websocket, encode_frame({"error": str(e)}, wire_format))
 
 
 # Create a global connection manager instance
@@ -0,0 +1,259 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, insert, update, func, and_, or_, literal, DateTime, Integer
+from sqlalchemy.orm import Session, aliased
+
+from app.crud.notification_outbox_crud import notification_outbox_crud
+from app.database.upsert import dialect_insert
+from app.models.device_token import DeviceToken
+from app.models.notification_campaign import NotificationCampaign
+from app.models.notification_outbox import NotificationOutbox
+from app.models.notifications import Notifications, NotificationCounter
+from app.models.user import User
+from app.schemas.campaign_schema import CampaignCreate
+
+
+class CampaignCRUD:
+    def create(self, db: Session, *, obj_in: CampaignCreate, created_by: int, rate_per_minute: int) -> NotificationCampaign:
+        campaign = NotificationCampaign(
+            name=obj_in.name,
+            title=obj_in.title,
+            body=obj_in.body,
+            segment=obj_in.segment.model_dump_json(exclude_none=True),
+            status="draft",
+            rate_per_minute=rate_per_minute,
+            created_by=created_by,
+            cursor_user_id=0,
+            total_targets=0,
+            processed=0,
+            enqueued=0,
+            retries=0,
+        )
+        db.add(campaign)
+        db.commit()
+        db.refresh(campaign)
+        return campaign
+
+    def get(self, db: Session, campaign_id: int) -> Optional[NotificationCampaign]:
+        return db.get(NotificationCampaign, campaign_id)
+
+    def get_all(self, db: Session, skip: int = 0, limit: int = 25) -> List[NotificationCampaign]:
+        query = select(NotificationCampaign).order_by(NotificationCampaign.id.desc()).offset(skip).limit(limit)
+        return list(db.execute(query).scalars().all())
+
+    def count_all(self, db: Session) -> int:
+        return db.execute(select(func.count(NotificationCampaign.id))).scalar()
+
+    def count_audience(self, db: Session, targets) -> int:
+        return db.execute(select(func.count(User.id)).where(targets)).scalar()
+
+    def start(self, db: Session, campaign: NotificationCampaign, *, total_targets: int) -> NotificationCampaign:
+        """Mark a draft or paused campaign as running; a runner picks it up on its next poll"""
+        campaign.status = "running"
+        campaign.started_at = campaign.started_at or datetime.utcnow()
+        if not campaign.processed:
+            campaign.total_targets = total_targets
+        campaign.last_error = None
+        campaign.retries = 0
+        campaign.finished_at = None
+        db.commit()
+        db.refresh(campaign)
+        return campaign
+
+    def pause(self, db: Session, campaign: NotificationCampaign) -> NotificationCampaign:
+        """Stop a running campaign after its current batch; pushes already enqueued still go out"""
+        campaign.status = "paused"
+        db.commit()
+        db.refresh(campaign)
+        return campaign
+
+    def claim(self, db: Session, *, runner_id: str, lease_seconds: int) -> Optional[int]:
+        """Lease a running campaign nobody holds (or whose runner died); returns its id"""
+        now = datetime.utcnow()
+        candidate = (
+            select(NotificationCampaign.id)
+            .where(
+                and_(
+                    NotificationCampaign.status == "running",
+                    or_(NotificationCampaign.locked_until.is_(None), NotificationCampaign.locked_until < now)
+                )
+            )
+            .order_by(NotificationCampaign.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        campaign_id = db.execute(
+            update(NotificationCampaign)
+            .where(NotificationCampaign.id.in_(candidate.scalar_subquery()))
+            .values(locked_by=runner_id, locked_until=now + timedelta(seconds=lease_seconds))
+            .returning(NotificationCampaign.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.commit()
+        return campaign_id
+
+    def renew_lease(self, db: Session, *, campaign_id: int, runner_id: str, lease_seconds: int) -> bool:
+        renewed = db.execute(
+            update(NotificationCampaign)
+            .where(and_(NotificationCampaign.id == campaign_id, NotificationCampaign.locked_by == runner_id))
+            .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        ).rowcount
+        db.commit()
+        return bool(renewed)
+
+    def enqueue_next_batch(
+        self,
+        db: Session,
+        *,
+        campaign: NotificationCampaign,
+        targets,
+        batch_size: int,
+        runner_id: str,
+        lease_seconds: int,
+    ) -> Optional[Dict[str, int]]:
+        """Enqueue the next users of the audience with set-based INSERT ... SELECT statements
+
+        The batch is the id range after the cursor holding the next `batch_size` matching
+        users. Their notifications, unread counters and one outbox row per device are
+        written together with the advanced cursor and a renewed lease in one transaction.
+        Returns None when the audience is exhausted or the lease was lost.
+        """
+        cursor = campaign.cursor_user_id
+        window = (
+            select(User.id)
+            .where(and_(targets, User.id > cursor))
+            .order_by(User.id)
+            .limit(batch_size)
+            .subquery()
+        )
+        last_id = db.execute(select(func.max(window.c.id))).scalar()
+        if last_id is None:
+            return None
+        in_batch = and_(targets, User.id > cursor, User.id <= last_id)
+        now = datetime.utcnow()
+
+        notified = db.execute(
+            insert(Notifications).from_select(
+                ["title", "body", "type", "target_user_id", "sender_id", "is_read", "group_count"],
+                select(
+                    literal(campaign.title),
+                    literal(campaign.body),
+                    literal("campaign"),
+                    User.id,
+                    literal(campaign.created_by, Integer),
+                    literal(False),
+                    literal(1),
+                ).where(in_batch)
+            )
+        ).rowcount
+
+        counters = dialect_insert(db, NotificationCounter).from_select(
+            ["user_id", "unread_count"],
+            select(User.id, literal(1)).where(in_batch)
+        )
+        db.execute(counters.on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={"unread_count": NotificationCounter.unread_count + counters.excluded.unread_count},
+        ))
+
+        data = json.dumps({
+            "title": campaign.title,
+            "body": campaign.body,
+            "type": "campaign",
+            "campaign_id": str(campaign.id),
+        })
+        # Aliased so the segment's own EXISTS on device_tokens isn't correlated to it
+        Device = aliased(DeviceToken)
+        enqueued = db.execute(
+            insert(NotificationOutbox).from_select(
+                ["campaign_id", "token", "title", "body", "data", "status", "attempts", "next_attempt_at", "created_at"],
+                select(
+                    literal(campaign.id),
+                    Device.token,
+                    literal(campaign.title),
+                    literal(campaign.body),
+                    literal(data),
+                    literal("pending"),
+                    literal(0),
+                    literal(now, DateTime),
+                    literal(now, DateTime),
+                )
+                .select_from(Device)
+                .join(User, User.id == Device.user_id)
+                .where(in_batch)
+            )
+        ).rowcount
+
+        advanced = db.execute(
+            update(NotificationCampaign)
+            .where(and_(NotificationCampaign.id == campaign.id, NotificationCampaign.locked_by == runner_id))
+            .values(
+                cursor_user_id=last_id,
+                processed=NotificationCampaign.processed + notified,
+                enqueued=NotificationCampaign.enqueued + enqueued,
+                retries=0,
+                locked_until=now + timedelta(seconds=lease_seconds),
+            )
+        ).rowcount
+        if not advanced:
+            # Another runner took the campaign over, leave the batch to it
+            db.rollback()
+            return None
+        db.commit()
+        return {"users": notified, "pushes": enqueued, "cursor": last_id}
+
+    def finish(self, db: Session, *, campaign_id: int, runner_id: str, status: str, error: Optional[str] = None):
+        """Record the end of a run and release the lease; a campaign paused meanwhile stays paused"""
+        held = and_(NotificationCampaign.id == campaign_id, NotificationCampaign.locked_by == runner_id)
+        if status in ("completed", "failed"):
+            db.execute(
+                update(NotificationCampaign)
+                .where(and_(held, NotificationCampaign.status == "running"))
+                .values(status=status, finished_at=datetime.utcnow())
+            )
+        db.execute(
+            update(NotificationCampaign)
+            .where(held)
+            .values(locked_by=None, locked_until=None, last_error=error)
+        )
+        db.commit()
+
+    def release_for_retry(self, db: Session, *, campaign_id: int, runner_id: str, error: str, retry_in_seconds: float):
+        """Release the lease after a retryable error; no runner claims the campaign for `retry_in_seconds`"""
+        db.execute(
+            update(NotificationCampaign)
+            .where(and_(NotificationCampaign.id == campaign_id, NotificationCampaign.locked_by == runner_id))
+            .values(
+                locked_by=None,
+                locked_until=datetime.utcnow() + timedelta(seconds=retry_in_seconds),
+                retries=NotificationCampaign.retries + 1,
+                last_error=error,
+            )
+        )
+        db.commit()
+
+    def to_out(self, db: Session, campaign: NotificationCampaign) -> Dict:
+        """Campaign with its delivery stats taken from the outbox"""
+        return {
+            "id": campaign.id,
+            "name": campaign.name,
+            "title": campaign.title,
+            "body": campaign.body,
+            "segment": json.loads(campaign.segment),
+            "status": campaign.status,
+            "rate_per_minute": campaign.rate_per_minute,
+            "total_targets": campaign.total_targets,
+            "processed": campaign.processed,
+            "enqueued": campaign.enqueued,
+            "delivery": notification_outbox_crud.count_by_status(db, campaign_id=campaign.id),
+            "last_error": campaign.last_error,
+            "retries": campaign.retries,
+            "created_at": campaign.created_at,
+            "started_at": campaign.started_at,
+            "finished_at": campaign.finished_at,
+        }
+
+
+campaign_crud = CampaignCRUD()
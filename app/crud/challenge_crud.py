@@ -1,11 +1,17 @@
-from typing import List, Optional
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Union
 from fastapi import HTTPException
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, insert, update, and_, or_, func, case, exists, literal
 from sqlalchemy.orm import Session, joinedload
 
-from app.models.challenge import Challenge, UserChallenge, ChallengeType, ChallengeStatus
-from app.models.user_rewards import UserReward, RewardType, RewardTimeType
+from app.models.challenge import Challenge, UserChallenge, ChallengeType, ChallengeStatus, DurationType, progress_display_text
+from app.models.user_rewards import UserReward, RewardType, RewardTimeType, RewardStatus
 from app.schemas.challenge_schema import ChallengeCreate, ChallengeUpdate, UserChallengeCreate, UserChallengeUpdate
+from app.services.challenge_catalog import CatalogChallenge, challenge_catalog
+from app.services.challenge_leaderboard import challenge_leaderboard
+
+logger = logging.getLogger(__name__)
 
 
 class CRUDChallenge:
@@ -23,6 +29,7 @@ class CRUDChallenge:
         )
         
         db.add(db_obj)
+        challenge_catalog.bump(db)
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -49,46 +56,6 @@ class CRUDChallenge:
         result = db.execute(query)
         return result.scalar()
     
-    def get_challenges_by_type_with_user_status(self, db: Session, *, challenge_type: ChallengeType, user_id: int, skip: int = 0, limit: int = 100) -> List[dict]:
-        """Get all active challenges by type with user participation status"""
-        # Get all active challenges of this type
-        challenges = self.get_challenges_by_type(db=db, challenge_type=challenge_type, skip=skip, limit=limit)
-        
-        # Get user's participation status for these challenges
-        challenge_ids = [c.id for c in challenges]
-        user_challenges = db.execute(
-            select(UserChallenge).where(
-                and_(UserChallenge.user_id == user_id, 
-                     UserChallenge.challenge_id.in_(challenge_ids))
-            )
-        ).scalars().all()
-        
-        # Create a mapping of challenge_id -> user_status
-        user_status_map = {uc.challenge_id: uc.status.value for uc in user_challenges}
-        
-        # Add status to each challenge
-        result = []
-        for challenge in challenges:
-            challenge_dict = {
-                "id": challenge.id,
-                "title": challenge.title,
-                "description": challenge.description,
-                "type": challenge.type.value,
-                "duration": challenge.duration,
-                "duration_type": challenge.duration_type.value,
-                "reward_time": challenge.reward_time,
-                "reward_time_type": challenge.reward_time_type,
-                "is_active": challenge.is_active,
-                "created_at": challenge.created_at,
-                "updated_at": challenge.updated_at,
-                "duration_display_text": challenge.duration_display_text,
-                "reward_display_text": challenge.reward_display_text,
-                "status": user_status_map.get(challenge.id, "pending")  # Default to 'pending' if not joined
-            }
-            result.append(challenge_dict)
-        
-        return result
-
     def get_all_challenges(self, db: Session, *, skip: int = 0, limit: int = 100, include_inactive: bool = False) -> List[Challenge]:
         """Get all challenges with pagination"""
         query = select(Challenge)
@@ -106,45 +73,93 @@ class CRUDChallenge:
         result = db.execute(query)
         return result.scalar()
     
-    def get_all_challenges_with_user_status(self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100, include_inactive: bool = False) -> List[dict]:
-        """Get all challenges with user participation status"""
-        # Get all challenges
-        challenges = self.get_all_challenges(db=db, skip=skip, limit=limit, include_inactive=include_inactive)
-        
-        # Get user's participation status for these challenges
-        challenge_ids = [c.id for c in challenges]
-        user_challenges = db.execute(
-            select(UserChallenge).where(
-                and_(UserChallenge.user_id == user_id, 
-                     UserChallenge.challenge_id.in_(challenge_ids))
-            )
-        ).scalars().all()
-        
-        # Create a mapping of challenge_id -> user_status
-        user_status_map = {uc.challenge_id: uc.status.value for uc in user_challenges}
-        
-        # Add status to each challenge
-        result = []
-        for challenge in challenges:
-            challenge_dict = {
-                "id": challenge.id,
-                "title": challenge.title,
-                "description": challenge.description,
-                "type": challenge.type.value,
-                "duration": challenge.duration,
-                "duration_type": challenge.duration_type.value,
-                "reward_time": challenge.reward_time,
-                "reward_time_type": challenge.reward_time_type,
-                "is_active": challenge.is_active,
-                "created_at": challenge.created_at,
-                "updated_at": challenge.updated_at,
-                "duration_display_text": challenge.duration_display_text,
-                "reward_display_text": challenge.reward_display_text,
-                "status": user_status_map.get(challenge.id, "pending")  # Default to 'pending' if not joined
-            }
-            result.append(challenge_dict)
-        
-        return result
+    def get_challenges_with_participation(
+        self,
+        db: Session,
+        *,
+        user_id: Optional[int],
+        challenge_type: Optional[ChallengeType] = None,
+        include_inactive: bool = False,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Tuple[CatalogChallenge, Optional[UserChallenge]]], int]:
+        """Page of challenges, each with the user's latest participation, and the total count
+
+        Challenges come from the in-memory catalog, only the user's participations in the
+        page are queried. Without a user every participation is None.
+        """
+        challenges = challenge_catalog.list(db, challenge_type=challenge_type, include_inactive=include_inactive)
+        page = challenges[skip:skip + limit]
+        if user_id is None or not page:
+            return [(challenge, None) for challenge in page], len(challenges)
+
+        # A user can rejoin a challenge after completing it, show the latest run
+        latest = (
+            select(func.max(UserChallenge.id))
+            .where(UserChallenge.user_id == user_id, UserChallenge.challenge_id.in_([c.id for c in page]))
+            .group_by(UserChallenge.challenge_id)
+        )
+        participations = db.execute(select(UserChallenge).where(UserChallenge.id.in_(latest))).scalars().all()
+        by_challenge = {participation.challenge_id: participation for participation in participations}
+        return [(challenge, by_challenge.get(challenge.id)) for challenge in page], len(challenges)
+
+    def to_flat(self, challenge: Union[Challenge, CatalogChallenge], user_challenge: Optional[UserChallenge] = None) -> dict:
+        """Challenge and the user's progress in it as the flat dict the challenge routes return
+
+        Only `challenge` is read for the challenge side, so user_challenge.challenge
+        doesn't need to be loaded.
+        """
+        flat = {
+            # Challenge basic info
+            "id": challenge.id,
+            "title": challenge.title,
+            "description": challenge.description,
+            "type": challenge.type.value,
+            "duration": challenge.duration,
+            "duration_type": challenge.duration_type.value,
+            "reward_time": challenge.reward_time,
+            "reward_time_type": challenge.reward_time_type,
+            "is_active": challenge.is_active,
+            "created_at": challenge.created_at.isoformat(),
+            "updated_at": challenge.updated_at.isoformat(),
+            "duration_display_text": challenge.duration_display_text,
+            "reward_display_text": challenge.reward_display_text,
+        }
+        if user_challenge is None:
+            flat.update({
+                "user_challenge_id": None,
+                "status": "pending",
+                "current_progress": 0,
+                "progress_percentage": 0.0,
+                "progress_display_text": f"0/{challenge.duration} {challenge.duration_type.value}{'s' if challenge.duration != 1 else ''}",
+                "remaining_actions": challenge.duration,
+                "started_at": None,
+                "completed_at": None,
+                "last_progress_date": None,
+                "last_progress_hour": None,
+                "is_completed": False,
+                "is_user_active": False,
+            })
+            return flat
+
+        # User progress info
+        flat.update({
+            "user_challenge_id": user_challenge.id,
+            "status": user_challenge.status.value,
+            "current_progress": user_challenge.current_progress,
+            "progress_percentage": user_challenge.progress_percentage,
+            "progress_display_text": progress_display_text(
+                user_challenge.current_progress, challenge.duration, challenge.duration_type
+            ),
+            "remaining_actions": 0 if user_challenge.is_completed else max(0, challenge.duration - user_challenge.current_progress),
+            "started_at": user_challenge.started_at.isoformat() if user_challenge.started_at else None,
+            "completed_at": user_challenge.completed_at.isoformat() if user_challenge.completed_at else None,
+            "last_progress_date": user_challenge.last_progress_date.isoformat() if user_challenge.last_progress_date else None,
+            "last_progress_hour": user_challenge.last_progress_hour,
+            "is_completed": user_challenge.is_completed,
+            "is_user_active": user_challenge.is_active,
+        })
+        return flat
 
     def update_challenge(self, db: Session, *, challenge_id: int, obj_in: ChallengeUpdate) -> Challenge:
         """Update a challenge (Admin only)"""
@@ -158,6 +173,7 @@ class CRUDChallenge:
             if hasattr(challenge, field):
                 setattr(challenge, field, value)
 
+        challenge_catalog.bump(db)
         db.commit()
         db.refresh(challenge)
         return challenge
@@ -183,6 +199,7 @@ class CRUDChallenge:
             )
 
         db.delete(challenge)
+        challenge_catalog.bump(db)
         db.commit()
         return challenge
 
@@ -190,7 +207,7 @@ class CRUDChallenge:
     def join_challenge(self, db: Session, *, user_id: int, challenge_id: int) -> UserChallenge:
         """User joins a challenge (automatically starts)"""
         # Check if challenge exists and is active
-        challenge = self.get_challenge_by_id(db, challenge_id=challenge_id)
+        challenge = challenge_catalog.get(db, challenge_id)
         if not challenge:
             raise HTTPException(status_code=404, detail="Challenge not found")
         if not challenge.is_active:
@@ -228,11 +245,14 @@ class CRUDChallenge:
         result = db.execute(query)
         return result.scalar_one_or_none()
 
-    def get_user_challenges(self, db: Session, *, user_id: int, status: Optional[ChallengeStatus] = None, skip: int = 0, limit: int = 100) -> List[UserChallenge]:
-        """Get all challenges for a user"""
-        query = select(UserChallenge).options(joinedload(UserChallenge.challenge)).where(
-            UserChallenge.user_id == user_id
-        )
+    def get_user_challenges(
+        self, db: Session, *, user_id: int, status: Optional[ChallengeStatus] = None, skip: int = 0, limit: int = 100,
+        with_challenge: bool = True
+    ) -> List[UserChallenge]:
+        """Get all challenges for a user, with their challenge joined in unless the caller uses the catalog"""
+        query = select(UserChallenge).where(UserChallenge.user_id == user_id)
+        if with_challenge:
+            query = query.options(joinedload(UserChallenge.challenge))
         
         if status:
             query = query.where(UserChallenge.status == status)
@@ -265,50 +285,164 @@ class CRUDChallenge:
         db.refresh(user_challenge)
         return user_challenge
 
-    def update_challenge_progress(self, db: Session, *, user_challenge_id: int) -> UserChallenge:
-        """Update challenge progress and auto-complete if needed"""
-        user_challenge = self.get_user_challenge_by_id(db, user_challenge_id=user_challenge_id)
-        if not user_challenge:
-            raise HTTPException(status_code=404, detail="User challenge not found")
+    def _progress_step(self, now: datetime):
+        """UPDATE applying one progress step to active user challenges that are due for one
 
-        # Update progress using the model method
-        user_challenge.update_progress()
-        
-        # If challenge is completed, create reward
-        if user_challenge.status == ChallengeStatus.completed and not user_challenge.completed_at:
-            self.create_challenge_reward(db, user_challenge)
+        Challenges already progressed in the current day (or hour, for hourly ones) are
+        left out by the WHERE clause, and those reaching their duration are completed.
+        Callers add which user challenges it applies to.
+        """
+        today = now.date()
+        due = or_(
+            Challenge.duration_type == DurationType.minute,
+            UserChallenge.last_progress_date.is_(None),
+            UserChallenge.last_progress_date != today,
+            and_(
+                Challenge.duration_type == DurationType.hour,
+                or_(UserChallenge.last_progress_hour.is_(None), UserChallenge.last_progress_hour != now.hour)
+            ),
+        )
+        progress = UserChallenge.current_progress + 1
+        reached = progress >= Challenge.duration
+        return (
+            update(UserChallenge)
+            .where(
+                UserChallenge.challenge_id == Challenge.id,
+                UserChallenge.status == ChallengeStatus.active,
+                due,
+            )
+            .values(
+                current_progress=progress,
+                last_progress_date=today,
+                last_progress_hour=case(
+                    (Challenge.duration_type == DurationType.hour, now.hour), else_=UserChallenge.last_progress_hour
+                ),
+                progress_percentage=case((reached, 100.0), else_=progress * 100.0 / Challenge.duration),
+                status=case(
+                    (reached, literal(ChallengeStatus.completed, UserChallenge.__table__.c.status.type)),
+                    else_=UserChallenge.status
+                ),
+                completed_at=case((reached, now), else_=UserChallenge.completed_at),
+                updated_at=now,
+            )
+        )
 
+    def update_challenge_progress(
+        self, db: Session, *, user_challenge_id: int, user_id: int
+    ) -> Tuple[UserChallenge, CatalogChallenge, dict]:
+        """Record one progress action of the user on their challenge, completing and rewarding it if it's done
+
+        The step is a single conditional UPDATE ... RETURNING, so a double tap can't count
+        twice or complete twice: the second UPDATE finds the row already progressed for
+        the period and changes nothing. The reward and the leaderboard update go in the
+        same transaction. Returns the user challenge, its challenge and the outcome message.
+        """
+        now = datetime.utcnow()
+        user_challenge = db.execute(
+            self._progress_step(now)
+            .where(UserChallenge.id == user_challenge_id, UserChallenge.user_id == user_id)
+            .returning(UserChallenge)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if user_challenge is None:
+            db.rollback()
+            self._raise_not_progressed(db, user_challenge_id=user_challenge_id, user_id=user_id, now=now)
+
+        challenge = challenge_catalog.get(db, user_challenge.challenge_id)
+        completed = user_challenge.status == ChallengeStatus.completed
+        if completed:
+            reward = self.create_challenge_reward(db, user_challenge, challenge)
+            db.flush()
+            logger.info(
+                "Challenge reward created",
+                extra={"user_id": user_id, "user_challenge_id": user_challenge.id, "reward_id": reward.id}
+            )
+        challenge_leaderboard.record_progress(db, user_id=user_id, challenge_type=challenge.type, completed=completed)
+        # Detached so the commit doesn't expire what RETURNING just gave us
+        db.expunge(user_challenge)
         db.commit()
-        db.refresh(user_challenge)
-        return user_challenge
+        message = "Challenge completed! 🎉" if completed else "Progress updated successfully!"
+        return user_challenge, challenge, {"success": True, "message": message, "completed": completed}
+
+    def _raise_not_progressed(self, db: Session, *, user_challenge_id: int, user_id: int, now: datetime):
+        """Raise why the progress UPDATE matched no row"""
+        user_challenge = db.execute(
+            select(UserChallenge).where(UserChallenge.id == user_challenge_id)
+        ).scalar_one_or_none()
+        if not user_challenge:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+        if user_challenge.user_id != user_id:
+            raise HTTPException(status_code=403, detail="You can only update your own challenges")
+        if user_challenge.status != ChallengeStatus.active:
+            raise HTTPException(status_code=400, detail="Challenge is not active")
+        challenge = challenge_catalog.get(db, user_challenge.challenge_id)
+        if challenge.duration_type == DurationType.hour and user_challenge.last_progress_hour == now.hour:
+            raise HTTPException(status_code=400, detail="Progress for this hour is already updated")
+        raise HTTPException(status_code=400, detail="Progress for today is already updated")
+
+    def advance_progress(self, db: Session, *, user_challenge_ids: List[int], now: datetime) -> List[Tuple[int, int, ChallengeStatus]]:
+        """Apply one progress step to the given active challenges in a single UPDATE
 
-    def update_all_active_challenges_progress(self, db: Session):
-        """Update progress for all active challenges (can be called by a scheduler)"""
-        active_challenges = db.execute(
-            select(UserChallenge).options(joinedload(UserChallenge.challenge)).where(
-                UserChallenge.status == ChallengeStatus.active
+        Doesn't commit; returns (user_id, challenge_id, status) of the rows advanced.
+        """
+        rows = db.execute(
+            self._progress_step(now)
+            .where(UserChallenge.id.in_(user_challenge_ids))
+            .returning(UserChallenge.user_id, UserChallenge.challenge_id, UserChallenge.status)
+            .execution_options(synchronize_session=False)
+        ).all()
+        return [(user_id, challenge_id, status) for user_id, challenge_id, status in rows]
+
+    def create_missing_rewards(self, db: Session, *, user_challenge_ids: List[int], now: datetime) -> int:
+        """Bulk-insert the reward of every completed challenge among the given ones that has none yet
+
+        Doesn't commit; returns the rewards created.
+        """
+        completed = db.execute(
+            select(
+                UserChallenge.id,
+                UserChallenge.user_id,
+                Challenge.title,
+                Challenge.reward_time,
+                Challenge.reward_time_type,
             )
-        ).scalars().all()
-        
-        completed_challenges = []
-        for user_challenge in active_challenges:
-            user_challenge.update_progress()
-            if user_challenge.status == ChallengeStatus.completed:
-                self.create_challenge_reward(db, user_challenge)
-                completed_challenges.append(user_challenge)
-        
-        if completed_challenges:
-            db.commit()
-        
-        return len(completed_challenges)
+            .join(Challenge, Challenge.id == UserChallenge.challenge_id)
+            .where(
+                UserChallenge.id.in_(user_challenge_ids),
+                UserChallenge.status == ChallengeStatus.completed,
+                ~exists().where(UserReward.user_challenge_id == UserChallenge.id),
+            )
+        ).all()
+        if not completed:
+            return 0
 
-    def create_challenge_reward(self, db: Session, user_challenge: UserChallenge):
-        """Create reward for completed challenge"""
-        challenge = user_challenge.challenge
-        
+        rewards = []
+        for user_challenge_id, user_id, title, reward_time, reward_time_type in completed:
+            # Same expiry as UserReward.__init__, which a bulk insert bypasses
+            if reward_time_type == 'hour':
+                time_type, expires_at = RewardTimeType.hour, now + timedelta(hours=reward_time)
+            else:
+                time_type, expires_at = RewardTimeType.day, now + timedelta(days=reward_time)
+            rewards.append({
+                "user_id": user_id,
+                "reward_type": RewardType.referral_bonus,
+                "description": f"Challenge completed: {title}",
+                "reward_time": reward_time,
+                "reward_time_type": time_type,
+                "status": RewardStatus.active,
+                "created_at": now,
+                "expires_at": expires_at,
+                "user_challenge_id": user_challenge_id,
+            })
+        db.execute(insert(UserReward), rewards)
+        return len(rewards)
+
+    def create_challenge_reward(
+        self, db: Session, user_challenge: UserChallenge, challenge: Union[Challenge, CatalogChallenge]
+    ) -> UserReward:
+        """Add the reward for a completed challenge; doesn't commit"""
         # Determine reward time type
         reward_time_type = RewardTimeType.hour if challenge.reward_time_type == 'hour' else RewardTimeType.day
-        print(f"HERERER 2", challenge.reward_time)
         reward = UserReward(
             user_id=user_challenge.user_id,
             reward_type=RewardType.referral_bonus,
@@ -317,36 +451,23 @@ class CRUDChallenge:
             reward_time_type=reward_time_type,
             user_challenge_id=user_challenge.id
         )
-        print(f"USER ID IN REWARD: ",user_challenge.user_id)
         db.add(reward)
-        db.commit()
-        db.refresh(reward)
         return reward
 
     def get_user_challenge_stats(self, db: Session, *, user_id: int) -> dict:
-        """Get challenge statistics for a user"""
-        total_challenges = db.execute(
-            select(func.count(UserChallenge.id)).where(UserChallenge.user_id == user_id)
-        ).scalar()
-        
-        active_challenges = db.execute(
-            select(func.count(UserChallenge.id)).where(
-                and_(UserChallenge.user_id == user_id, UserChallenge.status == ChallengeStatus.active)
-            )
-        ).scalar()
-        
-        completed_challenges = db.execute(
-            select(func.count(UserChallenge.id)).where(
-                and_(UserChallenge.user_id == user_id, UserChallenge.status == ChallengeStatus.completed)
-            )
-        ).scalar()
-        
-        # Count challenge rewards
-        total_rewards_earned = db.execute(
-            select(func.count(UserReward.id)).where(
-                and_(UserReward.user_id == user_id, UserReward.reward_type == RewardType.challenge_reward)
-            )
-        ).scalar()
+        """Get challenge statistics for a user in one conditional-aggregate query"""
+        # Challenge rewards are the ones linked to a user challenge, whatever their reward type
+        rewards_earned = select(func.count(UserReward.id)).where(
+            UserReward.user_id == user_id, UserReward.user_challenge_id.isnot(None)
+        ).scalar_subquery()
+        total_challenges, active_challenges, completed_challenges, total_rewards_earned = db.execute(
+            select(
+                func.count(UserChallenge.id),
+                func.count(UserChallenge.id).filter(UserChallenge.status == ChallengeStatus.active),
+                func.count(UserChallenge.id).filter(UserChallenge.status == ChallengeStatus.completed),
+                rewards_earned,
+            ).where(UserChallenge.user_id == user_id)
+        ).one()
         
         return {
             "total_challenges": total_challenges or 0,
@@ -0,0 +1,187 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, func, case, or_, literal, cast, String
+from sqlalchemy.orm import Session
+
+from app.database.upsert import dialect_insert
+from app.models.challenge import Challenge, UserChallenge, ChallengeType, ChallengeStatus
+from app.models.challenge_ranking import ChallengeRanking, LeaderboardMetric, GLOBAL_SCOPE
+from app.models.user import User
+
+
+class ChallengeRankingCRUD:
+    def _score(self, metric: LeaderboardMetric, today: date):
+        """Score column of a metric; a streak with no progress since yesterday is broken and scores 0"""
+        if metric == LeaderboardMetric.completions:
+            return ChallengeRanking.completions
+        if metric == LeaderboardMetric.progress:
+            return ChallengeRanking.progress
+        return case(
+            (ChallengeRanking.last_active_date >= today - timedelta(days=1), ChallengeRanking.current_streak),
+            else_=0
+        )
+
+    def record_progress(
+        self, db: Session, *, user_id: int, challenge_type: ChallengeType, completed: bool, today: date
+    ) -> List[ChallengeRanking]:
+        """Count one progress action (and a completion) in the user's type and global rows
+
+        One upsert for both rows; doesn't commit. Returns the updated rows.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "scope": scope,
+                "completions": 1 if completed else 0,
+                "progress": 1,
+                "current_streak": 1,
+                "last_active_date": today,
+                "updated_at": now,
+            }
+            for scope in (GLOBAL_SCOPE, challenge_type.value)
+        ]
+        statement = dialect_insert(db, ChallengeRanking).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ChallengeRanking.user_id, ChallengeRanking.scope],
+            set_={
+                "completions": ChallengeRanking.completions + statement.excluded.completions,
+                "progress": ChallengeRanking.progress + 1,
+                "current_streak": case(
+                    (ChallengeRanking.last_active_date == today, ChallengeRanking.current_streak),
+                    (ChallengeRanking.last_active_date == today - timedelta(days=1), ChallengeRanking.current_streak + 1),
+                    else_=1
+                ),
+                "last_active_date": today,
+                "updated_at": now,
+            },
+        ).returning(ChallengeRanking)
+        return list(db.execute(statement).scalars().all())
+
+    def add_progress(self, db: Session, *, deltas: Dict[Tuple[int, str], Tuple[int, int]]) -> List[ChallengeRanking]:
+        """Add (progress, completions) deltas keyed by (user_id, scope) in one upsert
+
+        Used for progress the sweep makes on its own, which doesn't count towards streaks.
+        Doesn't commit; returns the updated rows.
+        """
+        if not deltas:
+            return []
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "scope": scope,
+                "completions": completions,
+                "progress": progress,
+                "current_streak": 0,
+                "updated_at": now,
+            }
+            for (user_id, scope), (progress, completions) in deltas.items()
+        ]
+        statement = dialect_insert(db, ChallengeRanking).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ChallengeRanking.user_id, ChallengeRanking.scope],
+            set_={
+                "completions": ChallengeRanking.completions + statement.excluded.completions,
+                "progress": ChallengeRanking.progress + statement.excluded.progress,
+                "updated_at": now,
+            },
+        ).returning(ChallengeRanking)
+        return list(db.execute(statement).scalars().all())
+
+    def get_scores(
+        self, db: Session, *, scope: str, metric: LeaderboardMetric, today: date,
+        changed_since: Optional[datetime] = None
+    ) -> List[Tuple[int, int]]:
+        """(user_id, score) of everyone ranked in a scope, or of the rows changed since a time"""
+        query = select(ChallengeRanking.user_id, self._score(metric, today)).where(ChallengeRanking.scope == scope)
+        if changed_since is not None:
+            query = query.where(ChallengeRanking.updated_at >= changed_since)
+        return [(user_id, score) for user_id, score in db.execute(query).all()]
+
+    def get_broken_streaks(self, db: Session, *, scope: str, since: date, today: date) -> List[int]:
+        """Users whose streak broke between `since` and today: last progress from since - 1 to the day before yesterday"""
+        query = select(ChallengeRanking.user_id).where(
+            ChallengeRanking.scope == scope,
+            ChallengeRanking.current_streak > 0,
+            ChallengeRanking.last_active_date >= since - timedelta(days=1),
+            ChallengeRanking.last_active_date < today - timedelta(days=1),
+        )
+        return list(db.execute(query).scalars().all())
+
+    def get_score(self, db: Session, *, user_id: int, scope: str, metric: LeaderboardMetric, today: date) -> Optional[int]:
+        query = select(self._score(metric, today)).where(
+            ChallengeRanking.user_id == user_id, ChallengeRanking.scope == scope
+        )
+        return db.execute(query).scalar()
+
+    def get_top(
+        self, db: Session, *, scope: str, metric: LeaderboardMetric, today: date, limit: int = 10
+    ) -> List[Tuple[int, Optional[str], int]]:
+        """(user_id, username, score) of the highest non-zero scores, read off the scope's index"""
+        if metric == LeaderboardMetric.streak:
+            score = ChallengeRanking.current_streak
+            live = [ChallengeRanking.last_active_date >= today - timedelta(days=1)]
+        else:
+            score = ChallengeRanking.completions if metric == LeaderboardMetric.completions else ChallengeRanking.progress
+            live = []
+        query = (
+            select(ChallengeRanking.user_id, User.username, score)
+            .join(User, User.id == ChallengeRanking.user_id)
+            .where(ChallengeRanking.scope == scope, score > 0, *live)
+            .order_by(score.desc(), ChallengeRanking.user_id.desc())
+            .limit(limit)
+        )
+        return [(user_id, username, value) for user_id, username, value in db.execute(query).all()]
+
+    def rebuild(self, db: Session, *, today: date) -> Dict[str, int]:
+        """Recount completions and progress from user_challenges and reset broken streaks
+
+        Streaks have no history to be recounted from, only the ones broken since their
+        last progress are reset. Commits.
+        """
+        now = datetime.utcnow()
+        db.execute(
+            update(ChallengeRanking)
+            .where(or_(ChallengeRanking.completions != 0, ChallengeRanking.progress != 0))
+            .values(completions=0, progress=0)
+        )
+        counted = or_(UserChallenge.current_progress > 0, UserChallenge.status == ChallengeStatus.completed)
+        completions = func.count(UserChallenge.id).filter(UserChallenge.status == ChallengeStatus.completed)
+        progress = func.coalesce(func.sum(UserChallenge.current_progress), 0)
+        per_type = (
+            select(UserChallenge.user_id, cast(Challenge.type, String), completions, progress, literal(0), literal(now))
+            .join(Challenge, Challenge.id == UserChallenge.challenge_id)
+            .where(counted)
+            .group_by(UserChallenge.user_id, Challenge.type)
+        )
+        per_user = (
+            select(UserChallenge.user_id, literal(GLOBAL_SCOPE), completions, progress, literal(0), literal(now))
+            .where(counted)
+            .group_by(UserChallenge.user_id)
+        )
+        rows = 0
+        for aggregate in (per_type, per_user):
+            statement = dialect_insert(db, ChallengeRanking).from_select(
+                ["user_id", "scope", "completions", "progress", "current_streak", "updated_at"], aggregate
+            )
+            rows += db.execute(statement.on_conflict_do_update(
+                index_elements=[ChallengeRanking.user_id, ChallengeRanking.scope],
+                set_={
+                    "completions": statement.excluded.completions,
+                    "progress": statement.excluded.progress,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )).rowcount
+
+        streaks_reset = db.execute(
+            update(ChallengeRanking)
+            .where(ChallengeRanking.current_streak > 0, ChallengeRanking.last_active_date < today - timedelta(days=1))
+            .values(current_streak=0)
+        ).rowcount
+        db.commit()
+        return {"rows": rows, "streaks_reset": streaks_reset}
+
+
+challenge_ranking_crud = ChallengeRankingCRUD()
@@ -1,14 +1,21 @@
+import logging
 from datetime import datetime
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select, desc, and_, func
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, aliased
+from sqlalchemy import select, update, desc, and_, or_, func, case, table, column, literal_column, exists, cast
+from sqlalchemy.dialects.postgresql import TSVECTOR, DOUBLE_PRECISION
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from app.models.chat import ChatRoom, Message
+from app.database.upsert import dialect_insert
+from app.models.chat import ChatRoom, Message, ChatReadState
 from app.models.user import User, UserRole
 from app.models.product import Product
 from app.models.dxn_directory import DXNDirectory
 from app.schemas.chat_schema import ChatRoomCreate, MessageCreate
 from app.crud.user_crud import user_crud
+from app.services.expert_load_service import expert_load_service
+from app.services.message_archive import message_archive
+
+logger = logging.getLogger(__name__)
 
 
 class CRUDChatRoom:
@@ -25,6 +32,7 @@ class CRUDChatRoom:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        expert_load_service.room_assigned(db_obj.expert_id)
         return db_obj
     
     def get_chat_room(self, db: Session, *, room_id: int) -> Optional[ChatRoom]:
@@ -41,7 +49,6 @@ class CRUDChatRoom:
         chat_room = result.scalar_one_or_none()
         
         if not chat_room:
-            print("Chat room not found")
             return None
             
         # Then get the messages separately with proper ordering
@@ -52,10 +59,17 @@ class CRUDChatRoom:
         )
         messages_result = db.execute(messages_query)
         chat_room.messages = list(messages_result.scalars().all())
-        print(chat_room.messages,"chat room")
         
         return chat_room
     
+    def get_participants(self, db: Session, *, chat_room: ChatRoom) -> List[User]:
+        """Get the room's user and assigned expert in one query"""
+        participant_ids = [chat_room.user_id]
+        if chat_room.expert_id:
+            participant_ids.append(chat_room.expert_id)
+        query = select(User).where(User.id.in_(participant_ids))
+        return list(db.execute(query).scalars().all())
+    
     def get_user_chat_room(self, db: Session, *, user_id: int) -> Optional[ChatRoom]:
         """Get a user's chat room"""
         query = select(ChatRoom).where(
@@ -106,55 +120,177 @@ class CRUDChatRoom:
         result = db.execute(query)
         return result.scalar()
     
+    def get_inbox(
+        self,
+        db: Session,
+        *,
+        viewer_id: int,
+        expert_id: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 25,
+        preview_length: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Get active chat rooms with participants, last message and unread count in one query
+
+        Rooms are ordered by (updated_at, id) descending and paged with a keyset cursor:
+        pass the (updated_at, id) of the last room of the previous page as `before`.
+        The last message is found with a per-room index probe on (room_id, id) and the
+        unread count is taken against the viewer's read watermark.
+        """
+        RoomUser = aliased(User)
+        RoomExpert = aliased(User)
+        LastMessage = aliased(Message)
+
+        latest_message_id = (
+            select(func.max(Message.id))
+            .where(Message.room_id == ChatRoom.id)
+            .correlate(ChatRoom)
+            .scalar_subquery()
+        )
+        watermark = (
+            select(ChatReadState.last_read_message_id)
+            .where(
+                and_(
+                    ChatReadState.room_id == ChatRoom.id,
+                    ChatReadState.user_id == viewer_id
+                )
+            )
+            .correlate(ChatRoom)
+            .scalar_subquery()
+        )
+        unread_count = (
+            select(func.count(Message.id))
+            .where(
+                and_(
+                    Message.room_id == ChatRoom.id,
+                    Message.sender_id != viewer_id,
+                    Message.id > func.coalesce(watermark, 0)
+                )
+            )
+            .correlate(ChatRoom)
+            .scalar_subquery()
+        )
+
+        query = (
+            select(
+                ChatRoom.id,
+                ChatRoom.name,
+                ChatRoom.user_id,
+                ChatRoom.expert_id,
+                ChatRoom.created_at,
+                ChatRoom.updated_at,
+                ChatRoom.is_active,
+                RoomUser.username.label("user_username"),
+                RoomUser.image_url.label("user_image_url"),
+                RoomUser.role.label("user_role"),
+                RoomExpert.username.label("expert_username"),
+                RoomExpert.image_url.label("expert_image_url"),
+                RoomExpert.role.label("expert_role"),
+                LastMessage.id.label("last_message_id"),
+                LastMessage.type.label("last_message_type"),
+                func.substr(LastMessage.content, 1, preview_length).label("last_message_content"),
+                LastMessage.sender_id.label("last_message_sender_id"),
+                LastMessage.created_at.label("last_message_created_at"),
+                unread_count.label("unread_count"),
+            )
+            .join(RoomUser, RoomUser.id == ChatRoom.user_id)
+            .outerjoin(RoomExpert, RoomExpert.id == ChatRoom.expert_id)
+            .outerjoin(LastMessage, LastMessage.id == latest_message_id)
+            .where(ChatRoom.is_active == True)
+        )
+        if expert_id is not None:
+            query = query.where(ChatRoom.expert_id == expert_id)
+        if before is not None:
+            before_updated_at, before_id = before
+            query = query.where(
+                or_(
+                    ChatRoom.updated_at < before_updated_at,
+                    and_(ChatRoom.updated_at == before_updated_at, ChatRoom.id < before_id)
+                )
+            )
+        query = query.order_by(desc(ChatRoom.updated_at), desc(ChatRoom.id)).limit(limit)
+
+        items = []
+        for row in db.execute(query).mappings():
+            items.append({
+                "id": row["id"],
+                "name": row["name"],
+                "user_id": row["user_id"],
+                "expert_id": row["expert_id"],
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+                "is_active": row["is_active"],
+                "user": {
+                    "id": row["user_id"],
+                    "username": row["user_username"],
+                    "image_url": row["user_image_url"],
+                    "role": row["user_role"],
+                },
+                "expert": {
+                    "id": row["expert_id"],
+                    "username": row["expert_username"],
+                    "image_url": row["expert_image_url"],
+                    "role": row["expert_role"],
+                } if row["expert_id"] else None,
+                "last_message": {
+                    "id": row["last_message_id"],
+                    "type": row["last_message_type"],
+                    "content": row["last_message_content"],
+                    "sender_id": row["last_message_sender_id"],
+                    "created_at": row["last_message_created_at"],
+                } if row["last_message_id"] else None,
+                "unread_count": row["unread_count"],
+            })
+        return items
+
     def assign_expert(self, db: Session, *, room_id: int, expert_id: int) -> ChatRoom:
         """Assign an expert to a chat room"""
         chat_room = self.get_chat_room(db, room_id=room_id)
         if chat_room:
+            previous_expert_id = chat_room.expert_id
             chat_room.expert_id = expert_id
             chat_room.updated_at = datetime.utcnow()
             db.commit()
             db.refresh(chat_room)
+            if chat_room.is_active:
+                expert_load_service.room_reassigned(previous_expert_id, expert_id)
+        return chat_room
+
+    def close_chat_room(self, db: Session, *, room_id: int) -> Optional[ChatRoom]:
+        """Deactivate a chat room and release its expert's slot"""
+        chat_room = self.get_chat_room(db, room_id=room_id)
+        if chat_room and chat_room.is_active:
+            chat_room.is_active = False
+            chat_room.updated_at = datetime.utcnow()
+            db.commit()
+            db.refresh(chat_room)
+            expert_load_service.room_released(chat_room.expert_id)
         return chat_room
+
     def get_available_experts(self, db: Session) -> List[User]:
         """Get all available experts"""
         query = select(User).where(User.role == UserRole.expert)
         result = db.execute(query)
         return list(result.scalars().all())
     
-    def find_least_busy_expert(self, db: Session) -> Optional[User]:
-        """Find the expert with the fewest active chat rooms"""
-        experts = self.get_available_experts(db)
-        if not experts:
-            print("No experts available in the system")
+    def find_least_busy_expert(self, db: Session, *, online_ids: Optional[Set[int]] = None) -> Optional[User]:
+        """Find the expert with the fewest active chat rooms
+
+        Uses the in-memory load map, so picking an expert costs no per-expert queries.
+        Experts in `online_ids` are preferred when given.
+        """
+        expert_id = expert_load_service.pick_expert_id(db, online_ids=online_ids)
+        if expert_id is None:
+            logger.warning("No experts available to assign")
             return None
-            
-        expert_load = {}
-        for expert in experts:
-            query = select(ChatRoom).where(
-                and_(
-                    ChatRoom.expert_id == expert.id,
-                    ChatRoom.is_active == True
-                )
-            )
-            result = db.execute(query)
-            expert_load[expert.id] = len(list(result.scalars().all()))
-            
-        if not expert_load:
-            # This should not happen, but just in case
-            print("Could not calculate expert load")
-            return experts[0]  # Return the first expert if we can't calculate load
-            
-        # Find expert with minimum load
-        min_load_expert_id = min(expert_load, key=expert_load.get)
-        expert = db.execute(select(User).where(User.id == min_load_expert_id)).scalar_one_or_none()
-        
-        print(f"Selected expert: {expert.username if expert else 'None'}")
-        return expert
+
+        return db.get(User, expert_id)
 
 
 class CRUDMessage:
     def create_message(self, db: Session, *, obj_in: MessageCreate) -> Message:
-        """Create a new message"""
+        """Create a new message and bump the chat room's updated_at in the same transaction"""
+        now = datetime.utcnow()
         db_obj = Message(
             type=obj_in.type,
             room_id=obj_in.room_id,
@@ -163,17 +299,15 @@ class CRUDMessage:
             image=obj_in.image,
             product_id=obj_in.product_id,
             office_id=obj_in.office_id,
+            created_at=now,
         )
         db.add(db_obj)
+        db.execute(update(ChatRoom).where(ChatRoom.id == obj_in.room_id).values(updated_at=now))
+        db.flush()
+        # Detach before committing so the returned message keeps its loaded values
+        # instead of being expired and re-selected on the next attribute access
+        db.expunge(db_obj)
         db.commit()
-        db.refresh(db_obj)
-        
-        # Update the chat room's updated_at timestamp
-        chat_room = db.execute(select(ChatRoom).where(ChatRoom.id == obj_in.room_id)).scalar_one_or_none()
-        if chat_room:
-            chat_room.updated_at = datetime.utcnow()
-            db.commit()
-            
         return db_obj
     
     def get_messages(self, db: Session, *, room_id: int, limit: int = 50, offset: int = 0) -> List[Message]:
@@ -206,30 +340,178 @@ class CRUDMessage:
         result = db.execute(query)
         return result.scalar()
     
-    def mark_messages_as_read(self, db: Session, *, room_id: int, user_id: int) -> int:
-        """Mark all messages in a chat room as read for a user"""
-        # Get all unread messages not sent by the user
-        query = select(Message).where(
+    def search_messages(
+        self,
+        db: Session,
+        *,
+        query: str,
+        expert_id: Optional[int] = None,
+        room_id: Optional[int] = None,
+        participant_id: Optional[int] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: int = 25,
+    ) -> List[dict]:
+        """Full-text search over text messages, best match first
+
+        Uses the tsvector column and GIN index on Postgres and the FTS5 table on SQLite
+        (see MESSAGE_SEARCH_DDL). expert_id limits results to that expert's rooms and
+        participant_id to rooms the user takes part in. `after` is the (rank, id) of the
+        last hit of the previous page. is_read comes from the read watermarks, as in the
+        room history.
+        """
+        # Read once any participant other than the sender has a watermark at or above it
+        is_read = exists().where(
+            ChatReadState.room_id == Message.room_id,
+            ChatReadState.user_id != Message.sender_id,
+            ChatReadState.last_read_message_id >= Message.id,
+        ).label("is_read")
+        if db.get_bind().dialect.name == "sqlite":
+            # Quote every term so user input can't inject FTS5 query syntax
+            terms = " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+            messages_fts = table("messages_fts", column("rowid"), column("rank"))
+            rank = (-messages_fts.c.rank).label("rank")  # FTS5 rank is bm25, lower is better
+            search = (
+                select(Message, rank, is_read)
+                .join(messages_fts, messages_fts.c.rowid == Message.id)
+                .where(literal_column("messages_fts").op("MATCH")(terms))
+            )
+        else:
+            search_vector = literal_column("messages.search_vector", type_=TSVECTOR)
+            ts_query = func.websearch_to_tsquery("simple", query)
+            # ts_rank_cd is a float4; as double precision it survives the round trip through
+            # the cursor exactly, so hits tied on rank at a page boundary compare equal
+            rank = cast(func.ts_rank_cd(search_vector, ts_query), DOUBLE_PRECISION).label("rank")
+            search = select(Message, rank, is_read).where(search_vector.op("@@")(ts_query))
+
+        search = search.join(ChatRoom, ChatRoom.id == Message.room_id).where(Message.type == "text")
+        if expert_id is not None:
+            search = search.where(ChatRoom.expert_id == expert_id)
+        if room_id is not None:
+            search = search.where(Message.room_id == room_id)
+        if participant_id is not None:
+            search = search.where(or_(ChatRoom.user_id == participant_id, ChatRoom.expert_id == participant_id))
+        if date_from is not None:
+            search = search.where(Message.created_at >= date_from)
+        if date_to is not None:
+            search = search.where(Message.created_at <= date_to)
+        if after is not None:
+            after_rank, after_id = after
+            rank_value = rank.element
+            search = search.where(
+                or_(rank_value < after_rank, and_(rank_value == after_rank, Message.id < after_id))
+            )
+        search = search.order_by(desc(rank.element), desc(Message.id)).limit(limit)
+
+        hits = []
+        for message, message_rank, message_is_read in db.execute(search).all():
+            hits.append({
+                "id": message.id,
+                "type": message.type,
+                "room_id": message.room_id,
+                "sender_id": message.sender_id,
+                "content": message.content,
+                "image": message.image,
+                "created_at": message.created_at,
+                "is_read": bool(message_is_read),
+                "product_id": message.product_id,
+                "office_id": message.office_id,
+                "rank": float(message_rank),
+            })
+        return hits
+
+    def mark_messages_as_read(self, db: Session, *, room_id: int, user_id: int, up_to_message_id: Optional[int] = None) -> int:
+        """Advance the user's read watermark for a chat room and return it
+
+        The watermark moves to the latest message in the room (or the latest one up to
+        up_to_message_id) with a single upsert, so the cost does not depend on how many
+        messages are unread. It never moves backwards.
+        """
+        latest_query = select(func.coalesce(func.max(Message.id), 0)).where(Message.room_id == room_id)
+        if up_to_message_id is not None:
+            latest_query = latest_query.where(Message.id <= up_to_message_id)
+
+        now = datetime.utcnow()
+        stmt = dialect_insert(db, ChatReadState).values(
+            room_id=room_id,
+            user_id=user_id,
+            last_read_message_id=latest_query.scalar_subquery(),
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ChatReadState.room_id, ChatReadState.user_id],
+            set_={
+                "last_read_message_id": case(
+                    (stmt.excluded.last_read_message_id > ChatReadState.last_read_message_id,
+                     stmt.excluded.last_read_message_id),
+                    else_=ChatReadState.last_read_message_id,
+                ),
+                "updated_at": now,
+            },
+        ).returning(ChatReadState.last_read_message_id)
+
+        watermark = db.execute(stmt).scalar_one()
+        db.commit()
+        return watermark
+
+    def get_read_watermarks(self, db: Session, *, room_id: int) -> Dict[int, int]:
+        """Get user_id -> last read message ID for everyone who has read in a chat room"""
+        query = select(ChatReadState.user_id, ChatReadState.last_read_message_id).where(
+            ChatReadState.room_id == room_id
+        )
+        return {user_id: message_id for user_id, message_id in db.execute(query).all()}
+
+    def count_unread_messages(self, db: Session, *, room_id: int, user_id: int) -> int:
+        """Count messages from other participants above the user's read watermark"""
+        watermark = select(ChatReadState.last_read_message_id).where(
+            and_(
+                ChatReadState.room_id == room_id,
+                ChatReadState.user_id == user_id
+            )
+        ).scalar_subquery()
+        query = select(func.count(Message.id)).where(
             and_(
                 Message.room_id == room_id,
                 Message.sender_id != user_id,
-                Message.is_read == False
+                Message.id > func.coalesce(watermark, 0)
             )
         )
-        result = db.execute(query)
-        messages = list(result.scalars().all())
-        
-        # Mark messages as read
-        count = 0
+        return db.execute(query).scalar()
+
+    def apply_read_state(self, messages: List[Message], watermarks: Dict[int, int]) -> List[Message]:
+        """Set is_read on loaded messages from the room's read watermarks
+
+        A message counts as read once any participant other than its sender has a
+        watermark at or above it. The flag is derived for the response only.
+        """
         for message in messages:
-            message.is_read = True
-            count += 1
-            
-        if count > 0:
-            db.commit()
-            
-        return count
-    
+            message.is_read = self._is_read(message.id, message.sender_id, watermarks)
+        return messages
+
+    def _is_read(self, message_id: int, sender_id: int, watermarks: Dict[int, int]) -> bool:
+        return any(
+            last_read_id >= message_id
+            for reader_id, last_read_id in watermarks.items()
+            if reader_id != sender_id
+        )
+
+    def count_archived_messages(self, *, room_id: int) -> int:
+        """Count the messages of a room moved to the message archive"""
+        return message_archive.count_messages(room_id)
+
+    def get_archived_messages(
+        self, *, room_id: int, skip: int = 0, limit: int = 50, watermarks: Optional[Dict[int, int]] = None
+    ) -> List[dict]:
+        """Get archived messages of a room, newest first, with is_read derived from the watermarks"""
+        messages = message_archive.read_messages(room_id, skip=skip, limit=limit)
+        for message in messages:
+            message["is_read"] = self._is_read(message["id"], message["sender_id"], watermarks or {})
+            # Product/office details aren't archived, clients fall back to the ids
+            message.setdefault("product", None)
+            message.setdefault("office", None)
+        return messages
+
     def get_chat_room_users(self, db: Session, *, room_id: int) -> List[User]:
         """Get all users in a chat room (user and expert)"""
         chat_room = self.get_chat_room(db, room_id=room_id)
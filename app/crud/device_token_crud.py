@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete, update
+from sqlalchemy.orm import Session
+
+from app.database.upsert import dialect_insert
+from app.models.device_token import DeviceToken
+from app.models.user import User
+
+
+class DeviceTokenCRUD:
+    def register(self, db: Session, *, user_id: int, token: str, platform: Optional[str] = None):
+        """Add or refresh a device token without committing
+
+        A token belongs to one device, so registering it for another user (account
+        switch on the same phone) moves it.
+        """
+        now = datetime.utcnow()
+        statement = dialect_insert(db, DeviceToken).values(
+            user_id=user_id, token=token, platform=platform, created_at=now, last_seen_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[DeviceToken.token],
+            set_={
+                "user_id": statement.excluded.user_id,
+                "platform": statement.excluded.platform,
+                "last_seen_at": statement.excluded.last_seen_at,
+            },
+        )
+        db.execute(statement)
+
+    def get_tokens_for_user(self, db: Session, *, user_id: int) -> List[str]:
+        query = select(DeviceToken.token).where(DeviceToken.user_id == user_id).order_by(DeviceToken.id)
+        return list(db.execute(query).scalars().all())
+
+    def get_tokens_for_users(self, db: Session, *, user_ids: Iterable[int]) -> Dict[int, List[str]]:
+        """Get the tokens of many users with a single query"""
+        user_ids = list(user_ids)
+        tokens: Dict[int, List[str]] = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return tokens
+        query = (
+            select(DeviceToken.user_id, DeviceToken.token)
+            .where(DeviceToken.user_id.in_(user_ids))
+            .order_by(DeviceToken.id)
+        )
+        for user_id, token in db.execute(query).all():
+            tokens[user_id].append(token)
+        return tokens
+
+    def prune(self, db: Session, *, tokens: Iterable[str]) -> int:
+        """Delete tokens FCM reported as unregistered, without committing"""
+        tokens = list(set(tokens))
+        if not tokens:
+            return 0
+        db.execute(delete(DeviceToken).where(DeviceToken.token.in_(tokens)))
+        # Keep the legacy single-token column from pointing at a dead token
+        db.execute(update(User).where(User.fcm_token.in_(tokens)).values(fcm_token=None))
+        return len(tokens)
+
+    def prune_stale(self, db: Session, *, older_than_days: int) -> int:
+        """Delete tokens not re-registered within the given number of days"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        stale_tokens = list(db.execute(select(DeviceToken.token).where(DeviceToken.last_seen_at < cutoff)).scalars().all())
+        pruned = self.prune(db, tokens=stale_tokens)
+        db.commit()
+        return pruned
+
+
+device_token_crud = DeviceTokenCRUD()
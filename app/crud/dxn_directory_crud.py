@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
+from app.core.cache import shared_office_cache
 from app.models.dxn_directory import DXNDirectory
 from app.schemas.dxn_directory_schema import DXNDirectoryCreate, DXNDirectoryUpdate
 from fastapi import HTTPException
@@ -24,6 +25,7 @@ class DXNDirectoryCRUD:
             setattr(entry, key, value)
         db.commit()
         db.refresh(entry)
+        shared_office_cache.invalidate(entry_id)
         return entry
 
     def delete(self, db: Session, entry_id: int):
@@ -31,6 +33,7 @@ class DXNDirectoryCRUD:
         if entry:
             db.delete(entry)
             db.commit()
+            shared_office_cache.invalidate(entry_id)
         return entry
 
     def search_filter_paginate(self, db: Session, search: Optional[str], filters: dict, skip: int, limit: int) -> List[DXNDirectory]:
@@ -1,11 +1,22 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, case, func, and_, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from app.models.notifications import Notifications
+from app.database.upsert import dialect_insert
+from app.models.notifications import Notifications, NotificationCounter
 from app.schemas.notification_schema import NotificationCreate
 
 class NotificationCRUD:
-    def create(self, db: Session, obj_in: NotificationCreate):
+    def create(self, db: Session, obj_in: NotificationCreate, commit: bool = True):
         notification = Notifications(**obj_in.model_dump())
         db.add(notification)
+        self.increment_unread(db, {notification.target_user_id: 1})
+        if not commit:
+            # Leave the transaction open so the caller can write related rows atomically
+            db.flush()
+            return notification
         db.commit()
         db.refresh(notification)
         return notification
@@ -27,12 +38,139 @@ class NotificationCRUD:
     def count_for_user(self, db: Session, user_id: int):
         return db.query(Notifications).filter(Notifications.target_user_id == user_id).count()
 
+    def get_page_for_user(
+        self,
+        db: Session,
+        user_id: int,
+        *,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 25,
+    ) -> List[Notifications]:
+        """Get a user's notifications newest first, keyset-paged on (created_at, id)
+
+        Pass the (created_at, id) of the last notification of the previous page as `before`.
+        """
+        query = (
+            select(Notifications)
+            .options(joinedload(Notifications.sender))
+            .where(Notifications.target_user_id == user_id)
+        )
+        if before is not None:
+            before_created_at, before_id = before
+            query = query.where(
+                or_(
+                    Notifications.created_at < before_created_at,
+                    and_(Notifications.created_at == before_created_at, Notifications.id < before_id)
+                )
+            )
+        query = query.order_by(Notifications.created_at.desc(), Notifications.id.desc()).limit(limit)
+        return list(db.execute(query).scalars().all())
+
+    def get_unread_in_group(self, db: Session, user_id: int, group_key: str) -> Optional[Notifications]:
+        """Get the user's latest unread notification of a group, locked for folding another event in"""
+        return db.query(Notifications).filter(
+            Notifications.target_user_id == user_id,
+            Notifications.group_key == group_key,
+            Notifications.is_read == False
+        ).order_by(Notifications.id.desc()).with_for_update().first()
+
+    def create_in_group(
+        self, db: Session, obj_in: NotificationCreate, *, group_key: str, group_count: int = 1
+    ) -> Optional[Notifications]:
+        """Create the first unread notification of a group, without committing
+
+        Returns None when a concurrent event created the group's unread notification
+        first; the unique index on unread groups rejects the second one.
+        """
+        notification = Notifications(**obj_in.model_dump(), group_key=group_key, group_count=group_count)
+        try:
+            with db.begin_nested():
+                db.add(notification)
+                db.flush()
+        except IntegrityError:
+            return None
+        self.increment_unread(db, {notification.target_user_id: 1})
+        return notification
+
+    def get_unread_count(self, db: Session, user_id: int) -> int:
+        """Read the maintained unread counter, a primary key lookup"""
+        count = db.execute(
+            select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+        ).scalar()
+        return count or 0
+
+    def increment_unread(self, db: Session, counts: Dict[int, int]):
+        """Add new unread notifications to the users' counters, without committing"""
+        if not counts:
+            return
+        # Sorted so concurrent writers lock counter rows in the same order
+        rows = [{"user_id": user_id, "unread_count": count} for user_id, count in sorted(counts.items())]
+        statement = dialect_insert(db, NotificationCounter).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={"unread_count": NotificationCounter.unread_count + statement.excluded.unread_count},
+        )
+        db.execute(statement)
+
+    def decrement_unread(self, db: Session, user_id: int, count: int):
+        """Take notifications that were read or deleted off the user's counter, without committing"""
+        if count <= 0:
+            return
+        db.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread_count=case(
+                (NotificationCounter.unread_count > count, NotificationCounter.unread_count - count),
+                else_=0
+            ))
+        )
+
+    def mark_read(self, db: Session, notification_id: int, user_id: int) -> Optional[Notifications]:
+        """Mark one of the user's notifications as read; None if it isn't theirs"""
+        result = db.execute(
+            update(Notifications)
+            .where(
+                and_(
+                    Notifications.id == notification_id,
+                    Notifications.target_user_id == user_id,
+                    Notifications.is_read == False
+                )
+            )
+            .values(is_read=True, read_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        self.decrement_unread(db, user_id, result.rowcount)
+        db.commit()
+        notification = self.get(db, notification_id)
+        if notification is None or notification.target_user_id != user_id:
+            return None
+        db.refresh(notification)
+        return notification
+
+    def mark_all_read(self, db: Session, user_id: int) -> int:
+        """Mark all of the user's unread notifications as read with one UPDATE; returns how many"""
+        result = db.execute(
+            update(Notifications)
+            .where(and_(Notifications.target_user_id == user_id, Notifications.is_read == False))
+            .values(is_read=True, read_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        # Decrement by what this statement changed rather than zeroing, so a notification
+        # inserted concurrently stays counted
+        self.decrement_unread(db, user_id, result.rowcount)
+        db.commit()
+        return result.rowcount
+
     def update(self, db: Session, notification_id: int, obj_in: NotificationCreate):
         notification = self.get(db, notification_id)
         if not notification:
             return None
+        previous_target_id = notification.target_user_id
         for key, value in obj_in.model_dump().items():
             setattr(notification, key, value)
+        if not notification.is_read and notification.target_user_id != previous_target_id:
+            self.decrement_unread(db, previous_target_id, 1)
+            self.increment_unread(db, {notification.target_user_id: 1})
         db.commit()
         db.refresh(notification)
         return notification
@@ -40,6 +178,8 @@ class NotificationCRUD:
     def delete(self, db: Session, notification_id: int):
         notification = self.get(db, notification_id)
         if notification:
+            if not notification.is_read:
+                self.decrement_unread(db, notification.target_user_id, 1)
             db.delete(notification)
             db.commit()
         return notification
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.orm import Session
+
+from app.models.notification_outbox import NotificationOutbox
+from app.crud.device_token_crud import device_token_crud
+
+
+class NotificationOutboxCRUD:
+    def enqueue(
+        self,
+        db: Session,
+        *,
+        token: str,
+        title: str,
+        body: str,
+        data: Optional[Dict[str, str]] = None,
+        notification_id: Optional[int] = None,
+        collapse_key: Optional[str] = None,
+        delay_seconds: float = 0,
+    ) -> NotificationOutbox:
+        """Add a push to the outbox without committing, so it shares the caller's transaction"""
+        row = NotificationOutbox(
+            notification_id=notification_id,
+            token=token,
+            title=title,
+            body=body,
+            data=json.dumps(data or {}),
+            collapse_key=collapse_key,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        )
+        db.add(row)
+        return row
+
+    def update_pending(
+        self, db: Session, *, notification_id: int, title: str, body: str, data: Optional[Dict[str, str]] = None
+    ) -> int:
+        """Rewrite the not yet claimed pushes of a notification; returns how many were updated"""
+        result = db.execute(
+            update(NotificationOutbox)
+            .where(and_(NotificationOutbox.notification_id == notification_id, NotificationOutbox.status == "pending"))
+            .values(title=title, body=body, data=json.dumps(data or {}))
+        )
+        return result.rowcount
+
+    def claim_batch(self, db: Session, *, limit: int, lease_seconds: int) -> List[NotificationOutbox]:
+        """Claim due rows for delivery, including rows whose previous claim expired
+
+        On Postgres the candidate rows are locked with SKIP LOCKED so concurrent workers
+        (and processes) never claim the same row.
+        """
+        now = datetime.utcnow()
+        due = (
+            select(NotificationOutbox.id)
+            .where(
+                or_(
+                    and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+                    and_(NotificationOutbox.status == "sending", NotificationOutbox.locked_until < now),
+                )
+            )
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due.scalar_subquery()))
+            .values(
+                status="sending",
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=NotificationOutbox.attempts + 1,
+            )
+            .returning(NotificationOutbox)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        # Detach before committing so the rows stay readable while they are being sent
+        for row in claimed:
+            db.expunge(row)
+        db.commit()
+        return list(claimed)
+
+    def mark_sent(self, db: Session, *, ids: List[int]):
+        if ids:
+            db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(ids))
+                .values(status="sent", sent_at=datetime.utcnow(), locked_until=None, last_error=None)
+            )
+
+    def mark_retry(self, db: Session, *, id: int, error: Optional[str], delay_seconds: float, count_attempt: bool = True):
+        """Put a row back to pending, due after the delay"""
+        values = {
+            "status": "pending",
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay_seconds),
+            "locked_until": None,
+            "last_error": error,
+        }
+        if not count_attempt:
+            values["attempts"] = NotificationOutbox.attempts - 1
+        db.execute(update(NotificationOutbox).where(NotificationOutbox.id == id).values(**values))
+
+    def mark_dead(self, db: Session, *, id: int, error: Optional[str]):
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id == id)
+            .values(status="dead", locked_until=None, last_error=error)
+        )
+
+    def prune_tokens(self, db: Session, *, tokens: List[str]):
+        """Forget tokens that FCM reported as unregistered, and drop their pending pushes"""
+        if not tokens:
+            return
+        device_token_crud.prune(db, tokens=tokens)
+        db.execute(
+            update(NotificationOutbox)
+            .where(and_(NotificationOutbox.token.in_(tokens), NotificationOutbox.status == "pending"))
+            .values(status="dead", last_error="Token unregistered")
+        )
+
+    def count_by_status(self, db: Session, *, campaign_id: Optional[int] = None) -> Dict[str, int]:
+        query = select(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(NotificationOutbox.status)
+        if campaign_id is not None:
+            query = query.where(NotificationOutbox.campaign_id == campaign_id)
+        return {status: count for status, count in db.execute(query).all()}
+
+
+notification_outbox_crud = NotificationOutboxCRUD()
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.models.password_reset_tokens import PasswordResetTokens
+
+
+class PasswordResetTokenCRUD:
+    def delete_expired(self, db: Session) -> int:
+        """Delete reset codes past their expiry"""
+        deleted = db.execute(
+            delete(PasswordResetTokens).where(PasswordResetTokens.expires_at < datetime.utcnow())
+        ).rowcount
+        db.commit()
+        return deleted
+
+
+password_reset_token_crud = PasswordResetTokenCRUD()
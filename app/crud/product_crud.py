@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import select, or_, func
+from app.core.cache import shared_product_cache
 from app.models.product import Product, ProductCategory
 from app.schemas.product_schema import ProductCreate, ProductUpdate, ProductCategoryCreate
 from fastapi import HTTPException
@@ -253,6 +254,7 @@ class ProductCRUD:
         
         db.commit()
         db.refresh(product)
+        shared_product_cache.invalidate(product_id)
         return product
     
     def delete_product(self, db: Session, product_id: int):
@@ -262,6 +264,7 @@ class ProductCRUD:
         
         db.delete(product)
         db.commit()
+        shared_product_cache.invalidate(product_id)
     
     def update_stock(self, db: Session, product_id: int, quantity: int) -> Product:
         """Update product stock quantity"""
@@ -284,6 +287,7 @@ class ProductCRUD:
         
         db.commit()
         db.refresh(product)
+        shared_product_cache.invalidate(product_id)
         return product
 
 
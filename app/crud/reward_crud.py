@@ -1,11 +1,14 @@
+import logging
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy import select, update, func, and_, or_
 from fastapi import HTTPException
 
 from app.models.user_rewards import UserReward, RewardType, RewardStatus, RewardTimeType
 from app.models.referrals import Referrals
 
+logger = logging.getLogger(__name__)
+
 
 class CRUDReward:
     """CRUD operations for user rewards system"""
@@ -57,21 +60,33 @@ class CRUDReward:
         result = db.execute(query)
         return result.scalars().all()
     
+    def _active_condition(self, now: datetime):
+        # Rewards past expires_at count as expired even before the reward_expiry job flips their status
+        return and_(
+            UserReward.status == RewardStatus.active,
+            or_(UserReward.expires_at.is_(None), UserReward.expires_at > now)
+        )
+
     def get_active_rewards(self, db: Session, *, user_id: int):
         """Get only active, non-expired rewards for a user"""
-        rewards = self.get_user_rewards(db, user_id=user_id, active_only=True)
-        
-        # Filter out expired rewards and update their status
-        active_rewards = []
-        for reward in rewards:
-            if reward.is_expired:
-                reward.mark_as_expired()
-                db.commit()
-            elif reward.is_active:
-                active_rewards.append(reward)
-        
-        return active_rewards
+        query = select(UserReward).where(
+            UserReward.user_id == user_id,
+            self._active_condition(datetime.utcnow())
+        ).order_by(UserReward.id)
+        return db.execute(query).scalars().all()
     
+    def expire_rewards(self, db: Session) -> int:
+        """Mark every active reward past its expiry as expired in one UPDATE"""
+        now = datetime.utcnow()
+        expired = db.execute(
+            update(UserReward)
+            .where(UserReward.status == RewardStatus.active, UserReward.expires_at < now)
+            .values(status=RewardStatus.expired)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return expired
+
     def use_reward(self, db: Session, *, reward_id: int, user_id: int) -> UserReward:
         """Mark a reward as used"""
         query = select(UserReward).where(
@@ -95,17 +110,39 @@ class CRUDReward:
         db.refresh(reward)
         return reward
     
-    def get_reward_summary(self, db: Session, *, user_id: int) -> dict:
-        """Get a summary of user's rewards with flexible time units"""
-        all_rewards = self.get_user_rewards(db, user_id=user_id)
-        active_rewards = self.get_active_rewards(db, user_id=user_id)
+    def get_reward_summary(self, db: Session, *, user_id: int, include_rewards: bool = True) -> dict:
+        """Get a summary of user's rewards with flexible time units
+
+        The counts and time totals are conditional aggregates over the user's rewards;
+        with `include_rewards` the active rewards are outer-joined to them, so either
+        way it's a single statement.
+        """
+        active = self._active_condition(datetime.utcnow())
+        totals = select(
+            func.count(UserReward.id).label("total_rewards"),
+            func.count(UserReward.id).filter(active).label("active_rewards"),
+            func.coalesce(
+                func.sum(UserReward.reward_time).filter(and_(active, UserReward.reward_time_type == RewardTimeType.hour)), 0
+            ).label("total_hours"),
+            func.coalesce(
+                func.sum(UserReward.reward_time).filter(and_(active, UserReward.reward_time_type == RewardTimeType.day)), 0
+            ).label("total_days"),
+        ).where(UserReward.user_id == user_id)
+
+        if include_rewards:
+            totals = totals.subquery()
+            rows = db.execute(
+                select(totals, UserReward)
+                .select_from(totals)
+                .outerjoin(UserReward, and_(UserReward.user_id == user_id, active))
+                .order_by(UserReward.id)
+            ).all()
+            summary = rows[0]
+            active_rewards = [row.UserReward for row in rows if row.UserReward is not None]
+        else:
+            summary = db.execute(totals).one()
+            active_rewards = []
 
-        # Calculate total time by type
-        total_hours = sum(reward.reward_time for reward in active_rewards 
-                         if reward.reward_time_type == RewardTimeType.hour and reward.reward_time is not None)
-        total_days = sum(reward.reward_time for reward in active_rewards 
-                        if reward.reward_time_type == RewardTimeType.day and reward.reward_time is not None)
-        
         # Format rewards for display
         formatted_rewards = []
         for reward in active_rewards:
@@ -120,14 +157,16 @@ class CRUDReward:
                 })
             except Exception as e:
                 # Skip problematic rewards and log the error
-                print(f"Error formatting reward {reward.id}: {str(e)}")
+                logger.warning("Skipping unformattable reward", extra={"reward_id": reward.id, "error": str(e)})
                 continue
         
         return {
-            "total_rewards": len(all_rewards),
-            "active_rewards": len(active_rewards),
-            "total_reward_time_hours": total_hours,
-            "total_reward_time_days": total_days,
+            "total_rewards": summary.total_rewards,
+            "active_rewards": summary.active_rewards,
+            "total_reward_time_hours": summary.total_hours,
+            "total_reward_time_days": summary.total_days,
+            # Whole days of discount, counting hour rewards too
+            "total_discount_days_available": summary.total_days + summary.total_hours // 24,
             "rewards": formatted_rewards
         }
     
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.scheduled_job_run import ScheduledJobRun
+
+
+class ScheduledJobRunCRUD:
+    def start(
+        self, db: Session, *, job_name: str, scheduled_for: datetime, worker: str, triggered_by: str = "schedule"
+    ) -> Optional[ScheduledJobRun]:
+        """Record the start of a run; None if the slot was already taken by another worker"""
+        run = ScheduledJobRun(
+            job_name=job_name,
+            scheduled_for=scheduled_for,
+            triggered_by=triggered_by,
+            status="running",
+            worker=worker,
+            started_at=datetime.utcnow(),
+        )
+        db.add(run)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        db.refresh(run)
+        return run
+
+    def finish(
+        self, db: Session, run: ScheduledJobRun, *, status: str, result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> ScheduledJobRun:
+        run.status = status
+        run.result = json.dumps(result, default=str) if result is not None else None
+        run.error = error
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = int((run.finished_at - run.started_at).total_seconds() * 1000)
+        db.commit()
+        db.refresh(run)
+        return run
+
+    def get_runs(self, db: Session, *, job_name: str, limit: int = 20) -> List[ScheduledJobRun]:
+        query = (
+            select(ScheduledJobRun)
+            .where(ScheduledJobRun.job_name == job_name)
+            .order_by(ScheduledJobRun.started_at.desc())
+            .limit(limit)
+        )
+        return list(db.execute(query).scalars().all())
+
+    def get_last_runs(self, db: Session) -> Dict[str, ScheduledJobRun]:
+        """Latest run of every job, keyed by job name"""
+        latest = (
+            select(ScheduledJobRun.job_name, func.max(ScheduledJobRun.id).label("id"))
+            .group_by(ScheduledJobRun.job_name)
+            .subquery()
+        )
+        runs = db.execute(select(ScheduledJobRun).join(latest, latest.c.id == ScheduledJobRun.id)).scalars().all()
+        return {run.job_name: run for run in runs}
+
+    def prune(self, db: Session, *, older_than_days: int) -> int:
+        """Delete run history older than the given number of days"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        deleted = db.execute(delete(ScheduledJobRun).where(ScheduledJobRun.started_at < cutoff)).rowcount
+        db.commit()
+        return deleted
+
+    def to_out(self, run: ScheduledJobRun) -> Dict[str, Any]:
+        return {
+            "id": run.id,
+            "job_name": run.job_name,
+            "scheduled_for": run.scheduled_for,
+            "triggered_by": run.triggered_by,
+            "status": run.status,
+            "worker": run.worker,
+            "result": json.loads(run.result) if run.result else None,
+            "error": run.error,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "duration_ms": run.duration_ms,
+        }
+
+
+scheduled_job_run_crud = ScheduledJobRunCRUD()
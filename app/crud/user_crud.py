@@ -1,3 +1,5 @@
+import logging
+from typing import Optional
 from fastapi import HTTPException
 from sqlalchemy import select
 from sqlalchemy.orm import Session
@@ -7,6 +9,10 @@ from app.schemas.auth_schema import AdminLogin
 from app.schemas.user_schema import UserCreate, ExpertCreate, ExpertUpdate, ProfileUpdateRequest
 from app.utils.referral_code_generator import generate_referral_code
 from app.utils.country_utils import CountryValidator
+from app.services.expert_load_service import expert_load_service
+from app.crud.device_token_crud import device_token_crud
+
+logger = logging.getLogger(__name__)
 
 class CRUDUser:
     def create_user(self, db: Session, *, obj_in: UserCreate):
@@ -52,21 +58,17 @@ class CRUDUser:
         return db_obj
 
     def authenticate_admin(self,db: Session, username: str, password: str):
-        print("Authenticating admin with email:", username)
         user = self.get_by_email(db, email=username)
-        print("User found by email:", user is not None)
         if not user:
-            print("No user found with this email")
+            logger.info("Admin login failed", extra={"reason": "unknown_email"})
             return None
-        print("User role:", user.role)
-        print("Verifying password")
         if not verify_password(password, user.password_hash):
-            print("Password verification failed")
+            logger.info("Admin login failed", extra={"reason": "bad_password", "user_id": user.id})
             return None
         if user.role != UserRole.admin:
-            print("User is not an admin")
+            logger.warning("Admin login failed", extra={"reason": "not_admin", "user_id": user.id})
             return None
-        print("Admin authentication successful")
+        logger.info("Admin authenticated", extra={"user_id": user.id})
         return user
     def get_by_email(self, db: Session, *, email: str):
         query = select(User).where(User.email == email)
@@ -95,17 +97,18 @@ class CRUDUser:
         return result.scalar()
     def delete_user(self, db: Session, *, user_id: int):
         query = select(User).where(User.id == user_id)
-        print(query)
         result = db.execute(query)
         user = result.scalar_one_or_none()
         if user is None:
             raise HTTPException(400, "User not found")
         return user
-    def update_fcm_token(self, db: Session, *, user_id: int, fcm_token: str):
+    def update_fcm_token(self, db: Session, *, user_id: int, fcm_token: str, platform: Optional[str] = None):
+        """Register the token of one of the user's devices; `fcm_token` keeps the latest one"""
         user = self.get_user_by_id(db, user_id=user_id)
         if user is None:
             raise HTTPException(400, "User not found")
         user.fcm_token = fcm_token
+        device_token_crud.register(db, user_id=user.id, token=fcm_token, platform=platform)
         db.commit()
         return user
         
@@ -118,6 +121,8 @@ class CRUDUser:
         for field, value in update_data.items():
             if hasattr(user, field) and value is not None:
                 setattr(user, field, value)
+        if update_data.get("fcm_token"):
+            device_token_crud.register(db, user_id=user.id, token=update_data["fcm_token"])
                 
         db.commit()
         db.refresh(user)
@@ -181,6 +186,7 @@ class CRUDUser:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        expert_load_service.expert_added(db_obj.id)
         return db_obj
     def get_all_experts(self, db: Session, skip: int = 0, limit: int = 100):
         query = select(User).where(User.role == UserRole.expert).order_by(User.id).offset(skip).limit(limit)
@@ -235,6 +241,7 @@ class CRUDUser:
         
         db.delete(expert)
         db.commit()
+        expert_load_service.expert_removed(expert_id)
         return expert
 
 user_crud = CRUDUser()
\ No newline at end of file
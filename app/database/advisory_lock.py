@@ -0,0 +1,46 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def advisory_lock_key(name: str) -> int:
+    """Stable signed 64-bit key for a lock name, the argument type of pg_try_advisory_lock"""
+    return int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big", signed=True)
+
+
+@contextmanager
+def try_advisory_lock(engine: Engine, name: str) -> Iterator[bool]:
+    """Try to take a lock named `name` shared by every process on the database; yields whether it was taken
+
+    On Postgres this is a session-level advisory lock held on a dedicated connection,
+    so it is released even if the process dies. Other databases only get a lock local
+    to this process, which is enough for single-process development setups.
+    """
+    if engine.dialect.name != "postgresql":
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    key = advisory_lock_key(name)
+    with engine.connect() as connection:
+        acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        connection.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                connection.commit()
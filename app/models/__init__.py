@@ -1,26 +1,37 @@
 # Import all models to ensure they are registered with SQLAlchemy
 from app.models.user import User
-from app.models.chat import ChatRoom, Message
+from app.models.chat import ChatRoom, Message, ChatReadState
 from app.models.dxn_directory import DXNDirectory
 from app.models.fact import Fact
 from app.models.feed import FeedCategory, FeedItem
-from app.models.notifications import Notifications
+from app.models.notifications import Notifications, NotificationCounter
+from app.models.notification_outbox import NotificationOutbox
+from app.models.notification_campaign import NotificationCampaign
+from app.models.device_token import DeviceToken
 from app.models.password_reset_tokens import PasswordResetTokens
 from app.models.product import ProductCategory, Product
 from app.models.referrals import Referrals
 from app.models.user_rewards import UserReward
 from app.models.challenge import Challenge, UserChallenge
 from app.models.wellness import Wellness
+from app.models.scheduled_job_run import ScheduledJobRun
+from app.models.catalog_version import CatalogVersion
+from app.models.challenge_ranking import ChallengeRanking
 
 __all__ = [
     "User",
     "ChatRoom", 
     "Message",
+    "ChatReadState",
     "DxnDirectory",
     "Fact",
     "FeedCategory",
     "FeedItem", 
     "Notification",
+    "NotificationCounter",
+    "NotificationOutbox",
+    "NotificationCampaign",
+    "DeviceToken",
     "PasswordResetToken",
     "ProductCategory",
     "Product",
@@ -28,5 +39,8 @@ __all__ = [
     "UserReward",
     "Challenge",
     "UserChallenge",
-    "Wellness"
+    "Wellness",
+    "ScheduledJobRun",
+    "CatalogVersion",
+    "ChallengeRanking"
 ]
\ No newline at end of file
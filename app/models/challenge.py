@@ -1,10 +1,13 @@
+import logging
 from datetime import datetime, timedelta, date
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey, Enum as SQLAEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, Float, ForeignKey, Index, Enum as SQLAEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from enum import Enum
 from app.database.base import Base
 from app.models.user_rewards import UserReward
 
+logger = logging.getLogger(__name__)
+
 
 class ChallengeType(str, Enum):
     gut = "gut"  
@@ -22,6 +25,17 @@ class ChallengeStatus(str, Enum):
     completed = "completed"
 
 
+def progress_display_text(current_count: int, total_count: int, duration_type: DurationType) -> str:
+    """Progress display text (e.g. '5/7 days')"""
+    if duration_type == DurationType.minute:
+        unit = "minute" if total_count == 1 else "minutes"
+    elif duration_type == DurationType.hour:
+        unit = "hour" if total_count == 1 else "hours"
+    else:  # day
+        unit = "day" if total_count == 1 else "days"
+    return f"{current_count}/{total_count} {unit}"
+
+
 class Challenge(Base):
     """Admin-created challenge templates"""
     __tablename__ = "challenges"
@@ -77,6 +91,9 @@ class Challenge(Base):
 class UserChallenge(Base):
     """User's participation in a challenge"""
     __tablename__ = "user_challenges"
+    __table_args__ = (
+        Index("ix_user_challenges_user_id_status", "user_id", "status"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
@@ -99,41 +116,6 @@ class UserChallenge(Base):
     challenge = relationship("Challenge", back_populates="user_challenges")
     user = relationship("User")
     
-    def update_progress(self) -> dict:
-        """Update progress manually (action-based)"""
-        if self.status != ChallengeStatus.active:
-            return {"success": False, "message": "Challenge is not active"}
-        
-        now = datetime.utcnow()
-        current_date = now.date()
-        current_hour = now.hour
-        
-        # Check if progress already updated for this period
-        if self.challenge.duration_type == DurationType.day:
-            if self.last_progress_date == current_date:
-                return {"success": False, "message": "Progress for today is already updated"}
-        elif self.challenge.duration_type == DurationType.hour:
-            if (self.last_progress_date == current_date and 
-                self.last_progress_hour == current_hour):
-                return {"success": False, "message": "Progress for this hour is already updated"}
-        
-        # Update progress
-        self.current_progress += 1
-        self.last_progress_date = current_date
-        if self.challenge.duration_type == DurationType.hour:
-            self.last_progress_hour = current_hour
-        
-        # Calculate percentage
-        self.progress_percentage = min((self.current_progress / self.challenge.duration) * 100, 100.0)
-        # Auto-complete if target reached
-        if self.current_progress >= self.challenge.duration:
-            self.status = ChallengeStatus.completed
-            self.completed_at = datetime.utcnow()
-            
-            return {"success": True, "message": "Challenge completed! 🎉", "completed": True}
-        
-        return {"success": True, "message": "Progress updated successfully!", "completed": False}
-    
     @property
     def remaining_actions(self) -> int:
         """Get remaining actions needed to complete challenge"""
@@ -149,19 +131,9 @@ class UserChallenge(Base):
                 return "0/0 days"
                 
             # Now current_progress is the number of completed actions, not seconds
-            current_count = self.current_progress
-            total_count = self.challenge.duration
-            
-            if self.challenge.duration_type == DurationType.minute:
-                unit = "minute" if total_count == 1 else "minutes"
-            elif self.challenge.duration_type == DurationType.hour:
-                unit = "hour" if total_count == 1 else "hours"
-            else:  # day
-                unit = "day" if total_count == 1 else "days"
-                
-            return f"{current_count}/{total_count} {unit}"
+            return progress_display_text(self.current_progress, self.challenge.duration, self.challenge.duration_type)
         except Exception as e:
-            print(f"Error in progress_display_text: {e}")
+            logger.warning("Failed to build progress_display_text", extra={"user_challenge_id": self.id, "error": str(e)})
             return "0/0 days"
     
     @property
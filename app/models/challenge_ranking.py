@@ -0,0 +1,39 @@
+from datetime import datetime, date
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Integer, String, Date, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.base import Base
+
+GLOBAL_SCOPE = "global"
+
+
+class LeaderboardMetric(str, Enum):
+    completions = "completions"
+    streak = "streak"
+    progress = "progress"
+
+
+class ChallengeRanking(Base):
+    """Leaderboard scores of a user, per challenge type and across all of them
+
+    `scope` is a challenge type or "global". Rows are updated with every progress
+    update and completion, and rebuilt from user_challenges by a scheduled job.
+    """
+    __tablename__ = "challenge_rankings"
+    __table_args__ = (
+        Index("ix_challenge_rankings_scope_completions", "scope", "completions", "user_id"),
+        Index("ix_challenge_rankings_scope_current_streak", "scope", "current_streak", "user_id"),
+        Index("ix_challenge_rankings_scope_progress", "scope", "progress", "user_id"),
+        Index("ix_challenge_rankings_updated_at", "updated_at"),  # Rows each worker's rank indexes haven't seen
+    )
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    completions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    progress: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Progress actions across challenges
+    current_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Consecutive days with progress
+    last_active_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)  # Last day of the streak
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
 
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Text, Boolean, Index, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.base import Base
@@ -10,6 +10,11 @@ from app.models.user import User
 
 class ChatRoom(Base):
     __tablename__ = "chat_rooms"
+    __table_args__ = (
+        # Inbox keyset paging by most recent activity
+        Index("ix_chat_rooms_expert_active_updated", "expert_id", "is_active", "updated_at", "id"),
+        Index("ix_chat_rooms_active_updated", "is_active", "updated_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=True)  # Optional name for the chat room
@@ -27,6 +32,9 @@ class ChatRoom(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_room_id_id", "room_id", "id"),  # Room history and unread counts by watermark
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     type: Mapped[str] = mapped_column(String, nullable=False)  # text, audio, image, product, offices
@@ -47,3 +55,43 @@ class Message(Base):
     sender = relationship("User")
     product = relationship("Product", foreign_keys=[product_id])  # Relationship to Product model
     office = relationship("DXNDirectory", foreign_keys=[office_id])  # Relationship to DXNDirectory model
+
+
+# Full-text search over message content. Postgres gets a generated tsvector column
+# (text messages only) with a GIN index; SQLite, used locally and in tests, gets an
+# external-content FTS5 table kept in sync by triggers. Neither is mapped on the model,
+# message_crud.search_messages builds the dialect specific query.
+MESSAGE_SEARCH_DDL = {
+    "postgresql": [
+        """ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', CASE WHEN type = 'text' THEN content ELSE '' END)) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END""",
+    ],
+}
+
+for _dialect, _statements in MESSAGE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Message.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+
+class ChatReadState(Base):
+    """Per-user, per-room read watermark: every message up to last_read_message_id has been read"""
+    __tablename__ = "chat_read_states"
+
+    room_id: Mapped[int] = mapped_column(Integer, ForeignKey("chat_rooms.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_read_message_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.base import Base
+
+
+class NotificationCampaign(Base):
+    """Notification sent to a segment of users, enqueued in batches that survive restarts
+
+    Recipients are users ordered by id; `cursor_user_id` is the last user whose
+    notification and pushes were enqueued, committed together with them, so a campaign
+    resumes where it stopped. A running campaign is leased to one runner at a time.
+    """
+    __tablename__ = "notification_campaigns"
+    __table_args__ = (
+        Index("ix_notification_campaigns_status_locked_until", "status", "locked_until"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(String, nullable=False)
+    segment: Mapped[str] = mapped_column(Text, nullable=False)  # JSON of the CampaignSegment
+    status: Mapped[str] = mapped_column(String, nullable=False, default="draft")  # draft, running, paused, completed, failed
+    rate_per_minute: Mapped[int] = mapped_column(Integer, nullable=False)  # Pushes enqueued per minute at most
+    created_by: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # Progress
+    cursor_user_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_targets: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Audience size when started
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Users notified so far
+    enqueued: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Pushes handed to the outbox
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    retries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # Runs in a row ended by a retryable error
+
+    # Lease of the runner executing the campaign; after a retryable error, the time it can be claimed again
+    locked_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Segment time windows are relative to it
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
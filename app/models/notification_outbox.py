@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.base import Base
+
+
+class NotificationOutbox(Base):
+    """Push notification waiting to be delivered, written in the same transaction as its notification
+
+    Rows move pending -> sending (claimed by a worker until locked_until) -> sent, back to
+    pending with a later next_attempt_at on failure, or to dead once retries run out.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    notification_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("notifications.id"), nullable=True)
+    campaign_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("notification_campaigns.id"), nullable=True, index=True)
+    token: Mapped[str] = mapped_column(String, nullable=False)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(String, nullable=False)
+    data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON object of string values
+    collapse_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Newer pushes with the key replace older ones on the device
+    status: Mapped[str] = mapped_column(String, nullable=False, default="pending")  # pending, sending, sent, dead
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Integer, String, func, DateTime, Boolean, Column, ForeignKey
+from sqlalchemy import Integer, String, func, DateTime, Boolean, Column, ForeignKey, Index, false, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.base import Base
@@ -14,5 +14,28 @@ class Notifications(Base):
     target_user_id = mapped_column(Integer, nullable=False)
     created_at = mapped_column(DateTime(timezone=True), server_default=func.now())
     sender_id = mapped_column(Integer,ForeignKey("users.id"), nullable=True)
+    is_read = mapped_column(Boolean, nullable=False, default=False, server_default=false())
+    read_at = mapped_column(DateTime(timezone=True), nullable=True)
+    group_key = mapped_column(String, nullable=True)  # Bursts with the same key fold into one row, e.g. chat:<room_id>
+    group_count = mapped_column(Integer, nullable=False, default=1, server_default="1")
     
     sender= relationship("User", foreign_keys=[sender_id])
+
+    __table_args__ = (
+        # A user's notifications, newest first, keyset-paged on (created_at, id)
+        Index("ix_notifications_target_user_created_at", "target_user_id", "created_at", "id"),
+        # At most one unread notification per group to fold events into, concurrent first events included
+        Index(
+            "ux_notifications_target_user_unread_group", "target_user_id", "group_key", unique=True,
+            postgresql_where=text("is_read = false AND group_key IS NOT NULL"),
+            sqlite_where=text("is_read = false AND group_key IS NOT NULL"),
+        ),
+    )
+
+
+class NotificationCounter(Base):
+    """Unread notification count per user, kept in step with every insert and read"""
+    __tablename__ = "notification_counters"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, Text, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database.base import Base
+
+
+class ScheduledJobRun(Base):
+    """One run of a scheduled maintenance job
+
+    The row is inserted before the job runs; the unique (job_name, scheduled_for) pair
+    makes sure a slot runs once even when several workers wake up for it.
+    """
+    __tablename__ = "scheduled_job_runs"
+    __table_args__ = (
+        UniqueConstraint("job_name", "scheduled_for", name="uq_scheduled_job_runs_job_name_scheduled_for"),
+        Index("ix_scheduled_job_runs_job_name_started_at", "job_name", "started_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_name: Mapped[str] = mapped_column(String, nullable=False)
+    scheduled_for: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    triggered_by: Mapped[str] = mapped_column(String, nullable=False, default="schedule")  # schedule or manual
+    status: Mapped[str] = mapped_column(String, nullable=False, default="running")  # running, succeeded, failed
+    worker: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON returned by the job
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    duration_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
@@ -37,7 +37,7 @@ class User(Base):
     phone_number: Mapped[str] = mapped_column(String, nullable=True)
     image_url : Mapped[str] = mapped_column(String, nullable=True)
     country: Mapped[str] = mapped_column(String, nullable=True)
-    country_code: Mapped[str] = mapped_column(String, nullable=True)
+    country_code: Mapped[str] = mapped_column(String, nullable=True, index=True)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
     deleted_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from enum import Enum
 
-from sqlalchemy import Integer, String, DateTime, Enum as SQLAEnum, Boolean, ForeignKey
+from sqlalchemy import Integer, String, DateTime, Enum as SQLAEnum, Boolean, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.base import Base
@@ -26,6 +26,10 @@ class RewardStatus(str, Enum):
 
 class UserReward(Base):
     __tablename__ = "user_rewards"
+    __table_args__ = (
+        # A user's active rewards, read by the reward summaries
+        Index("ix_user_rewards_user_id_status_expires_at", "user_id", "status", "expires_at"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.models.user import UserRole
+
+
+class CampaignSegment(BaseModel):
+    """Audience of a campaign; every condition given must hold"""
+    roles: Optional[List[UserRole]] = None  # Defaults to every role except admins
+    country_codes: Optional[List[str]] = None  # ISO 3166 alpha-2, e.g. ["PK", "AE"]
+    in_active_challenge: Optional[bool] = None  # True: taking part in a challenge now, False: not
+    challenge_ids: Optional[List[int]] = None  # Limits in_active_challenge to these challenges
+    inactive_days: Optional[int] = Field(None, ge=1)  # No device has opened the app for this many days
+    reward_expiring_within_days: Optional[int] = Field(None, ge=1)  # Has an active reward expiring this soon
+
+
+class CampaignCreate(BaseModel):
+    name: str
+    title: str
+    body: str
+    segment: CampaignSegment = CampaignSegment()
+    rate_per_minute: Optional[int] = Field(None, ge=1)  # Pushes per minute, defaults to the configured rate
+    start: bool = True  # False keeps the campaign as a draft
+
+
+class CampaignOut(BaseModel):
+    id: int
+    name: str
+    title: str
+    body: str
+    segment: CampaignSegment
+    status: str
+    rate_per_minute: int
+    total_targets: int
+    processed: int
+    enqueued: int
+    delivery: Dict[str, int] = {}  # Pushes by outbox status: pending, sending, sent, dead
+    last_error: Optional[str] = None
+    retries: int = 0  # Retryable errors in a row, the campaign is retried with a backoff
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class CampaignPreview(BaseModel):
+    audience: int  # Users matching the segment right now
@@ -134,6 +134,19 @@ class ChallengeStatsResponse(BaseModel):
     total_rewards_earned: int
 
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: Optional[str] = None
+    score: int
+
+
+class LeaderboardRankResponse(BaseModel):
+    rank: Optional[int] = None  # None until the user has made progress in the leaderboard's scope
+    score: int
+    total_users: int
+
+
 class RewardSummaryResponse(BaseModel):
     total_active_rewards: int
     total_reward_time_hours: int
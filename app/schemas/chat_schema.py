@@ -81,6 +81,43 @@ class ChatRoomWithMessages(ChatRoomWithUser):
         from_attributes = True
 
 
+class ChatParticipantSummary(BaseModel):
+    id: int
+    username: Optional[str] = None
+    image_url: Optional[str] = None
+    role: UserRole
+
+
+class LastMessagePreview(BaseModel):
+    id: int
+    type: str
+    content: str  # Truncated for the preview
+    sender_id: int
+    created_at: datetime
+
+
+class ChatInboxItem(ChatRoomRead):
+    """Chat room with participants, last message and the viewer's unread count"""
+    user: ChatParticipantSummary
+    expert: Optional[ChatParticipantSummary] = None
+    last_message: Optional[LastMessagePreview] = None
+    unread_count: int = 0
+
+
+class ChatInboxPage(BaseModel):
+    items: List[ChatInboxItem] = []
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to get the next page
+
+
+class ChatSearchHit(MessageRead):
+    rank: float  # Higher is a better match
+
+
+class ChatSearchPage(BaseModel):
+    items: List[ChatSearchHit] = []
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to get the next page
+
+
 # WebSocket message schemas
 class WSMessageType(str):
     TEXT = "text"
@@ -92,6 +129,7 @@ class WSMessageType(str):
     LEAVE = "leave"
     ASSIGN_EXPERT = "assign_expert"
     ADMIN_JOIN = "admin_join"
+    READ = "read"
 
 
 class WSMessage(BaseModel):
@@ -103,6 +141,7 @@ class WSMessage(BaseModel):
     image: Optional[str] = None
     product_id: Optional[int] = None  # Product ID for product messages
     office_id: Optional[int] = None   # Office ID for office messages
+    message_id: Optional[int] = None  # Last message seen, for read receipts
     timestamp: datetime = datetime.utcnow()  # Time when the message was sent
 
 class WSResponse(BaseModel):
@@ -113,7 +152,7 @@ class WSResponse(BaseModel):
     sender_role: UserRole
     content: Optional[str] = None
     timestamp: datetime
-    message_id: Optional[int] = None  # Database ID of the message (if saved)
+    message_id: Optional[int] = None  # Database ID of the message (if saved), or the read watermark for read receipts
     product_id: Optional[int] = None  # Product ID for product messages
     office_id: Optional[int] = None   # Office ID for office messages
     product: Optional[ProductOut] = None  # Product details for product messages
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class NotificationBase(BaseModel):
@@ -22,11 +22,18 @@ class SenderOut(BaseModel):
 class NotificationOut(NotificationBase):
     id: int
     created_at: datetime
+    is_read: bool = False
+    read_at: Optional[datetime] = None
+    group_count: int = 1  # Number of events folded into this notification
     sender: Optional[SenderOut] = None
 
     class Config:
         from_attributes = True
 
+class NotificationPage(BaseModel):
+    items: List[NotificationOut] = []
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to get the next page
+
 class BroadcastNotificationRequest(BaseModel):
     title: str
     body: str
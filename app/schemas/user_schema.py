@@ -190,6 +190,7 @@ class UserAll(UserRead):
     pass
 class FCMTokenUpdate(BaseModel):
     fcm_token: str
+    platform: Optional[str] = None  # android, ios, web
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     phone_number: Optional[str] = None
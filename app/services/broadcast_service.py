@@ -0,0 +1,227 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select, insert, func, and_, or_, exists
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.crud.device_token_crud import device_token_crud
+from app.crud.notification_crud import notification_crud
+from app.database.session import SessionLocal
+from app.models.device_token import DeviceToken
+from app.models.notifications import Notifications
+from app.models.user import User, UserRole
+from app.services.notification_transport import NotificationTransport, notification_transport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BroadcastJob:
+    id: str
+    title: str
+    body: str
+    role_filter: Optional[str]
+    sender_id: int
+    sender_username: str
+    status: str = "pending"  # pending, running, completed, failed
+    total_targets: int = 0  # Users with a device token matching the filter when the job started
+    saved: int = 0
+    sent: int = 0
+    failed: int = 0
+    invalid_tokens_removed: int = 0
+    chunks_done: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["progress"] = round(self.saved / self.total_targets * 100, 1) if self.total_targets else 100.0
+        return data
+
+
+def broadcast_targets_filter(role_filter: Optional[str]):
+    """SQL filter for broadcast recipients: users with a device token, optionally of a single role
+
+    Without a role filter every role except admins is targeted.
+    """
+    if role_filter:
+        role_condition = User.role == UserRole(role_filter.lower())
+    else:
+        role_condition = User.role != UserRole.admin
+    return and_(
+        role_condition,
+        exists().where(DeviceToken.user_id == User.id),
+        or_(User.is_deleted == False, User.is_deleted.is_(None)),
+    )
+
+
+def send_chunk(
+    transport: NotificationTransport, tokens: List[str], title: str, body: str, data: Dict[str, str]
+) -> Dict[str, Any]:
+    """Send one multicast chunk and report the tokens FCM rejected as unregistered"""
+    result = transport.send_multicast(tokens=tokens, title=title, body=body, data=data)
+    return {
+        "success_count": result.success_count,
+        "failure_count": result.failure_count,
+        "invalid_tokens": [token for token, outcome in zip(tokens, result.results) if outcome.unregistered],
+    }
+
+
+def prune_tokens(db: Session, tokens: List[str]) -> int:
+    """Delete device tokens that FCM reported as unregistered"""
+    pruned = device_token_crud.prune(db, tokens=tokens)
+    if pruned:
+        db.commit()
+    return pruned
+
+
+MULTICAST_LIMIT = 500  # FCM rejects multicasts with more tokens
+
+
+class BroadcastService:
+    """Runs broadcast notifications in the background and tracks their progress
+
+    Recipients are streamed from a dedicated reading session with `yield_per`, filtered
+    in SQL. Each chunk of users gets its notification rows bulk-inserted, and the device
+    tokens of those users are sent as FCM multicasts of at most `MULTICAST_LIMIT` tokens
+    on a bounded thread pool, so at most `max_parallel` multicasts are in flight. Jobs
+    are kept in memory on the worker that started them.
+    """
+
+    def __init__(self, chunk_size: int, max_parallel: int, transport: NotificationTransport, max_jobs_kept: int = 100):
+        self.chunk_size = chunk_size
+        self.transport = transport
+        self.max_parallel = max_parallel
+        self.max_jobs_kept = max_jobs_kept
+        self._jobs: "OrderedDict[str, BroadcastJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="broadcast")
+        return self._executor
+
+    def start(self, *, title: str, body: str, role_filter: Optional[str], sender: User) -> BroadcastJob:
+        """Create a broadcast job and run it on a background thread"""
+        job = BroadcastJob(
+            id=uuid.uuid4().hex,
+            title=title,
+            body=body,
+            role_filter=role_filter,
+            sender_id=sender.id,
+            sender_username=sender.username or f"User_{sender.id}",
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs_kept:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self.run, args=(job,), daemon=True, name=f"broadcast-{job.id[:8]}").start()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BroadcastJob]:
+        return self._jobs.get(job_id)
+
+    def _target_chunks(self, reader: Session, targets):
+        """Yield the ids of the recipients, chunk_size at a time"""
+        query = select(User.id).where(targets).order_by(User.id)
+        if reader.get_bind().dialect.name != "sqlite":
+            for rows in reader.execute(query.execution_options(yield_per=self.chunk_size)).partitions():
+                yield [user_id for user_id, in rows]
+            return
+        # SQLite can't commit the notification rows while a read cursor is open, page by id instead
+        last_id = 0
+        while True:
+            user_ids = reader.execute(query.where(User.id > last_id).limit(self.chunk_size)).scalars().all()
+            if not user_ids:
+                return
+            yield list(user_ids)
+            last_id = user_ids[-1]
+
+    def run(self, job: BroadcastJob):
+        """Stream recipients, save notifications and dispatch multicast chunks"""
+        reader = SessionLocal()
+        writer = SessionLocal()
+        job.status = "running"
+        data = {
+            "title": job.title,
+            "body": job.body,
+            "type": "broadcast",
+            "sender_id": str(job.sender_id),
+            "sender_username": job.sender_username,
+            "role_filter": str(job.role_filter or "all"),
+        }
+        in_flight: Set[Future] = set()
+
+        def collect(done: Set[Future]):
+            invalid_tokens = []
+            for future in done:
+                result = future.result()
+                job.sent += result["success_count"]
+                job.failed += result["failure_count"]
+                job.chunks_done += 1
+                invalid_tokens.extend(result["invalid_tokens"])
+            job.invalid_tokens_removed += prune_tokens(writer, invalid_tokens)
+
+        try:
+            targets = broadcast_targets_filter(job.role_filter)
+            job.total_targets = reader.execute(select(func.count(User.id)).where(targets)).scalar()
+
+            for user_ids in self._target_chunks(reader, targets):
+                writer.execute(insert(Notifications), [
+                    {
+                        "title": job.title,
+                        "body": job.body,
+                        "type": "broadcast",
+                        "target_user_id": user_id,
+                        "sender_id": job.sender_id,
+                    }
+                    for user_id in user_ids
+                ])
+                notification_crud.increment_unread(writer, {user_id: 1 for user_id in user_ids})
+                tokens_by_user = device_token_crud.get_tokens_for_users(writer, user_ids=user_ids)
+                writer.commit()
+                job.saved += len(user_ids)
+
+                tokens = [token for user_tokens in tokens_by_user.values() for token in user_tokens]
+                for start in range(0, len(tokens), MULTICAST_LIMIT):
+                    # Bounded parallelism: wait for a multicast to finish before queueing another
+                    if len(in_flight) >= self.max_parallel:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    in_flight.add(self._get_executor().submit(
+                        send_chunk, self.transport, tokens[start:start + MULTICAST_LIMIT], job.title, job.body, data
+                    ))
+
+            if in_flight:
+                done, _ = wait(in_flight)
+                collect(done)
+            job.status = "completed"
+            logger.info(
+                "Broadcast completed",
+                extra={"job_id": job.id, "targets": job.total_targets, "sent": job.sent, "failed": job.failed}
+            )
+        except Exception as e:
+            writer.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            logger.exception("Broadcast failed", extra={"job_id": job.id})
+        finally:
+            job.finished_at = datetime.utcnow()
+            reader.close()
+            writer.close()
+
+
+broadcast_service = BroadcastService(
+    chunk_size=settings.broadcast_chunk_size,
+    max_parallel=settings.broadcast_max_parallel_chunks,
+    transport=notification_transport,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, exists
+from sqlalchemy import exc
+
+from app.core.settings import settings
+from app.crud.campaign_crud import campaign_crud
+from app.database.session import SessionLocal
+from app.models.challenge import ChallengeStatus, UserChallenge
+from app.models.device_token import DeviceToken
+from app.models.notification_campaign import NotificationCampaign
+from app.models.user import User, UserRole
+from app.models.user_rewards import RewardStatus, UserReward
+from app.schemas.campaign_schema import CampaignSegment
+
+logger = logging.getLogger(__name__)
+
+
+def compile_segment(segment: CampaignSegment, now: Optional[datetime] = None):
+    """SQL filter on users for a campaign segment
+
+    Every condition is a comparison on users or a correlated EXISTS probe, so the
+    audience is computed in the database. Time windows are relative to `now`, the
+    campaign start, so a resumed campaign keeps the audience it started with.
+    """
+    now = now or datetime.utcnow()
+    if segment.roles:
+        role_condition = User.role.in_(segment.roles)
+    else:
+        role_condition = User.role != UserRole.admin
+    conditions = [
+        role_condition,
+        or_(User.is_deleted == False, User.is_deleted.is_(None)),
+        exists().where(DeviceToken.user_id == User.id),
+    ]
+
+    if segment.country_codes:
+        conditions.append(User.country_code.in_([code.upper() for code in segment.country_codes]))
+
+    if segment.in_active_challenge is not None:
+        participation = [UserChallenge.user_id == User.id, UserChallenge.status == ChallengeStatus.active]
+        if segment.challenge_ids:
+            participation.append(UserChallenge.challenge_id.in_(segment.challenge_ids))
+        in_challenge = exists().where(and_(*participation))
+        conditions.append(in_challenge if segment.in_active_challenge else ~in_challenge)
+
+    if segment.inactive_days:
+        # A device re-registers its token whenever the app starts
+        cutoff = now - timedelta(days=segment.inactive_days)
+        conditions.append(~exists().where(and_(DeviceToken.user_id == User.id, DeviceToken.last_seen_at >= cutoff)))
+
+    if segment.reward_expiring_within_days:
+        conditions.append(exists().where(and_(
+            UserReward.user_id == User.id,
+            UserReward.status == RewardStatus.active,
+            UserReward.expires_at > now,
+            UserReward.expires_at <= now + timedelta(days=segment.reward_expiring_within_days),
+        )))
+
+    return and_(*conditions)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Errors a later run can get past: lost connections, timeouts, deadlocks and lock waits"""
+    if isinstance(error, exc.DBAPIError):
+        return error.connection_invalidated or isinstance(error, (exc.OperationalError, exc.InterfaceError))
+    return isinstance(error, (exc.TimeoutError, ConnectionError, TimeoutError))
+
+
+def campaign_targets(campaign: NotificationCampaign):
+    segment = CampaignSegment.model_validate(json.loads(campaign.segment))
+    return compile_segment(segment, campaign.started_at)
+
+
+class CampaignRunner:
+    """Polls for running campaigns and enqueues them batch by batch
+
+    A runner leases one campaign at a time, so any number of processes can run one.
+    Each batch is committed with the campaign cursor; after a crash the lease expires
+    and the next runner to poll resumes from the cursor. Batches are paced so pushes
+    are enqueued at no more than the campaign's rate_per_minute; delivery itself goes
+    through the notification outbox. A run ended by a retryable error releases the
+    campaign for another try after an exponential backoff; other errors, or
+    `max_retries` retryable ones in a row, mark it failed.
+    """
+
+    def __init__(
+        self, *, batch_size: int, lease_seconds: int, poll_interval: float,
+        max_retries: int, retry_base: int, retry_max: int
+    ):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.runner_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = threading.Event()
+
+    async def start(self):
+        if self._task:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        if not self._task:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                ran = await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Campaign runner failed")
+                ran = False
+            if not ran:
+                await asyncio.to_thread(self._stopping.wait, self.poll_interval)
+
+    def run_once(self) -> bool:
+        """Claim a campaign and run it until it ends, is paused or the runner stops"""
+        db = SessionLocal()
+        try:
+            campaign_id = campaign_crud.claim(db, runner_id=self.runner_id, lease_seconds=self.lease_seconds)
+            if campaign_id is None:
+                return False
+            self.execute(db, campaign_id)
+            return True
+        finally:
+            db.close()
+
+    def execute(self, db, campaign_id: int):
+        try:
+            while not self._stopping.is_set():
+                db.expire_all()
+                campaign = campaign_crud.get(db, campaign_id)
+                if campaign is None or campaign.status != "running" or campaign.locked_by != self.runner_id:
+                    break
+                started = time.monotonic()
+                batch = campaign_crud.enqueue_next_batch(
+                    db,
+                    campaign=campaign,
+                    targets=campaign_targets(campaign),
+                    batch_size=self.batch_size,
+                    runner_id=self.runner_id,
+                    lease_seconds=self.lease_seconds,
+                )
+                if batch is None:
+                    campaign_crud.finish(db, campaign_id=campaign_id, runner_id=self.runner_id, status="completed")
+                    logger.info("Campaign completed", extra={"campaign_id": campaign_id})
+                    return
+                logger.debug("Campaign batch enqueued", extra={"campaign_id": campaign_id, **batch})
+                # Pace the batches to the campaign's rate
+                pause = batch["pushes"] * 60 / campaign.rate_per_minute - (time.monotonic() - started)
+                if not self._pace(db, campaign_id, pause):
+                    break
+            campaign_crud.finish(db, campaign_id=campaign_id, runner_id=self.runner_id, status="stopped")
+        except Exception as e:
+            db.rollback()
+            campaign = campaign_crud.get(db, campaign_id)
+            retries = campaign.retries if campaign is not None else 0
+            if not is_retryable(e) or retries >= self.max_retries:
+                campaign_crud.finish(db, campaign_id=campaign_id, runner_id=self.runner_id, status="failed", error=str(e))
+                raise
+            delay = self.retry_seconds(retries + 1)
+            campaign_crud.release_for_retry(
+                db, campaign_id=campaign_id, runner_id=self.runner_id, error=str(e), retry_in_seconds=delay
+            )
+            logger.warning(
+                "Campaign run failed, retrying",
+                extra={"campaign_id": campaign_id, "retry": retries + 1, "retry_in_seconds": delay, "error": str(e)}
+            )
+
+    def retry_seconds(self, retry: int) -> float:
+        """Exponential backoff: base * 2^(retry - 1), capped"""
+        return min(self.retry_max, self.retry_base * 2 ** max(0, retry - 1))
+
+    def _pace(self, db, campaign_id: int, seconds: float) -> bool:
+        """Wait between batches, renewing the lease meanwhile; False if the lease was lost"""
+        deadline = time.monotonic() + seconds
+        while not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self._stopping.wait(min(remaining, self.lease_seconds / 3))
+            if not campaign_crud.renew_lease(
+                db, campaign_id=campaign_id, runner_id=self.runner_id, lease_seconds=self.lease_seconds
+            ):
+                return False
+        return True
+
+
+campaign_runner = CampaignRunner(
+    batch_size=settings.campaign_batch_size,
+    lease_seconds=settings.campaign_lease_seconds,
+    poll_interval=settings.campaign_poll_interval_seconds,
+    max_retries=settings.campaign_max_retries,
+    retry_base=settings.campaign_retry_base_seconds,
+    retry_max=settings.campaign_retry_max_seconds,
+)
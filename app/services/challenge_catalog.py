@@ -0,0 +1,142 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database.upsert import dialect_insert
+from app.models.catalog_version import CatalogVersion
+from app.models.challenge import Challenge, ChallengeType, DurationType
+
+CATALOG_NAME = "challenges"
+
+
+@dataclass(frozen=True)
+class CatalogChallenge:
+    """Read-only copy of a challenge template, safe to share between sessions and threads"""
+    id: int
+    title: str
+    description: str
+    type: ChallengeType
+    duration: int
+    duration_type: DurationType
+    reward_time: int
+    reward_time_type: str
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+    duration_display_text: str
+    reward_display_text: str
+
+    @classmethod
+    def from_model(cls, challenge: Challenge) -> "CatalogChallenge":
+        return cls(
+            id=challenge.id,
+            title=challenge.title,
+            description=challenge.description,
+            type=challenge.type,
+            duration=challenge.duration,
+            duration_type=challenge.duration_type,
+            reward_time=challenge.reward_time,
+            reward_time_type=challenge.reward_time_type,
+            is_active=challenge.is_active,
+            created_at=challenge.created_at,
+            updated_at=challenge.updated_at,
+            duration_display_text=challenge.duration_display_text,
+            reward_display_text=challenge.reward_display_text,
+        )
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    version: int
+    by_id: Dict[int, CatalogChallenge]
+    ordered: Tuple[CatalogChallenge, ...]  # Newest first, like the listings
+    active: Tuple[CatalogChallenge, ...]
+    active_by_type: Dict[ChallengeType, Tuple[CatalogChallenge, ...]]
+
+
+class ChallengeCatalog:
+    """In-memory copy of the challenge templates, per worker
+
+    Challenges are admin-managed and rarely change, so listings and joins read them from
+    here instead of the database. The challenge CRUD bumps a version row in the same
+    transaction as every create, update and delete; each read compares it with the
+    version of the snapshot (a primary key lookup) and reloads the whole table when
+    another worker changed it. Challenges written outside the CRUD aren't seen until
+    the version is bumped.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    def _current_version(self, db: Session) -> int:
+        version = db.execute(select(CatalogVersion.version).where(CatalogVersion.name == CATALOG_NAME)).scalar()
+        return version or 0
+
+    def _load(self, db: Session, version: int) -> _Snapshot:
+        # The version is read before the rows, so a change committed in between only
+        # causes one more reload on the next read
+        challenges = db.execute(
+            select(Challenge).order_by(Challenge.created_at.desc(), Challenge.id.desc())
+        ).scalars().all()
+        ordered = tuple(CatalogChallenge.from_model(challenge) for challenge in challenges)
+        active = tuple(challenge for challenge in ordered if challenge.is_active)
+        active_by_type: Dict[ChallengeType, Tuple[CatalogChallenge, ...]] = {}
+        for challenge_type in ChallengeType:
+            active_by_type[challenge_type] = tuple(challenge for challenge in active if challenge.type == challenge_type)
+        return _Snapshot(
+            version=version,
+            by_id={challenge.id: challenge for challenge in ordered},
+            ordered=ordered,
+            active=active,
+            active_by_type=active_by_type,
+        )
+
+    def _current(self, db: Session) -> _Snapshot:
+        version = self._current_version(db)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(db, version)
+                self._snapshot = snapshot
+        return snapshot
+
+    def get(self, db: Session, challenge_id: int) -> Optional[CatalogChallenge]:
+        return self._current(db).by_id.get(challenge_id)
+
+    def get_many(self, db: Session, challenge_ids: Iterable[int]) -> Dict[int, CatalogChallenge]:
+        """Challenges by id for one version check, unknown ids are left out"""
+        by_id = self._current(db).by_id
+        return {challenge_id: by_id[challenge_id] for challenge_id in challenge_ids if challenge_id in by_id}
+
+    def list(
+        self, db: Session, *, challenge_type: Optional[ChallengeType] = None, include_inactive: bool = False
+    ) -> Tuple[CatalogChallenge, ...]:
+        """Challenges newest first, active ones only unless include_inactive"""
+        snapshot = self._current(db)
+        if not include_inactive:
+            return snapshot.active if challenge_type is None else snapshot.active_by_type[challenge_type]
+        if challenge_type is None:
+            return snapshot.ordered
+        return tuple(challenge for challenge in snapshot.ordered if challenge.type == challenge_type)
+
+    def bump(self, db: Session):
+        """Bump the version in the caller's transaction, every worker reloads after it commits"""
+        statement = dialect_insert(db, CatalogVersion).values(name=CATALOG_NAME, version=1, updated_at=datetime.utcnow())
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[CatalogVersion.name],
+            set_={"version": CatalogVersion.version + 1, "updated_at": statement.excluded.updated_at},
+        ))
+        # Not waiting for the commit: a reload in between sees the old version and reloads again after
+        with self._lock:
+            self._snapshot = None
+
+
+challenge_catalog = ChallengeCatalog()
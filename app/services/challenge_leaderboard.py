@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.crud.challenge_ranking_crud import challenge_ranking_crud
+from app.database.session import SessionLocal
+from app.models.challenge import ChallengeStatus, ChallengeType
+from app.models.challenge_ranking import ChallengeRanking, LeaderboardMetric, GLOBAL_SCOPE
+from app.services.challenge_catalog import challenge_catalog
+from app.utils.fenwick import RankIndex
+
+_METRIC_COLUMNS = {
+    LeaderboardMetric.completions: "completions",
+    LeaderboardMetric.progress: "progress",
+    LeaderboardMetric.streak: "current_streak",
+}
+
+
+def leaderboard_scope(challenge_type: Optional[ChallengeType]) -> str:
+    return challenge_type.value if challenge_type is not None else GLOBAL_SCOPE
+
+
+@dataclass
+class _LoadedIndex:
+    index: RankIndex
+    synced_at: datetime  # Rows changed from here on (less the overlap) are applied on the next sync
+    checked_at: float
+    day: date  # Streak scores depend on the day
+
+
+class ChallengeLeaderboard:
+    """Challenge leaderboards per challenge type and global, backed by challenge_rankings
+
+    Top-N lists are read off the rankings table's (scope, score) indexes. Ranks come from
+    an in-memory rank index per scope and metric, a Fenwick tree over scores, so "my rank"
+    is O(log max_score) instead of counting everyone above. The rank indexes are per
+    worker and loaded in full once, on first use. After that they only take increments:
+    rankings this worker writes are applied as they are written, and every
+    `leaderboard_refresh_seconds` the rows other workers changed (by updated_at) and
+    the streaks broken by a new day are read and applied.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._indexes: Dict[Tuple[str, LeaderboardMetric], _LoadedIndex] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, db: Session, scope: str, metric: LeaderboardMetric, today: date) -> RankIndex:
+        key = (scope, metric)
+        loaded = self._indexes.get(key)
+        if loaded is None:
+            synced_at = datetime.utcnow()
+            index = RankIndex()
+            for user_id, score in challenge_ranking_crud.get_scores(db, scope=scope, metric=metric, today=today):
+                index.set(user_id, score)
+            with self._lock:
+                self._indexes[key] = _LoadedIndex(index, synced_at, time.monotonic(), today)
+            return index
+        if time.monotonic() - loaded.checked_at > self.refresh_seconds or loaded.day != today:
+            self._sync(db, scope, metric, loaded, today)
+        return loaded.index
+
+    def _sync(self, db: Session, scope: str, metric: LeaderboardMetric, loaded: _LoadedIndex, today: date):
+        """Apply the rankings changed since the last sync, and the streaks broken since its day"""
+        synced_at = datetime.utcnow()
+        # Overlap the previous window: rows are stamped by the writer's clock before it
+        # commits, and applying a row twice is harmless
+        changed_since = loaded.synced_at - timedelta(seconds=self.refresh_seconds)
+        changed = challenge_ranking_crud.get_scores(
+            db, scope=scope, metric=metric, today=today, changed_since=changed_since
+        )
+        broken = []
+        if metric == LeaderboardMetric.streak and loaded.day != today:
+            broken = challenge_ranking_crud.get_broken_streaks(db, scope=scope, since=loaded.day, today=today)
+        with self._lock:
+            for user_id in broken:
+                loaded.index.set(user_id, 0)
+            for user_id, score in changed:
+                loaded.index.set(user_id, score)
+            loaded.synced_at = synced_at
+            loaded.checked_at = time.monotonic()
+            loaded.day = today
+
+    def _apply(self, rankings: List[ChallengeRanking]):
+        """Put rankings this worker just wrote into the loaded rank indexes
+
+        Applied before the caller commits; if it rolls back instead, the next rebuild
+        puts the scores right.
+        """
+        with self._lock:
+            for ranking in rankings:
+                for metric, column in _METRIC_COLUMNS.items():
+                    loaded = self._indexes.get((ranking.scope, metric))
+                    if loaded is not None:
+                        loaded.index.set(ranking.user_id, getattr(ranking, column))
+
+    def record_progress(self, db: Session, *, user_id: int, challenge_type: ChallengeType, completed: bool):
+        """Count a progress update (and a completion) in the user's rankings; doesn't commit"""
+        self._apply(challenge_ranking_crud.record_progress(
+            db, user_id=user_id, challenge_type=challenge_type, completed=completed, today=datetime.utcnow().date()
+        ))
+
+    def record_sweep(self, db: Session, *, advanced: List[Tuple[int, int, ChallengeStatus]]):
+        """Count the progress steps of a sweep chunk, (user_id, challenge_id, status) rows, in one upsert; doesn't commit"""
+        challenges = challenge_catalog.get_many(db, {challenge_id for _, challenge_id, _ in advanced})
+        deltas: Dict[Tuple[int, str], Tuple[int, int]] = defaultdict(lambda: (0, 0))
+        for user_id, challenge_id, status in advanced:
+            completed = 1 if status == ChallengeStatus.completed else 0
+            scopes = [GLOBAL_SCOPE]
+            if challenge_id in challenges:
+                scopes.append(challenges[challenge_id].type.value)
+            for scope in scopes:
+                progress, completions = deltas[(user_id, scope)]
+                deltas[(user_id, scope)] = (progress + 1, completions + completed)
+        self._apply(challenge_ranking_crud.add_progress(db, deltas=dict(deltas)))
+
+    def top(
+        self, db: Session, *, challenge_type: Optional[ChallengeType], metric: LeaderboardMetric, limit: int
+    ) -> List[Dict[str, Any]]:
+        scope = leaderboard_scope(challenge_type)
+        today = datetime.utcnow().date()
+        entries = challenge_ranking_crud.get_top(db, scope=scope, metric=metric, today=today, limit=limit)
+        index = self._index(db, scope, metric, today)
+        return [
+            {"rank": index.rank_of_score(score), "user_id": user_id, "username": username, "score": score}
+            for user_id, username, score in entries
+        ]
+
+    def rank(
+        self, db: Session, *, user_id: int, challenge_type: Optional[ChallengeType], metric: LeaderboardMetric
+    ) -> Dict[str, Any]:
+        """The user's score and rank; no rank until they have made progress in the scope"""
+        scope = leaderboard_scope(challenge_type)
+        today = datetime.utcnow().date()
+        score = challenge_ranking_crud.get_score(db, user_id=user_id, scope=scope, metric=metric, today=today)
+        index = self._index(db, scope, metric, today)
+        return {
+            "rank": index.rank_of_score(score) if score is not None else None,
+            "score": score or 0,
+            "total_users": len(index),
+        }
+
+    def rebuild(self) -> Dict[str, int]:
+        """Recount the rankings table from user_challenges and drop the loaded rank indexes"""
+        db = SessionLocal()
+        try:
+            stats = challenge_ranking_crud.rebuild(db, today=datetime.utcnow().date())
+        finally:
+            db.close()
+        with self._lock:
+            self._indexes = {}
+        return stats
+
+
+challenge_leaderboard = ChallengeLeaderboard(refresh_seconds=settings.leaderboard_refresh_seconds)
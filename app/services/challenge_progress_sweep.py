@@ -0,0 +1,81 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.crud.challenge_crud import challenge_crud
+from app.database.session import SessionLocal
+from app.models.challenge import ChallengeStatus, UserChallenge
+from app.services.challenge_leaderboard import challenge_leaderboard
+
+logger = logging.getLogger(__name__)
+
+
+class ChallengeProgressSweep:
+    """Advances every active challenge by one progress step and rewards the ones completed
+
+    Active challenge ids are streamed from a dedicated reading session with `yield_per`.
+    Each chunk is advanced with one set-based UPDATE ... RETURNING; the rewards of the
+    challenges it completed are bulk-inserted and the advanced rows are added to the
+    leaderboard rankings in the same transaction, so a chunk is committed whole or not
+    at all and a sweep interrupted midway can simply be run again.
+    """
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+
+    def _active_chunks(self, reader: Session):
+        """Yield the ids of the active challenges, chunk_size at a time"""
+        query = select(UserChallenge.id).where(UserChallenge.status == ChallengeStatus.active).order_by(UserChallenge.id)
+        if reader.get_bind().dialect.name != "sqlite":
+            for rows in reader.execute(query.execution_options(yield_per=self.chunk_size)).partitions():
+                yield [user_challenge_id for user_challenge_id, in rows]
+            return
+        # SQLite can't commit the writes while a read cursor is open, page by id instead
+        last_id = 0
+        while True:
+            ids = reader.execute(query.where(UserChallenge.id > last_id).limit(self.chunk_size)).scalars().all()
+            if not ids:
+                return
+            yield list(ids)
+            last_id = ids[-1]
+
+    def _apply(self, writer: Session, ids: List[int], now: datetime) -> Dict[str, int]:
+        try:
+            advanced = challenge_crud.advance_progress(writer, user_challenge_ids=ids, now=now)
+            rewarded = challenge_crud.create_missing_rewards(writer, user_challenge_ids=ids, now=now)
+            challenge_leaderboard.record_sweep(writer, advanced=advanced)
+            writer.commit()
+        except Exception:
+            writer.rollback()
+            raise
+        return {"advanced": len(advanced), "completed": rewarded}
+
+    def run(self) -> Dict[str, float]:
+        """Run a full sweep; returns processed and completed counts and throughput"""
+        reader = SessionLocal()
+        writer = SessionLocal()
+        now = datetime.utcnow()
+        started = time.perf_counter()
+        stats = {"processed": 0, "advanced": 0, "completed": 0}
+        try:
+            for ids in self._active_chunks(reader):
+                chunk = self._apply(writer, ids, now)
+                stats["processed"] += len(ids)
+                stats["advanced"] += chunk["advanced"]
+                stats["completed"] += chunk["completed"]
+        finally:
+            reader.close()
+            writer.close()
+        elapsed = time.perf_counter() - started
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["per_second"] = round(stats["processed"] / elapsed) if elapsed > 0 else 0
+        logger.info("Challenge progress sweep finished", extra=stats)
+        return stats
+
+
+challenge_progress_sweep = ChallengeProgressSweep(chunk_size=settings.challenge_sweep_chunk_size)
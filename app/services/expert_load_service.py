@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.chat import ChatRoom
+from app.models.user import User, UserRole
+
+
+class ExpertLoadService:
+    """In-memory map of expert_id -> number of active chat rooms, used to assign new rooms
+
+    The map is loaded with one GROUP BY query and then kept up to date by the chat room
+    CRUD hooks (create, close, reassign). It is per worker, so it is also reloaded every
+    `expert_load_refresh_seconds` to pick up rooms handled by other workers.
+    """
+
+    def __init__(self, refresh_seconds: int, max_active_rooms: int):
+        self.refresh_seconds = refresh_seconds
+        self.max_active_rooms = max_active_rooms  # 0 means no cap
+        self._load: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session) -> Dict[int, int]:
+        """Reload the load of every expert with a single aggregate query"""
+        query = (
+            select(User.id, func.count(ChatRoom.id))
+            .select_from(User)
+            .outerjoin(ChatRoom, and_(ChatRoom.expert_id == User.id, ChatRoom.is_active == True))
+            .where(
+                and_(
+                    User.role == UserRole.expert,
+                    or_(User.is_deleted == False, User.is_deleted.is_(None))
+                )
+            )
+            .group_by(User.id)
+        )
+        load = {expert_id: room_count for expert_id, room_count in db.execute(query).all()}
+        with self._lock:
+            self._load = load
+            self._loaded_at = time.monotonic()
+        return load
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.refresh(db)
+
+    def pick_expert_id(self, db: Session, *, online_ids: Optional[Set[int]] = None) -> Optional[int]:
+        """Pick the least busy expert, preferring experts under capacity and then online ones
+
+        The cap is soft: when every expert is at capacity the least busy one is still
+        returned, so users are never left without an expert.
+        """
+        self._ensure_loaded(db)
+        with self._lock:
+            if not self._load:
+                return None
+            candidates = self._load
+            if self.max_active_rooms:
+                under_capacity = {
+                    expert_id: load for expert_id, load in candidates.items() if load < self.max_active_rooms
+                }
+                candidates = under_capacity or candidates
+            if online_ids:
+                online = {expert_id: load for expert_id, load in candidates.items() if expert_id in online_ids}
+                candidates = online or candidates
+            return min(candidates, key=candidates.get)
+
+    def get_load(self, expert_id: int) -> int:
+        return self._load.get(expert_id, 0)
+
+    def expert_added(self, expert_id: int):
+        with self._lock:
+            self._load.setdefault(expert_id, 0)
+
+    def expert_removed(self, expert_id: int):
+        with self._lock:
+            self._load.pop(expert_id, None)
+
+    def room_assigned(self, expert_id: Optional[int]):
+        if expert_id is None:
+            return
+        with self._lock:
+            if expert_id in self._load:
+                self._load[expert_id] += 1
+
+    def room_released(self, expert_id: Optional[int]):
+        if expert_id is None:
+            return
+        with self._lock:
+            if expert_id in self._load:
+                self._load[expert_id] = max(0, self._load[expert_id] - 1)
+
+    def room_reassigned(self, old_expert_id: Optional[int], new_expert_id: Optional[int]):
+        if old_expert_id == new_expert_id:
+            return
+        self.room_released(old_expert_id)
+        self.room_assigned(new_expert_id)
+
+
+expert_load_service = ExpertLoadService(
+    refresh_seconds=settings.expert_load_refresh_seconds,
+    max_active_rooms=settings.expert_max_active_rooms,
+)
@@ -1,21 +1,41 @@
 import firebase_admin
 from firebase_admin import credentials, messaging
+import logging
 import os
+import threading
 from typing import List, Dict, Any, Optional
 from fastapi import HTTPException
 
-# Initialize Firebase Admin SDK
-cred_path = os.path.join(os.getcwd(), "wellness_service_account_key.json")
-try:
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    pass
+from app.core.logger import sampled
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def ensure_firebase_app():
+    """Initialize the Firebase Admin SDK on first use, from the configured service account key"""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            cred_path = settings.firebase_credentials_path
+            if not os.path.isabs(cred_path):
+                cred_path = os.path.join(os.getcwd(), cred_path)
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+        _initialized = True
 
 
 class FirebaseNotificationService:
     @staticmethod
-    def send_notification(token: str, title: str, body: str, data: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    def send_notification(
+        token: str, title: str, body: str, data: Optional[Dict[str, str]] = None, collapse_key: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Send a notification to a single device using FCM token
         
@@ -24,19 +44,25 @@ class FirebaseNotificationService:
             title: Notification title
             body: Notification body
             data: Additional data to send with the notification
+            collapse_key: Newer notifications with the same key replace this one on the device
             
         Returns:
             Response from FCM
         """
         
         try:
+            ensure_firebase_app()
+
             # Ensure all data values are strings
             string_data = {}
             if data:
                 for key, value in data.items():
                     string_data[key] = str(value) if value is not None else ""
             
-            print(f"🔥 FIREBASE_SERVICE: Single notification data: {string_data}")
+            logger.debug(
+                "Sending notification",
+                extra={"token": token[:10], "type": string_data.get("type"), "collapse_key": collapse_key, **sampled()}
+            )
             
             # Create message
             message = messaging.Message(
@@ -46,12 +72,15 @@ class FirebaseNotificationService:
                 ),
                 data=string_data,
                 token=token,
+                android=messaging.AndroidConfig(collapse_key=collapse_key) if collapse_key else None,
+                apns=messaging.APNSConfig(headers={"apns-collapse-id": collapse_key}) if collapse_key else None,
             )
             
             # Send message
             response = messaging.send(message)
             return {"success": True, "message_id": response}
         except Exception as e:
+            logger.debug("Notification failed", extra={"token": token[:10], "error": str(e), **sampled()})
             return {"success": False, "error": str(e)}
     
     @staticmethod
@@ -72,6 +101,8 @@ class FirebaseNotificationService:
             return {"success": False, "error": "No tokens provided"}
             
         try:
+            ensure_firebase_app()
+
             # Ensure all data values are strings
             string_data = {}
             if data:
@@ -81,9 +112,6 @@ class FirebaseNotificationService:
             # Ensure all tokens are strings
             string_tokens = [str(token) for token in tokens]
             
-            print(f"🔥 FIREBASE_SERVICE: Multicast data: {string_data}")
-            print(f"🔥 FIREBASE_SERVICE: Token count: {len(string_tokens)}")
-            
             # Create multicast message using send_each_for_multicast (more reliable)
             message = messaging.MulticastMessage(
                 data=string_data,
@@ -97,14 +125,23 @@ class FirebaseNotificationService:
             # Send multicast message using send_each_for_multicast
             response = messaging.send_each_for_multicast(message)
             
-            # Log individual results
-            for i, resp in enumerate(response.responses):
-                if resp.success:
-                    print(f"✅ Notification successfully sent to token {string_tokens[i][:10]}...")
-                else:
-                    print(f"❌ Failed to send notification to token {string_tokens[i][:10]}...: {resp.exception}")
-            
-            print(f"📊 FIREBASE_SERVICE: Multicast complete - Success: {response.success_count}, Failed: {response.failure_count}")
+            # Per-token failures are sampled, a multicast can carry 500 of them
+            if response.failure_count and logger.isEnabledFor(logging.DEBUG):
+                for token, resp in zip(string_tokens, response.responses):
+                    if not resp.success:
+                        logger.debug(
+                            "Multicast token failed", extra={"token": token[:10], "error": str(resp.exception), **sampled()}
+                        )
+
+            logger.info(
+                "Multicast sent",
+                extra={
+                    "tokens": len(string_tokens),
+                    "success_count": response.success_count,
+                    "failure_count": response.failure_count,
+                    "type": string_data.get("type"),
+                }
+            )
             
             return {
                 "success": response.success_count > 0,
@@ -113,6 +150,7 @@ class FirebaseNotificationService:
                 "responses": response.responses
             }
         except Exception as e:
+            logger.warning("Multicast failed", extra={"tokens": len(tokens), "error": str(e)})
             return {"success": False, "error": str(e)}
 
 
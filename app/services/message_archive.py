@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.core.settings import settings
+
+try:
+    import zstandard
+except ImportError:  # Optional, archives fall back to gzip
+    zstandard = None
+
+
+INDEX_FILE = "index.json"
+
+
+class MessageArchive:
+    """Compressed JSONL archive of cold chat messages
+
+    Messages are stored per room and month as `<room_id>/<YYYY-MM>.jsonl.zst` (or `.jsonl.gz`
+    when zstandard isn't installed), oldest first, with a per-room `index.json` listing the
+    months, their files and message counts. The index lets the history API page through a
+    room's archive without opening files it doesn't need.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+    def _room_dir(self, room_id: int) -> Path:
+        return self.base_dir / str(room_id)
+
+    def load_index(self, room_id: int) -> List[Dict[str, Any]]:
+        """Get the archived months of a room, oldest first"""
+        index_path = self._room_dir(room_id) / INDEX_FILE
+        try:
+            with open(index_path) as index_file:
+                return json.load(index_file)
+        except FileNotFoundError:
+            return []
+
+    def _write_atomic(self, path: Path, data: bytes):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+
+    def _compress(self, data: bytes):
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=10).compress(data), ".jsonl.zst"
+        return gzip.compress(data), ".jsonl.gz"
+
+    def _read_file(self, path: Path) -> List[Dict[str, Any]]:
+        with open(path, "rb") as archive_file:
+            data = archive_file.read()
+        if path.name.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    def write_month(self, room_id: int, month: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Archive a room's messages for a month, merging with what is already archived
+
+        Writing the same messages again is a no-op, so an interrupted archive run can
+        simply be repeated.
+        """
+        with self._lock:
+            room_dir = self._room_dir(room_id)
+            room_dir.mkdir(parents=True, exist_ok=True)
+            index = self.load_index(room_id)
+            existing = next((entry for entry in index if entry["month"] == month), None)
+
+            merged = {message["id"]: message for message in messages}
+            if existing:
+                for message in self._read_file(room_dir / existing["file"]):
+                    merged.setdefault(message["id"], message)
+            rows = [merged[message_id] for message_id in sorted(merged)]
+
+            payload = "\n".join(json.dumps(row, default=_json_default) for row in rows).encode()
+            data, extension = self._compress(payload)
+            file_name = f"{month}{extension}"
+            self._write_atomic(room_dir / file_name, data)
+            if existing and existing["file"] != file_name:
+                (room_dir / existing["file"]).unlink(missing_ok=True)
+
+            entry = {
+                "month": month,
+                "file": file_name,
+                "count": len(rows),
+                "min_id": rows[0]["id"] if rows else None,
+                "max_id": rows[-1]["id"] if rows else None,
+            }
+            index = sorted([e for e in index if e["month"] != month] + [entry], key=lambda e: e["month"])
+            self._write_atomic(room_dir / INDEX_FILE, json.dumps(index, indent=2).encode())
+            return entry
+
+    def count_messages(self, room_id: int) -> int:
+        return sum(entry["count"] for entry in self.load_index(room_id))
+
+    def read_messages(self, room_id: int, *, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get archived messages of a room newest first, skipping `skip` of them"""
+        messages: List[Dict[str, Any]] = []
+        room_dir = self._room_dir(room_id)
+        for entry in reversed(self.load_index(room_id)):
+            if len(messages) >= limit:
+                break
+            # Skip whole months without decompressing them
+            if skip >= entry["count"]:
+                skip -= entry["count"]
+                continue
+            rows = self._read_file(room_dir / entry["file"])
+            rows.reverse()
+            messages.extend(rows[skip:skip + limit - len(messages)])
+            skip = 0
+        return messages
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+message_archive = MessageArchive(settings.message_archive_dir)
@@ -0,0 +1,210 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.models.chat import Message
+from app.services.message_archive import MessageArchive, message_archive
+
+
+PARTITION_NAME = re.compile(r"^messages_p(\d{4})_(\d{2})$")
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"messages_p{month.year:04d}_{month.month:02d}"
+
+
+class MessagePartitionService:
+    """Monthly range partitioning of `messages` on created_at (Postgres only)
+
+    Each month lives in its own partition with its own (small) indexes, so the
+    indexes written and probed by live rooms stay the same size as history grows.
+    Old partitions are emptied into the message archive room by room, for rooms that
+    are no longer active, and dropped once empty.
+    """
+
+    def _require_postgres(self, db: Session):
+        if db.get_bind().dialect.name != "postgresql":
+            raise RuntimeError("Message partitioning requires PostgreSQL")
+
+    def _message_columns(self) -> List[str]:
+        # Mapped columns only, the generated search_vector column can't be copied
+        return [column.name for column in Message.__table__.columns]
+
+    def is_partitioned(self, db: Session) -> bool:
+        self._require_postgres(db)
+        relkind = db.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass('messages')")
+        ).scalar()
+        return relkind == "p"
+
+    def list_partitions(self, db: Session) -> List[Dict[str, Any]]:
+        """List partitions with their month, estimated rows and table/index sizes"""
+        self._require_postgres(db)
+        rows = db.execute(text("""
+            SELECT c.relname AS name,
+                   c.reltuples::bigint AS estimated_rows,
+                   pg_table_size(c.oid) AS table_bytes,
+                   pg_indexes_size(c.oid) AS index_bytes
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'messages'::regclass
+            ORDER BY c.relname
+        """)).mappings().all()
+
+        partitions = []
+        for row in rows:
+            match = PARTITION_NAME.match(row["name"])
+            month = datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+            partitions.append({**row, "month": month})
+        return partitions
+
+    def _create_partition(self, db: Session, month: datetime) -> bool:
+        name = _partition_name(month)
+        if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+            return False
+        db.execute(text(
+            f"CREATE TABLE {name} PARTITION OF messages "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+        ))
+        return True
+
+    def ensure_partitions(self, db: Session, *, months_ahead: Optional[int] = None) -> List[str]:
+        """Create the partitions for the current month and the next `months_ahead` months"""
+        self._require_postgres(db)
+        months_ahead = settings.message_partitions_ahead if months_ahead is None else months_ahead
+        current = _month_start(datetime.utcnow())
+        created = []
+        for offset in range(months_ahead + 1):
+            month = _add_months(current, offset)
+            if self._create_partition(db, month):
+                created.append(_partition_name(month))
+        db.commit()
+        return created
+
+    def convert(self, db: Session, *, keep_old: bool = False) -> List[str]:
+        """Convert the plain messages table into a partitioned one, in a single transaction
+
+        Takes an ACCESS EXCLUSIVE lock on messages while rows are copied, run it in a
+        maintenance window. The primary key becomes (id, created_at) since Postgres
+        requires the partition key in unique constraints; ids still come from the same
+        sequence and stay unique.
+        """
+        self._require_postgres(db)
+        if self.is_partitioned(db):
+            return []
+
+        has_search_vector = db.execute(text("""
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'messages' AND column_name = 'search_vector'
+            )
+        """)).scalar()
+        sequence = db.execute(text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+
+        db.execute(text("LOCK TABLE messages IN ACCESS EXCLUSIVE MODE"))
+        oldest = db.execute(text("SELECT min(created_at) FROM messages")).scalar()
+
+        # Free the names of the index backed constraints and indexes for the new table
+        db.execute(text("ALTER TABLE messages RENAME TO messages_unpartitioned"))
+        db.execute(text("ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey"))
+        db.execute(text("ALTER INDEX IF EXISTS ix_messages_room_id_id RENAME TO ix_messages_unpartitioned_room_id_id"))
+        db.execute(text("ALTER INDEX IF EXISTS ix_messages_search_vector RENAME TO ix_messages_unpartitioned_search_vector"))
+
+        db.execute(text(
+            "CREATE TABLE messages (LIKE messages_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        db.execute(text("ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL"))
+        db.execute(text("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (id, created_at)"))
+        for foreign_key in Message.__table__.foreign_keys:
+            db.execute(text(
+                f"ALTER TABLE messages ADD FOREIGN KEY ({foreign_key.parent.name}) "
+                f"REFERENCES {foreign_key.column.table.name}({foreign_key.column.name})"
+            ))
+        db.execute(text("CREATE INDEX ix_messages_room_id_id ON messages (room_id, id)"))
+        if has_search_vector:
+            db.execute(text("CREATE INDEX ix_messages_search_vector ON messages USING GIN (search_vector)"))
+        # Catches rows outside every monthly range (clock skew, missed `ensure` runs)
+        db.execute(text("CREATE TABLE messages_default PARTITION OF messages DEFAULT"))
+
+        current = _month_start(datetime.utcnow())
+        month = _month_start(oldest) if oldest else current
+        last = _add_months(current, settings.message_partitions_ahead)
+        while month <= last:
+            self._create_partition(db, month)
+            month = _add_months(month, 1)
+
+        columns = ", ".join(self._message_columns())
+        db.execute(text(
+            "UPDATE messages_unpartitioned SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL"
+        ))
+        db.execute(text(f"INSERT INTO messages ({columns}) SELECT {columns} FROM messages_unpartitioned"))
+        if sequence:
+            # Keep the id sequence alive when the old table is dropped
+            db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY messages.id"))
+        if not keep_old:
+            db.execute(text("DROP TABLE messages_unpartitioned"))
+        db.commit()
+        return [partition["name"] for partition in self.list_partitions(db)]
+
+    def archive(
+        self, db: Session, *, older_than_months: Optional[int] = None, archive: MessageArchive = message_archive
+    ) -> Dict[str, int]:
+        """Move messages of inactive rooms out of partitions older than the cutoff
+
+        A room counts as inactive when it is closed or has had no activity since the
+        cutoff. Each room is archived and deleted in its own transaction; archiving is
+        idempotent, so an interrupted run can be repeated. Partitions left empty are
+        detached and dropped.
+        """
+        self._require_postgres(db)
+        older_than_months = settings.message_archive_after_months if older_than_months is None else older_than_months
+        cutoff = _add_months(_month_start(datetime.utcnow()), -older_than_months)
+        columns = ", ".join(self._message_columns())
+        stats = {"rooms": 0, "messages": 0, "partitions_dropped": 0}
+
+        for partition in self.list_partitions(db):
+            month = partition["month"]
+            if month is None or _add_months(month, 1) > cutoff:
+                continue
+            name = partition["name"]
+            room_ids = db.execute(text(f"""
+                SELECT DISTINCT m.room_id
+                FROM {name} m
+                JOIN chat_rooms r ON r.id = m.room_id
+                WHERE r.is_active = false OR r.updated_at < :cutoff
+            """), {"cutoff": cutoff}).scalars().all()
+
+            for room_id in room_ids:
+                rows = db.execute(
+                    text(f"SELECT {columns} FROM {name} WHERE room_id = :room_id ORDER BY id"),
+                    {"room_id": room_id}
+                ).mappings().all()
+                archive.write_month(room_id, f"{month:%Y-%m}", [dict(row) for row in rows])
+                db.execute(text(f"DELETE FROM {name} WHERE room_id = :room_id"), {"room_id": room_id})
+                db.commit()
+                stats["rooms"] += 1
+                stats["messages"] += len(rows)
+
+            if not db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+                db.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+                db.commit()
+                stats["partitions_dropped"] += 1
+        return stats
+
+
+message_partition_service = MessagePartitionService()
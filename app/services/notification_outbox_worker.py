@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.settings import settings
+from app.crud.notification_outbox_crud import notification_outbox_crud
+from app.database.session import SessionLocal
+from app.models.notification_outbox import NotificationOutbox
+from app.services.notification_transport import NotificationTransport, TransportResult, notification_transport
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRateLimiter:
+    """Token bucket per device token, so one noisy conversation can't flood a device"""
+
+    def __init__(self, per_minute: int, max_tracked: int = 50000):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.max_tracked = max_tracked
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def acquire(self, token: str) -> float:
+        """Take one send for the token; returns 0 when allowed, otherwise the seconds to wait"""
+        now = time.monotonic()
+        available, updated_at = self._buckets.get(token, (self.capacity, now))
+        available = min(self.capacity, available + (now - updated_at) * self.rate)
+        if available >= 1:
+            self._buckets[token] = (available - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[token] = (available, now)
+            wait = (1 - available) / self.rate
+        if len(self._buckets) > self.max_tracked:
+            self._forget_full_buckets(now)
+        return wait
+
+    def _forget_full_buckets(self, now: float):
+        refill_seconds = self.capacity / self.rate
+        self._buckets = {
+            token: bucket for token, bucket in self._buckets.items() if now - bucket[1] < refill_seconds
+        }
+
+
+class NotificationOutboxWorker:
+    """Pool of asyncio workers draining the notification outbox
+
+    Each worker claims a batch of due rows, sends them through the transport on
+    threads, then records the outcome in one transaction: sent, retried with
+    exponential backoff, or dead-lettered once `max_attempts` is reached or the
+    token is unregistered. Rows over the per-token rate limit are pushed back
+    without using up an attempt.
+    """
+
+    def __init__(
+        self,
+        *,
+        transport: NotificationTransport,
+        workers: int,
+        batch_size: int,
+        poll_interval: float,
+        lease_seconds: int,
+        max_attempts: int,
+        backoff_base: int,
+        backoff_max: int,
+        per_token_per_minute: int,
+    ):
+        self.transport = transport
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenRateLimiter(per_token_per_minute)
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        if not self._tasks:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                processed = 0
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def backoff_seconds(self, attempts: int) -> float:
+        """Exponential backoff with jitter: base * 2^(attempts - 1), capped, randomised down to half"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(0, attempts - 1))
+        return delay / 2 + random.random() * delay / 2
+
+    async def process_batch(self) -> int:
+        """Claim, send and record one batch; returns the number of rows claimed"""
+        rows = await asyncio.to_thread(self._claim)
+        if not rows:
+            return 0
+        outcomes = await asyncio.gather(*(self._deliver(row) for row in rows))
+        await asyncio.to_thread(self._record, outcomes)
+        return len(rows)
+
+    def _claim(self) -> List[NotificationOutbox]:
+        db = SessionLocal()
+        try:
+            return notification_outbox_crud.claim_batch(db, limit=self.batch_size, lease_seconds=self.lease_seconds)
+        finally:
+            db.close()
+
+    async def _deliver(self, row: NotificationOutbox) -> Tuple[NotificationOutbox, Optional[TransportResult], float]:
+        wait = self.rate_limiter.acquire(row.token)
+        if wait:
+            return row, None, wait
+        try:
+            result = await asyncio.to_thread(
+                self.transport.send,
+                token=row.token,
+                title=row.title,
+                body=row.body,
+                data=json.loads(row.data) if row.data else None,
+                collapse_key=row.collapse_key,
+            )
+        except Exception as e:
+            result = TransportResult(success=False, error=str(e))
+        return row, result, 0.0
+
+    def _record(self, outcomes: List[Tuple[NotificationOutbox, Optional[TransportResult], float]]):
+        db = SessionLocal()
+        try:
+            sent_ids = []
+            unregistered_tokens = []
+            for row, result, wait in outcomes:
+                if result is None:
+                    notification_outbox_crud.mark_retry(
+                        db, id=row.id, error="Rate limited", delay_seconds=wait, count_attempt=False
+                    )
+                elif result.success:
+                    sent_ids.append(row.id)
+                elif result.unregistered:
+                    notification_outbox_crud.mark_dead(db, id=row.id, error=result.error)
+                    unregistered_tokens.append(row.token)
+                elif row.attempts >= self.max_attempts:
+                    notification_outbox_crud.mark_dead(db, id=row.id, error=result.error)
+                else:
+                    notification_outbox_crud.mark_retry(
+                        db, id=row.id, error=result.error, delay_seconds=self.backoff_seconds(row.attempts)
+                    )
+            notification_outbox_crud.mark_sent(db, ids=sent_ids)
+            notification_outbox_crud.prune_tokens(db, tokens=unregistered_tokens)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+notification_outbox_worker = NotificationOutboxWorker(
+    transport=notification_transport,
+    workers=settings.outbox_workers,
+    batch_size=settings.outbox_batch_size,
+    poll_interval=settings.outbox_poll_interval_seconds,
+    lease_seconds=settings.outbox_lease_seconds,
+    max_attempts=settings.outbox_max_attempts,
+    backoff_base=settings.outbox_backoff_base_seconds,
+    backoff_max=settings.outbox_backoff_max_seconds,
+    per_token_per_minute=settings.outbox_per_token_per_minute,
+)
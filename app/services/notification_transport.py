@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from app.core.settings import settings
+from app.services.firebase_service import firebase_notification_service
+
+
+@dataclass
+class TransportResult:
+    success: bool
+    error: Optional[str] = None
+    unregistered: bool = False  # The token is gone for good, retrying won't help
+    message_id: Optional[str] = None
+
+
+@dataclass
+class MulticastResult:
+    results: List[TransportResult] = field(default_factory=list)  # One per token, in token order
+
+    @property
+    def success_count(self) -> int:
+        return sum(1 for result in self.results if result.success)
+
+    @property
+    def failure_count(self) -> int:
+        return len(self.results) - self.success_count
+
+
+def _is_unregistered_error(error: Optional[str]) -> bool:
+    error = (error or "").lower()
+    return "not found" in error or "unregistered" in error or "not a valid fcm registration token" in error
+
+
+class NotificationTransport(ABC):
+    """Delivers pushes to device tokens"""
+
+    @abstractmethod
+    def send(
+        self, *, token: str, title: str, body: str, data: Optional[Dict[str, str]] = None, collapse_key: Optional[str] = None
+    ) -> TransportResult:
+        ...
+
+    @abstractmethod
+    def send_multicast(
+        self, *, tokens: List[str], title: str, body: str, data: Optional[Dict[str, str]] = None
+    ) -> MulticastResult:
+        ...
+
+
+class FirebaseNotificationTransport(NotificationTransport):
+    """Delivers pushes through FCM"""
+
+    def send(
+        self, *, token: str, title: str, body: str, data: Optional[Dict[str, str]] = None, collapse_key: Optional[str] = None
+    ) -> TransportResult:
+        result = firebase_notification_service.send_notification(
+            token=token, title=title, body=body, data=data, collapse_key=collapse_key
+        )
+        if result.get("success"):
+            return TransportResult(success=True, message_id=result.get("message_id"))
+        error = result.get("error")
+        return TransportResult(success=False, error=error, unregistered=_is_unregistered_error(error))
+
+    def send_multicast(
+        self, *, tokens: List[str], title: str, body: str, data: Optional[Dict[str, str]] = None
+    ) -> MulticastResult:
+        result = firebase_notification_service.send_multicast_notification(tokens=tokens, title=title, body=body, data=data)
+        responses = result.get("responses")
+        if not responses:
+            # The whole call failed (auth, network), count every token as failed
+            return MulticastResult([TransportResult(success=False, error=result.get("error")) for _ in tokens])
+        results = []
+        for response in responses:
+            if response.success:
+                results.append(TransportResult(success=True, message_id=response.message_id))
+                continue
+            exception = response.exception
+            unregistered = (
+                type(exception).__name__ in ("UnregisteredError", "SenderIdMismatchError")
+                or _is_unregistered_error(str(exception))
+            )
+            results.append(TransportResult(success=False, error=str(exception), unregistered=unregistered))
+        return MulticastResult(results)
+
+
+class LocalStubTransport(NotificationTransport):
+    """Simulates FCM without network access, for local runs, tests and benchmarks
+
+    Every call sleeps for `latency_ms` plus up to `jitter_ms` (a multicast is one call),
+    then each token fails with a retryable error with probability `failure_rate` or as
+    unregistered with probability `unregistered_rate`. Tokens in `failing_tokens` and
+    `unregistered_tokens` always fail that way.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        failure_rate: float = 0.0,
+        unregistered_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.unregistered_rate = unregistered_rate
+        self.failing_tokens: Set[str] = set()
+        self.unregistered_tokens: Set[str] = set()
+        self.sent: List[Dict[str, object]] = []
+        self.calls = 0
+        self.failed = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            delay_ms = self.latency_ms + self._random.random() * self.jitter_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _outcome(
+        self, token: str, title: str, body: str, data: Optional[Dict[str, str]], collapse_key: Optional[str]
+    ) -> TransportResult:
+        with self._lock:
+            roll = self._random.random()
+            if token in self.unregistered_tokens or roll < self.unregistered_rate:
+                self.failed += 1
+                return TransportResult(success=False, error="Requested entity was not found.", unregistered=True)
+            if token in self.failing_tokens or roll < self.unregistered_rate + self.failure_rate:
+                self.failed += 1
+                return TransportResult(success=False, error="Service unavailable")
+            self.sent.append({"token": token, "title": title, "body": body, "data": data or {}, "collapse_key": collapse_key})
+            return TransportResult(success=True, message_id=f"stub-{len(self.sent)}")
+
+    def send(
+        self, *, token: str, title: str, body: str, data: Optional[Dict[str, str]] = None, collapse_key: Optional[str] = None
+    ) -> TransportResult:
+        self._call()
+        return self._outcome(token, title, body, data, collapse_key)
+
+    def send_multicast(
+        self, *, tokens: List[str], title: str, body: str, data: Optional[Dict[str, str]] = None
+    ) -> MulticastResult:
+        self._call()
+        return MulticastResult([self._outcome(token, title, body, data, None) for token in tokens])
+
+    def reset(self):
+        with self._lock:
+            self.sent = []
+            self.calls = 0
+            self.failed = 0
+
+
+def get_notification_transport() -> NotificationTransport:
+    if settings.notification_transport in ("stub", "fake"):
+        return LocalStubTransport(
+            latency_ms=settings.notification_stub_latency_ms,
+            jitter_ms=settings.notification_stub_jitter_ms,
+            failure_rate=settings.notification_stub_failure_rate,
+            unregistered_rate=settings.notification_stub_unregistered_rate,
+        )
+    return FirebaseNotificationTransport()
+
+
+# Shared by the outbox worker and broadcasts
+notification_transport = get_notification_transport()
+
+
+def set_notification_transport(transport: NotificationTransport):
+    """Replace the transport of the outbox worker and broadcasts, e.g. with a stub for load tests"""
+    # Imported here, both modules take their default transport from this one
+    from app.services.broadcast_service import broadcast_service
+    from app.services.notification_outbox_worker import notification_outbox_worker
+
+    global notification_transport
+    notification_transport = transport
+    notification_outbox_worker.transport = transport
+    broadcast_service.transport = transport
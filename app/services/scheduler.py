@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.core.settings import settings
+from app.crud.device_token_crud import device_token_crud
+from app.crud.password_reset_token_crud import password_reset_token_crud
+from app.crud.reward_crud import reward_crud
+from app.crud.scheduled_job_run_crud import scheduled_job_run_crud
+from app.database.advisory_lock import try_advisory_lock
+from app.database.session import SessionLocal, engine
+from app.models.scheduled_job_run import ScheduledJobRun
+from app.services.challenge_leaderboard import challenge_leaderboard
+from app.services.challenge_progress_sweep import challenge_progress_sweep
+from app.services.message_partition_service import message_partition_service
+from app.utils.cron import CronSchedule
+
+logger = logging.getLogger(__name__)
+
+JobFunction = Callable[[], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    schedule: CronSchedule
+    function: JobFunction  # Opens its own sessions; returns stats recorded with the run
+    description: str = ""
+    next_run_at: Optional[datetime] = None
+
+
+class JobScheduler:
+    """Runs maintenance jobs on cron schedules inside every server process
+
+    Every worker ticks through the same schedules, so each due slot is claimed twice
+    over: a per-job advisory lock keeps a job from running on two workers at once, and
+    the unique (job_name, scheduled_for) run row keeps a worker that wakes up late from
+    running a slot another one already did. Jobs run on threads; a job still running
+    when its next slot comes up skips that slot.
+    """
+
+    def __init__(self, *, tick_seconds: float, enabled: bool = True):
+        self.tick_seconds = tick_seconds
+        self.enabled = enabled
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def register(self, name: str, cron: str, function: JobFunction, description: str = ""):
+        self.jobs[name] = ScheduledJob(name=name, schedule=CronSchedule(cron), function=function, description=description)
+
+    async def start(self):
+        if self._task or not self.enabled:
+            return
+        now = datetime.utcnow()
+        for job in self.jobs.values():
+            job.next_run_at = job.schedule.next_after(now)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 30):
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        running = [task for task in self._running.values() if not task.done()]
+        if running:
+            # Job threads can't be interrupted, give them a chance to record their run
+            await asyncio.wait(running, timeout=timeout)
+        self._running = {}
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            self._dispatch_due(datetime.utcnow())
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch_due(self, now: datetime):
+        for job in self.jobs.values():
+            if job.next_run_at is None or job.next_run_at > now:
+                continue
+            scheduled_for = job.next_run_at
+            job.next_run_at = job.schedule.next_after(now)
+            running = self._running.get(job.name)
+            if running and not running.done():
+                logger.warning("Skipping job slot, previous run still going", extra={"job": job.name})
+                continue
+            self._running[job.name] = asyncio.create_task(asyncio.to_thread(self.run_job, job, scheduled_for))
+
+    def run_job(self, job: ScheduledJob, scheduled_for: datetime, triggered_by: str = "schedule") -> Optional[ScheduledJobRun]:
+        """Run a job if no other worker holds it or already ran this slot; returns the recorded run"""
+        with try_advisory_lock(engine, f"scheduled_job:{job.name}") as acquired:
+            if not acquired:
+                logger.info("Job is running on another worker", extra={"job": job.name})
+                return None
+            db = SessionLocal()
+            try:
+                run = scheduled_job_run_crud.start(
+                    db, job_name=job.name, scheduled_for=scheduled_for, worker=self.worker_id, triggered_by=triggered_by
+                )
+                if run is None:
+                    return None
+                try:
+                    result = job.function()
+                except Exception as e:
+                    logger.exception("Job failed", extra={"job": job.name})
+                    return scheduled_job_run_crud.finish(db, run, status="failed", error=str(e))
+                run = scheduled_job_run_crud.finish(db, run, status="succeeded", result=result)
+                logger.info("Job finished", extra={"job": job.name, "duration_ms": run.duration_ms})
+                return run
+            finally:
+                db.close()
+
+    def trigger(self, name: str) -> bool:
+        """Run a job now on a background thread, outside its schedule; False if there's no such job"""
+        job = self.jobs.get(name)
+        if job is None:
+            return False
+        threading.Thread(
+            target=self.run_job, args=(job, datetime.utcnow(), "manual"), daemon=True, name=f"job-{name}"
+        ).start()
+        return True
+
+
+def _expire_rewards() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {"expired": reward_crud.expire_rewards(db)}
+    finally:
+        db.close()
+
+
+def _delete_expired_password_resets() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {"deleted": password_reset_token_crud.delete_expired(db)}
+    finally:
+        db.close()
+
+
+def _prune_stale_device_tokens() -> Dict[str, int]:
+    # FCM keeps accepting sends to tokens of uninstalled apps for a while, so waiting for
+    # an unregistered error alone leaves dead devices in every fan-out
+    db = SessionLocal()
+    try:
+        return {"pruned": device_token_crud.prune_stale(db, older_than_days=settings.device_token_stale_days)}
+    finally:
+        db.close()
+
+
+def _ensure_message_partitions() -> Dict[str, Any]:
+    # Rows past the last monthly partition land in messages_default, whose indexes grow unbounded
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name != "postgresql" or not message_partition_service.is_partitioned(db):
+            return {"skipped": "messages is not partitioned"}
+        return {"created": message_partition_service.ensure_partitions(db)}
+    finally:
+        db.close()
+
+
+def _prune_job_history() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {"deleted": scheduled_job_run_crud.prune(db, older_than_days=settings.scheduler_history_days)}
+    finally:
+        db.close()
+
+
+job_scheduler = JobScheduler(tick_seconds=settings.scheduler_tick_seconds, enabled=settings.scheduler_enabled)
+job_scheduler.register(
+    "challenge_progress_sweep", settings.challenge_sweep_cron, challenge_progress_sweep.run,
+    "Advance active challenges one step and reward the completed ones"
+)
+job_scheduler.register(
+    "challenge_leaderboard_rebuild", settings.challenge_leaderboard_rebuild_cron, challenge_leaderboard.rebuild,
+    "Recount challenge leaderboards from user challenges and reset broken streaks"
+)
+job_scheduler.register(
+    "reward_expiry", settings.reward_expiry_cron, _expire_rewards,
+    "Mark active rewards past their expiry as expired"
+)
+job_scheduler.register(
+    "password_reset_cleanup", settings.password_reset_cleanup_cron, _delete_expired_password_resets,
+    "Delete expired password reset codes"
+)
+job_scheduler.register(
+    "device_token_prune", settings.device_token_prune_cron, _prune_stale_device_tokens,
+    "Delete device tokens not re-registered recently"
+)
+job_scheduler.register(
+    "message_partitions", settings.message_partition_cron, _ensure_message_partitions,
+    "Create the monthly messages partitions for the coming months"
+)
+job_scheduler.register(
+    "job_history_cleanup", settings.scheduler_history_cleanup_cron, _prune_job_history,
+    "Delete old scheduled job run history"
+)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    """Parse one cron field: "*", "5", "1-5", "*/15", "0-30/10" or a comma separated list of those"""
+    values: Set[int] = set()
+    for part in field.split(","):
+        base, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(bound) for bound in base.split("-", 1))
+        else:
+            start = end = int(base)
+            if step > 1:
+                end = high  # "5/15" means every 15 starting at 5
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A standard 5-field cron expression (minute hour day-of-month month day-of-week)
+
+    As in cron, when both day fields are restricted a day matching either one matches.
+    Times are naive UTC, like the rest of the app.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields")
+        self.expression = expression
+        self.minutes = sorted(_parse_field(fields[0], 0, 59))
+        self.hours = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7)}  # 0 and 7 are both Sunday
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        if moment.month not in self.months:
+            return False
+        in_month = moment.day in self.days
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays  # Python counts from Monday, cron from Sunday
+        if self._any_day or self._any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 8):  # Covers Feb 29 and weekday combinations
+            if self._day_matches(candidate):
+                for hour in self.hours:
+                    if hour < candidate.hour:
+                        continue
+                    for minute in self.minutes:
+                        if hour == candidate.hour and minute < candidate.minute:
+                            continue
+                        return candidate.replace(hour=hour, minute=minute)
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
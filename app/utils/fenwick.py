@@ -0,0 +1,75 @@
+from typing import Dict, Hashable, Optional
+
+
+class FenwickTree:
+    """Counts over non-negative integer positions with O(log n) point updates and prefix sums"""
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, position: int, delta: int):
+        if position >= self.size:
+            self._grow(position + 1)
+        index = position + 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, position: int) -> int:
+        """Sum of counts at positions 0..position"""
+        index = min(position, self.size - 1) + 1
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def _grow(self, minimum: int):
+        # Rebuilt in O(n) from the point counts
+        counts = [self.prefix_sum(position) - self.prefix_sum(position - 1) for position in range(self.size)]
+        size = self.size
+        while size < minimum:
+            size *= 2
+        self.size = size
+        self._tree = [0] * (size + 1)
+        for position, count in enumerate(counts):
+            if count:
+                self.add(position, count)
+
+
+class RankIndex:
+    """Score of every member and their rank among all members, higher scores first
+
+    Ranks are competition style (1, 2, 2, 4): one plus the number of members with a
+    strictly higher score, counted in O(log max_score).
+    """
+
+    def __init__(self):
+        self._scores: Dict[Hashable, int] = {}
+        self._counts = FenwickTree()
+
+    def set(self, member: Hashable, score: int):
+        score = max(score, 0)
+        previous = self._scores.get(member)
+        if previous == score:
+            return
+        if previous is not None:
+            self._counts.add(previous, -1)
+        self._scores[member] = score
+        self._counts.add(score, 1)
+
+    def score(self, member: Hashable) -> Optional[int]:
+        return self._scores.get(member)
+
+    def rank(self, member: Hashable) -> Optional[int]:
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self.rank_of_score(score)
+
+    def rank_of_score(self, score: int) -> int:
+        return len(self._scores) - self._counts.prefix_sum(score) + 1
+
+    def __len__(self) -> int:
+        return len(self._scores)
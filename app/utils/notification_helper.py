@@ -2,10 +2,47 @@
 
 from app.schemas.notification_schema import NotificationCreate
 from app.crud.notification_crud import notification_crud
+from app.crud.notification_outbox_crud import notification_outbox_crud
+from app.crud.device_token_crud import device_token_crud
+from app.core.settings import settings
+from app.models.notifications import Notifications
 from app.models.user import User
-from app.services.firebase_service import firebase_notification_service
 import json
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+
+
+def _resolve_tokens(db: Session, target_user: User, tokens: Optional[List[str]]) -> List[str]:
+    if not target_user:
+        raise ValueError("Target user not found")
+
+    # Callers notifying many users can pass the tokens they already loaded
+    if tokens is None:
+        tokens = device_token_crud.get_tokens_for_user(db, user_id=target_user.id)
+    if not tokens and target_user.fcm_token:
+        tokens = [target_user.fcm_token]
+    if not tokens:
+        raise ValueError("Target user has no FCM token")
+    return tokens
+
+
+def _push_data(notification: Notifications, sender: User) -> Dict[str, str]:
+    user_info = {
+        "id": str(sender.id),
+        "username": sender.username,
+        "image_url": sender.image_url or ""
+    }
+    return {
+        "title": notification.title,
+        "body": notification.body,
+        "type": notification.type,
+        "id": str(notification.id),
+        "created_at": notification.created_at.isoformat(),
+        "target_user_id": str(notification.target_user_id),
+        "count": str(notification.group_count or 1),
+        "user": json.dumps(user_info)
+    }
 
 
 def send_notification(
@@ -14,17 +51,12 @@ def send_notification(
     body: str,
     type: str,
     target_user: User,
-    sender: User
+    sender: User,
+    tokens: Optional[List[str]] = None
 ):
-    
-    if not target_user:
-        raise ValueError("Target user not found")
-
-    if not target_user.fcm_token:
-        raise ValueError("Target user has no FCM token")
-    
+    tokens = _resolve_tokens(db, target_user, tokens)
 
-    # Save to DB
+    # Save the notification and its push in one transaction; the outbox worker delivers it
     notification_in = NotificationCreate(
         title=title,
         body=body,
@@ -32,30 +64,97 @@ def send_notification(
         target_user_id=target_user.id,
         sender_id=sender.id
     )
-    notification = notification_crud.create(db, notification_in)
+    notification = notification_crud.create(db, notification_in, commit=False)
 
-    user_info = {
-        "id": str(sender.id),
-        "username": sender.username,
-        "image_url": sender.image_url or ""
-    }
+    data = _push_data(notification, sender)
+    # One push per registered device
+    for token in tokens:
+        notification_outbox_crud.enqueue(
+            db,
+            token=token,
+            title=title,
+            body=body,
+            data=data,
+            notification_id=notification.id
+        )
+    db.commit()
+    db.refresh(notification)
+
+    return notification
 
 
-    firebase_result = firebase_notification_service.send_notification(
-        token=target_user.fcm_token,
-        title=title,
-        body=body,
-        data={
-            "title": notification.title,
-            "body": notification.body,
-            "type": notification.type,
-            "id": str(notification.id),
-            "created_at": notification.created_at.isoformat(),
-            "target_user_id": str(notification.target_user_id),
-            "user": json.dumps(user_info)
-        }
-    )
-    
-    
+def send_coalesced_notification(
+    db: Session,
+    title: str,
+    body: str,
+    type: str,
+    target_user: User,
+    sender: User,
+    group_key: str,
+    tokens: Optional[List[str]] = None,
+    window_seconds: Optional[int] = None,
+    count: int = 1
+):
+    """Send a notification that folds into the recipient's unread one with the same group key
+
+    The first event of a burst saves a notification and queues its pushes `window_seconds`
+    later. Events arriving while the pushes are still queued rewrite them to "N new
+    messages", so a burst costs one row and one push per device. Later events keep folding
+    into the same unread row and send a new push with the group key as FCM collapse key,
+    which replaces the previous one on the device. `count` folds several events at once.
+    """
+    tokens = _resolve_tokens(db, target_user, tokens)
+    if window_seconds is None:
+        window_seconds = settings.chat_push_coalesce_seconds
+
+    created = False
+    notification = notification_crud.get_unread_in_group(db, target_user.id, group_key)
+    while notification is None:
+        notification = notification_crud.create_in_group(db, NotificationCreate(
+            title=title,
+            body=body if count == 1 else f"{count} new messages",
+            type=type,
+            target_user_id=target_user.id,
+            sender_id=sender.id
+        ), group_key=group_key, group_count=count)
+        if notification is not None:
+            created = True
+        else:
+            # A concurrent first event of the group won, fold into its notification
+            notification = notification_crud.get_unread_in_group(db, target_user.id, group_key)
+
+    if created:
+        queued = 0
+    else:
+        notification.group_count += count
+        notification.title = title
+        notification.body = f"{notification.group_count} new messages"
+        notification.sender_id = sender.id
+        notification.created_at = func.now()  # Resurface the folded notification at the top of the inbox
+        db.flush()
+        db.refresh(notification, ["created_at"])  # The database's timestamp, with its offset, for the push
+        queued = notification_outbox_crud.update_pending(
+            db,
+            notification_id=notification.id,
+            title=notification.title,
+            body=notification.body,
+            data=_push_data(notification, sender)
+        )
+
+    if not queued:
+        data = _push_data(notification, sender)
+        for token in tokens:
+            notification_outbox_crud.enqueue(
+                db,
+                token=token,
+                title=notification.title,
+                body=notification.body,
+                data=data,
+                notification_id=notification.id,
+                collapse_key=group_key,
+                delay_seconds=window_seconds
+            )
+    db.commit()
+    db.refresh(notification)
 
     return notification
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the chat WebSocket wire formats (JSON vs MessagePack).
+
+Reports bytes on the wire and CPU time per message for a plain text message and
+for a product message with the embedded product payload, both for decoding and
+validating an inbound frame and for encoding a broadcast frame.
+
+Usage:
+    python bench_chat_wire_format.py [--iterations 20000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+sys.path.append('.')
+
+import msgpack
+
+from app.core.websocket_manager import encode_frame, WIRE_JSON, WIRE_MSGPACK
+from app.models.user import UserRole
+from app.schemas.chat_schema import WSMessage, WSResponse
+from app.schemas.product_schema import ProductOut
+
+
+def sample_product() -> ProductOut:
+    return ProductOut(
+        id=42,
+        name="Lingzhi Black Coffee 2 in 1",
+        sku="DXN-LBC-020",
+        company="DXN",
+        product_group="Beverages",
+        description="Instant coffee blended with Ganoderma extract. " * 4,
+        status="published",
+        category_id=3,
+        category_name="Coffee",
+        image_url="https://cdn.example.com/products/42/image.png",
+        thumbnail_url="https://cdn.example.com/products/42/thumb.png",
+        tags="coffee,ganoderma,beverage",
+        quantity=120,
+        best_seller=True,
+        length=12.5,
+        width=8.0,
+        height=3.2,
+        net_weight=0.42,
+        gross_weight=0.5,
+        volume=0.32,
+        created_at=datetime(2024, 1, 1, 9, 30),
+        updated_at=datetime(2024, 6, 1, 12, 0),
+    )
+
+
+def sample_messages():
+    inbound_text = {"type": "text", "room_id": 1, "sender_id": 7, "sender_role": "user", "content": "Hi, is this in stock?"}
+    inbound_product = {"type": "product", "room_id": 1, "sender_id": 9, "sender_role": "expert", "product_id": 42}
+    outbound_text = WSResponse(
+        type="text", room_id=1, sender_id=7, sender_name="jane", sender_role=UserRole.user,
+        content=inbound_text["content"], timestamp=datetime.utcnow(), message_id=1001,
+    )
+    outbound_product = WSResponse(
+        type="product", room_id=1, sender_id=9, sender_name="expert_ali", sender_role=UserRole.expert,
+        content=None, timestamp=datetime.utcnow(), message_id=1002, product_id=42, product=sample_product(),
+    )
+    return [
+        ("text", inbound_text, outbound_text),
+        ("product", inbound_product, outbound_product),
+    ]
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    """CPU microseconds per call"""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def run(iterations: int):
+    print(f"{'message':<9} {'format':<8} {'in bytes':>9} {'out bytes':>10} {'decode us':>10} {'encode us':>10}")
+    for name, inbound, outbound in sample_messages():
+        json_in = json.dumps(inbound)
+        msgpack_in = msgpack.packb(inbound)
+
+        # Previous path, json.loads then WSMessage(**data), for reference
+        legacy_decode = cpu_per_call(lambda: WSMessage(**json.loads(json_in)), iterations)
+        legacy_encode = cpu_per_call(lambda: outbound.model_dump_json(), iterations)
+        print(
+            f"{name:<9} {'legacy':<8} {len(json_in.encode()):>9} {len(outbound.model_dump_json().encode()):>10} "
+            f"{legacy_decode:>10.2f} {legacy_encode:>10.2f}"
+        )
+
+        for wire_format, frame in ((WIRE_JSON, json_in), (WIRE_MSGPACK, msgpack_in)):
+            if wire_format == WIRE_MSGPACK:
+                decode = lambda: WSMessage.model_validate(msgpack.unpackb(frame))
+            else:
+                decode = lambda: WSMessage.model_validate_json(frame)
+            encoded = encode_frame(outbound, wire_format)
+            out_bytes = len(encoded) if isinstance(encoded, bytes) else len(encoded.encode())
+            in_bytes = len(frame) if isinstance(frame, bytes) else len(frame.encode())
+            decode_us = cpu_per_call(decode, iterations)
+            encode_us = cpu_per_call(lambda: encode_frame(outbound, wire_format), iterations)
+            print(f"{name:<9} {wire_format:<8} {in_bytes:>9} {out_bytes:>10} {decode_us:>10.2f} {encode_us:>10.2f}")
+
+    print("\nBroadcasts are encoded once per format in use, so encode cost is per room, not per recipient.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chat WebSocket wire formats")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Benchmark notification dispatch against the local FCM stub.
+
+Drives the three send paths with the transport set to the latency-simulating stub,
+so dispatch settings can be tuned without touching FCM:
+
+- chat: coalesced chat pushes (bursts per room folded into one notification), then
+  drained by the outbox worker pool
+- single: one notification per call through the outbox, drained the same way
+- broadcast: one broadcast job to every user with a device token, sent as multicasts
+
+Reports throughput, notification rows written and pushes per path. Run it against a
+scratch database (DATABASE_URL): it seeds users and device tokens, and broadcasts go
+to every user with a token.
+
+Usage:
+    python bench_notifications.py --users 2000 --devices 2 --latency-ms 80 --workers 8
+    python bench_notifications.py --paths broadcast --chunk-size 500 --parallel 8 --failure-rate 0.01
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.append('.')
+
+
+def configure(args):
+    """Point the app at the stub before any app module reads the settings"""
+    os.environ["NOTIFICATION_TRANSPORT"] = "stub"
+    os.environ["NOTIFICATION_STUB_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["NOTIFICATION_STUB_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["NOTIFICATION_STUB_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["NOTIFICATION_STUB_UNREGISTERED_RATE"] = str(args.unregistered_rate)
+
+
+def seed(users: int, devices: int, run_id: str):
+    """Create a sender and users with `devices` device tokens each; returns their ids"""
+    from app.database.session import SessionLocal
+    from app.models.device_token import DeviceToken
+    from app.models.user import User, UserRole
+
+    db = SessionLocal()
+    try:
+        sender = User(role=UserRole.expert, username=f"bench_{run_id}_sender")
+        recipients = [User(role=UserRole.user, username=f"bench_{run_id}_{index}") for index in range(users)]
+        db.add(sender)
+        db.add_all(recipients)
+        db.flush()
+        db.add_all([
+            DeviceToken(user_id=user.id, token=f"bench-{run_id}-{user.id}-{device}", platform="android")
+            for user in recipients
+            for device in range(devices)
+        ])
+        db.commit()
+        return sender.id, [user.id for user in recipients]
+    finally:
+        db.close()
+
+
+def outbox_backlog() -> int:
+    from app.crud.notification_outbox_crud import notification_outbox_crud
+    from app.database.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        counts = notification_outbox_crud.count_by_status(db)
+        return counts.get("pending", 0) + counts.get("sending", 0)
+    finally:
+        db.close()
+
+
+async def drain(worker, timeout: float) -> float:
+    """Run the worker pool until the outbox is empty; returns the seconds it took"""
+    started = time.perf_counter()
+    await worker.start()
+    try:
+        while time.perf_counter() - started < timeout:
+            if not await asyncio.to_thread(outbox_backlog):
+                break
+            await asyncio.sleep(0.1)
+    finally:
+        await worker.stop()
+    return time.perf_counter() - started
+
+
+def make_worker(args, transport):
+    from app.services.notification_outbox_worker import NotificationOutboxWorker
+
+    return NotificationOutboxWorker(
+        transport=transport,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        poll_interval=0.05,
+        lease_seconds=60,
+        max_attempts=args.max_attempts,
+        backoff_base=0,  # Retry failures right away so the drain measures dispatch, not backoff
+        backoff_max=0,
+        per_token_per_minute=1_000_000,
+    )
+
+
+def report(name: str, produced: int, enqueue_seconds: float, drain_seconds: float, rows: int, transport):
+    delivered = len(transport.sent)
+    print(f"\n[{name}]")
+    print(f"  events          {produced}")
+    print(f"  notifications   {rows} rows")
+    print(f"  enqueue         {enqueue_seconds:.2f}s ({produced / max(enqueue_seconds, 1e-9):.0f} events/s)")
+    print(f"  drain           {drain_seconds:.2f}s ({delivered / max(drain_seconds, 1e-9):.0f} pushes/s)")
+    print(f"  pushes          {delivered} delivered, {transport.failed} failed attempts, {transport.calls} transport calls")
+
+
+def count_notifications(sender_id: int, type: str) -> int:
+    from app.database.session import SessionLocal
+    from app.models.notifications import Notifications
+
+    db = SessionLocal()
+    try:
+        return db.query(Notifications).filter(Notifications.sender_id == sender_id, Notifications.type == type).count()
+    finally:
+        db.close()
+
+
+def bench_chat(args, transport, sender_id: int, user_ids):
+    """Bursts of chat messages per room, coalesced per (room, recipient)"""
+    from app.database.session import SessionLocal
+    from app.models.user import User
+    from app.utils.notification_helper import send_coalesced_notification
+
+    transport.reset()
+    rooms = user_ids[:args.rooms]
+    db = SessionLocal()
+    try:
+        sender = db.get(User, sender_id)
+        recipients = {user.id: user for user in db.query(User).filter(User.id.in_(rooms)).all()}
+        started = time.perf_counter()
+        for index in range(args.messages):
+            recipient_id = random.choice(rooms)
+            send_coalesced_notification(
+                db=db,
+                title="New message",
+                body=f"Message {index}",
+                type="chat",
+                target_user=recipients[recipient_id],
+                sender=sender,
+                group_key=f"chat:bench-{recipient_id}",
+                window_seconds=args.coalesce_seconds,
+            )
+        enqueue_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    drain_seconds = asyncio.run(drain(make_worker(args, transport), args.timeout))
+    report("chat", args.messages, enqueue_seconds, drain_seconds, count_notifications(sender_id, "chat"), transport)
+
+
+def bench_single(args, transport, sender_id: int, user_ids):
+    """One notification per call, each to all devices of a random user"""
+    from app.database.session import SessionLocal
+    from app.models.user import User
+    from app.utils.notification_helper import send_notification
+
+    transport.reset()
+    db = SessionLocal()
+    try:
+        sender = db.get(User, sender_id)
+        targets = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()}
+        started = time.perf_counter()
+        for index in range(args.singles):
+            send_notification(
+                db=db,
+                title="Bench",
+                body=f"Notification {index}",
+                type="bench",
+                target_user=targets[random.choice(user_ids)],
+                sender=sender,
+            )
+        enqueue_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    drain_seconds = asyncio.run(drain(make_worker(args, transport), args.timeout))
+    report("single", args.singles, enqueue_seconds, drain_seconds, count_notifications(sender_id, "bench"), transport)
+
+
+def bench_broadcast(args, transport, sender_id: int):
+    """One broadcast job, run on this thread"""
+    from app.database.session import SessionLocal
+    from app.models.user import User
+    from app.services.broadcast_service import BroadcastJob, BroadcastService
+
+    transport.reset()
+    db = SessionLocal()
+    try:
+        sender = db.get(User, sender_id)
+        job = BroadcastJob(
+            id=uuid.uuid4().hex, title="Bench", body="Broadcast", role_filter="user",
+            sender_id=sender.id, sender_username=sender.username,
+        )
+    finally:
+        db.close()
+    service = BroadcastService(chunk_size=args.chunk_size, max_parallel=args.parallel, transport=transport)
+    started = time.perf_counter()
+    service.run(job)
+    elapsed = time.perf_counter() - started
+    print("\n[broadcast]")
+    print(f"  status          {job.status}{' (' + job.error + ')' if job.error else ''}")
+    print(f"  recipients      {job.total_targets} users, {job.saved} notification rows")
+    print(f"  elapsed         {elapsed:.2f}s ({(job.sent + job.failed) / max(elapsed, 1e-9):.0f} pushes/s)")
+    print(f"  pushes          {job.sent} sent, {job.failed} failed, {job.invalid_tokens_removed} tokens pruned, "
+          f"{transport.calls} multicasts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification dispatch benchmark against the local FCM stub")
+    parser.add_argument("--paths", default="chat,single,broadcast", help="Comma separated paths to run")
+    parser.add_argument("--users", type=int, default=1000, help="Users to seed")
+    parser.add_argument("--devices", type=int, default=2, help="Device tokens per user")
+    parser.add_argument("--messages", type=int, default=2000, help="Chat messages to send")
+    parser.add_argument("--rooms", type=int, default=100, help="Rooms (recipients) the chat messages go to")
+    parser.add_argument("--coalesce-seconds", type=float, default=1, help="Chat push coalescing window")
+    parser.add_argument("--singles", type=int, default=500, help="Single notifications to send")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated FCM round trip")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of sends failing with a retryable error")
+    parser.add_argument("--unregistered-rate", type=float, default=0.0, help="Share of sends answered as unregistered")
+    parser.add_argument("--workers", type=int, default=4, help="Outbox workers")
+    parser.add_argument("--batch-size", type=int, default=50, help="Outbox rows claimed per batch")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=500, help="Broadcast users per chunk")
+    parser.add_argument("--parallel", type=int, default=4, help="Broadcast multicasts in flight")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the outbox to drain")
+    args = parser.parse_args()
+    configure(args)
+
+    import app.models  # noqa: F401
+    from app.database.base import Base
+    from app.database.session import engine
+    from app.services.notification_transport import get_notification_transport
+
+    Base.metadata.create_all(bind=engine)
+    transport = get_notification_transport()
+    run_id = uuid.uuid4().hex[:8]
+    sender_id, user_ids = seed(args.users, args.devices, run_id)
+    print(f"Seeded {len(user_ids)} users x {args.devices} devices (run {run_id}); "
+          f"stub latency {args.latency_ms}ms +{args.jitter_ms}ms, failure {args.failure_rate}, "
+          f"unregistered {args.unregistered_rate}")
+
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    if "chat" in paths:
+        bench_chat(args, transport, sender_id, user_ids)
+    if "single" in paths:
+        bench_single(args, transport, sender_id, user_ids)
+    if "broadcast" in paths:
+        bench_broadcast(args, transport, sender_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load test for the chat WebSocket fan-out (ConnectionManager + message persistence).
+
+Opens N simulated clients across M rooms, sends text messages at a fixed rate and
+measures end-to-end delivery latency (send -> broadcast received by every client in
+the room), dropped frames, CPU and memory per connection.
+
+By default the app is served by uvicorn in a background thread of this process, with
+FCM stubbed out. Pass --url to target a separately started server instead (FCM is
+then whatever that server is configured with); the server must share DATABASE_URL and
+SECRET_KEY with this script since clients are seeded and authenticated directly.
+
+Every room gets a user and an expert; clients beyond two per room connect as admins.
+
+Usage:
+    python load_test_chat.py --clients 2000 --rooms 500 --rate 0.2 --duration 60
+    python load_test_chat.py --url ws://127.0.0.1:8000 --clients 500 --wire-format msgpack
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+sys.path.append('.')
+
+import httpx
+import websockets
+
+from app.core.security import create_access_token
+from app.database.session import SessionLocal
+from app.models.chat import ChatRoom
+from app.models.user import User, UserRole
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def raise_file_limit(clients: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, clients * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def seed(clients: int, rooms: int, run_id: str):
+    """Create rooms (user + expert each) and admins for the extra clients
+
+    Returns the admin id and a list of (room_id, user_id, role) client slots.
+    """
+    db = SessionLocal()
+    try:
+        admin = User(role=UserRole.admin, username=f"loadtest_{run_id}_admin")
+        db.add(admin)
+        room_members = []
+        for index in range(rooms):
+            user = User(role=UserRole.user, username=f"loadtest_{run_id}_user_{index}", fcm_token=f"loadtest-{run_id}-{index}")
+            expert = User(role=UserRole.expert, username=f"loadtest_{run_id}_expert_{index}")
+            db.add_all([user, expert])
+            room_members.append((user, expert))
+        db.flush()
+
+        chat_rooms = []
+        for user, expert in room_members:
+            room = ChatRoom(name=f"loadtest_{run_id}", user_id=user.id, expert_id=expert.id)
+            db.add(room)
+            chat_rooms.append(room)
+        db.flush()
+
+        slots = []
+        for index in range(clients):
+            room_index = index % rooms
+            user, expert = room_members[room_index]
+            room_id = chat_rooms[room_index].id
+            occupant = index // rooms
+            if occupant == 0:
+                slots.append((room_id, user.id, UserRole.user.value))
+            elif occupant == 1:
+                slots.append((room_id, expert.id, UserRole.expert.value))
+            else:
+                slots.append((room_id, admin.id, UserRole.admin.value))
+        db.commit()
+        return admin.id, slots
+    finally:
+        db.close()
+
+
+def start_in_process_server():
+    """Serve the app with uvicorn in a daemon thread, with FCM stubbed
+
+    Returns the base URL, the server, its thread and the stub transport.
+    """
+    import uvicorn
+    import main
+    from app.services.notification_transport import LocalStubTransport, set_notification_transport
+
+    # Pushes are delivered by the outbox worker, which sends through the shared transport
+    transport = LocalStubTransport()
+    set_notification_transport(transport)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"ws://127.0.0.1:{port}", server, thread, transport
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.expected = 0
+        self.received = 0
+        self.errors = 0
+        self.connect_failures = 0
+        self.latencies = []
+
+
+class Client:
+    def __init__(self, index: int, room_id: int, user_id: int, role: str, wire_format: str, stats: Stats):
+        self.index = index
+        self.room_id = room_id
+        self.user_id = user_id
+        self.role = role
+        self.wire_format = wire_format
+        self.stats = stats
+        self.websocket = None
+        self.sequence = 0
+
+    def encode(self, payload: dict):
+        return msgpack.packb(payload) if self.wire_format == "msgpack" else json.dumps(payload)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame) if isinstance(frame, bytes) else json.loads(frame)
+
+    async def connect(self, base_url: str):
+        subprotocols = ["msgpack"] if self.wire_format == "msgpack" else None
+        self.websocket = await websockets.connect(
+            f"{base_url}/api/chat/ws/{self.room_id}/{self.user_id}",
+            subprotocols=subprotocols,
+            ping_interval=None,
+            max_queue=None,
+        )
+
+    async def receive_loop(self):
+        try:
+            async for frame in self.websocket:
+                payload = self.decode(frame)
+                frame_type = payload.get("type")
+                if frame_type == "ping":
+                    await self.websocket.send(self.encode({"type": "pong"}))
+                elif "error" in payload:
+                    self.stats.errors += 1
+                elif frame_type == "text" and payload.get("content", "").startswith("lt:"):
+                    sent_at = int(payload["content"].split(":")[3])
+                    self.stats.latencies.append((time.perf_counter_ns() - sent_at) / 1e6)
+                    self.stats.received += 1
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send_loop(self, rate: float, until: float, room_size: int):
+        if rate <= 0:
+            return
+        interval = 1 / rate
+        await asyncio.sleep(random.random() * interval)  # Spread clients over the interval
+        while time.monotonic() < until:
+            self.sequence += 1
+            content = f"lt:{self.index}:{self.sequence}:{time.perf_counter_ns()}"
+            try:
+                await self.websocket.send(self.encode({
+                    "type": "text",
+                    "room_id": self.room_id,
+                    "sender_id": self.user_id,
+                    "sender_role": self.role,
+                    "content": content,
+                }))
+            except websockets.ConnectionClosed:
+                return
+            self.stats.sent += 1
+            self.stats.expected += room_size
+            await asyncio.sleep(interval)
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args):
+    raise_file_limit(args.clients)
+    base_url = args.url
+    server = thread = transport = None
+    if base_url is None:
+        base_url, server, thread, transport = start_in_process_server()
+        print(f"Serving the app in-process at {base_url} (FCM stubbed)")
+
+    run_id = uuid.uuid4().hex[:8]
+    admin_id, slots = seed(args.clients, args.rooms, run_id)
+    http_url = base_url.replace("ws://", "http://").replace("wss://", "https://")
+
+    stats = Stats()
+    clients = [Client(index, *slot, args.wire_format, stats) for index, slot in enumerate(slots)]
+    room_sizes = {}
+    for room_id, _, _ in slots:
+        room_sizes[room_id] = room_sizes.get(room_id, 0) + 1
+
+    rss_before, cpu_before = rss_bytes(), cpu_seconds()
+    connect_started = time.perf_counter()
+    for start in range(0, len(clients), args.connect_batch):
+        batch = clients[start:start + args.connect_batch]
+        results = await asyncio.gather(*(client.connect(base_url) for client in batch), return_exceptions=True)
+        stats.connect_failures += sum(1 for result in results if isinstance(result, Exception))
+    connected = [client for client in clients if client.websocket is not None]
+    connect_seconds = time.perf_counter() - connect_started
+    rss_connected = rss_bytes()
+    print(f"Connected {len(connected)}/{len(clients)} clients in {connect_seconds:.1f}s")
+
+    receivers = [asyncio.create_task(client.receive_loop()) for client in connected]
+    until = time.monotonic() + args.duration
+    cpu_load_start = cpu_seconds()
+    await asyncio.gather(*(client.send_loop(args.rate, until, room_sizes[client.room_id]) for client in connected))
+    await asyncio.sleep(args.drain)  # Let in-flight broadcasts arrive
+    cpu_load = cpu_seconds() - cpu_load_start
+
+    server_stats = None
+    try:
+        response = httpx.get(
+            f"{http_url}/api/chat/admin/connections",
+            headers={"Authorization": f"Bearer {create_access_token(admin_id)}"},
+            timeout=10,
+        )
+        server_stats = response.json().get("data")
+    except httpx.HTTPError as e:
+        print(f"Could not read server connection stats: {e}")
+
+    for client in connected:
+        await client.websocket.close()
+    for task in receivers:
+        task.cancel()
+    if server is not None:
+        # Shut down through the lifespan, so the outbox worker and scheduler stop before the process does
+        server.should_exit = True
+        await asyncio.to_thread(thread.join, 10)
+
+    latencies = stats.latencies
+    dropped = max(0, stats.expected - stats.received)
+    print("\nResults")
+    print(f"  clients / rooms         {len(connected)} / {args.rooms}  ({args.wire_format})")
+    print(f"  messages sent           {stats.sent} ({stats.sent / args.duration:.1f}/s)")
+    print(f"  deliveries              {stats.received}/{stats.expected} ({stats.received / args.duration:.1f}/s)")
+    print(f"  dropped frames          {dropped} ({dropped / stats.expected * 100 if stats.expected else 0:.2f}%)")
+    print(f"  error frames            {stats.errors}, connect failures {stats.connect_failures}")
+    if latencies:
+        print(
+            f"  latency ms              p50 {percentile(latencies, 0.5):.1f}  p90 {percentile(latencies, 0.9):.1f}  "
+            f"p99 {percentile(latencies, 0.99):.1f}  max {max(latencies):.1f}  mean {statistics.mean(latencies):.1f}"
+        )
+    if connected:
+        print(f"  RSS per connection      {(rss_connected - rss_before) / len(connected) / 1024:.1f} KiB"
+              + ("" if args.url is None else " (client side only)"))
+        if stats.received:
+            print(f"  CPU per delivery        {cpu_load / stats.received * 1e6:.0f} us"
+                  + (" (server + load generator)" if args.url is None else " (load generator only)"))
+    print(f"  process CPU             {cpu_seconds() - cpu_before:.1f}s")
+    if transport is not None:
+        print(f"  pushes (stubbed)        {len(transport.sent)} sent, {transport.failed} failed")
+    if server_stats:
+        print(f"  server connection stats {json.dumps(server_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat WebSocket load test")
+    parser.add_argument("--clients", type=int, default=200, help="Number of simulated clients")
+    parser.add_argument("--rooms", type=int, default=100, help="Number of chat rooms")
+    parser.add_argument("--rate", type=float, default=0.5, help="Messages per second per client")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of sending")
+    parser.add_argument("--drain", type=float, default=3, help="Seconds to wait for in-flight frames")
+    parser.add_argument("--connect-batch", type=int, default=200, help="Clients connected concurrently")
+    parser.add_argument("--wire-format", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--url", default=None, help="Base ws:// URL of a running server (default: in-process)")
+    args = parser.parse_args()
+    if args.wire_format == "msgpack" and msgpack is None:
+        parser.error("msgpack is not installed")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
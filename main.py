@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -18,19 +20,43 @@ from app.api.v1.routes import (
     fact,
     challenge,
     wellness,
+    campaign,
+    jobs,
 )
 from app.database.base import Base
 from app.database.session import engine
 import app.models  # Add this line
+from app.core.logger import setup_logging, shutdown_logging
+from app.services.notification_outbox_worker import notification_outbox_worker
+from app.core.websocket_manager import manager
+from app.services.scheduler import job_scheduler
+from app.services.campaign_service import campaign_runner
 
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    # Background workers run for the lifetime of each server process
+    await notification_outbox_worker.start()
+    await job_scheduler.start()
+    await campaign_runner.start()  # Also resumes campaigns interrupted by a restart
+    yield
+    await manager.flush_pending_pushes()  # Chat pushes still in their coalescing window
+    await campaign_runner.stop()
+    await job_scheduler.stop()
+    await notification_outbox_worker.stop()
+    shutdown_logging()  # Flushes what the workers logged on the way out
+
+
 app = FastAPI(title="Health & Wellness App API",
  version="1.0.0",
  docs_url="/api/docs",
- openapi_url="/api/openapi.json"
+ openapi_url="/api/openapi.json",
+ lifespan=lifespan
  )
 
 # Add CORS middleware
@@ -50,6 +76,8 @@ app.include_router(product.router,prefix="/api")
 app.include_router(category.router, prefix='/api')
 app.include_router(feed.router, prefix='/api')
 app.include_router(notification.router, prefix='/api')
+app.include_router(campaign.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 app.include_router(expert.router, prefix='/api')
 app.include_router(dxn_directory.router, prefix="/api")
 app.include_router(referral.router, prefix="/api")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Maintenance command for the monthly partitions of the messages table (PostgreSQL).
+
+    python manage_message_partitions.py convert [--keep-old]   # one-off, in a maintenance window
+    python manage_message_partitions.py ensure [--ahead 3]     # create upcoming monthly partitions (also a monthly scheduled job)
+    python manage_message_partitions.py archive [--older-than-months 6]
+    python manage_message_partitions.py status
+
+`archive` moves messages of inactive rooms out of old partitions into compressed
+files under MESSAGE_ARCHIVE_DIR (read back transparently by the chat history API)
+and drops partitions that end up empty.
+"""
+
+import argparse
+import sys
+
+sys.path.append('.')
+
+from app.database.session import SessionLocal
+from app.services.message_partition_service import message_partition_service
+
+
+def print_status(db):
+    if not message_partition_service.is_partitioned(db):
+        print("messages is not partitioned, run `convert` first")
+        return
+    print(f"{'partition':<22} {'rows (est.)':>12} {'table MB':>10} {'index MB':>10}")
+    for partition in message_partition_service.list_partitions(db):
+        print(
+            f"{partition['name']:<22} {partition['estimated_rows']:>12} "
+            f"{partition['table_bytes'] / 2**20:>10.1f} {partition['index_bytes'] / 2**20:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the messages table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert messages into a partitioned table")
+    convert_parser.add_argument("--keep-old", action="store_true", help="Keep the old table as messages_unpartitioned")
+
+    ensure_parser = subparsers.add_parser("ensure", help="Create partitions for upcoming months")
+    ensure_parser.add_argument("--ahead", type=int, default=None)
+
+    archive_parser = subparsers.add_parser("archive", help="Archive old partitions of inactive rooms")
+    archive_parser.add_argument("--older-than-months", type=int, default=None)
+
+    subparsers.add_parser("status", help="Show partitions and their sizes")
+
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command == "convert":
+            partitions = message_partition_service.convert(db, keep_old=args.keep_old)
+            print(f"Converted messages into {len(partitions)} partitions" if partitions else "Already partitioned")
+        elif args.command == "ensure":
+            created = message_partition_service.ensure_partitions(db, months_ahead=args.ahead)
+            print(f"Created partitions: {', '.join(created)}" if created else "All partitions already exist")
+        elif args.command == "archive":
+            stats = message_partition_service.archive(db, older_than_months=args.older_than_months)
+            print(
+                f"Archived {stats['messages']} messages from {stats['rooms']} room/month(s), "
+                f"dropped {stats['partitions_dropped']} partition(s)"
+            )
+        else:
+            print_status(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+-- Migration script for the in-memory challenge catalog version
+
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    name VARCHAR PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Bumped by every challenge create, update and delete; workers reload their copy when it changes
+INSERT INTO catalog_versions (name, version) VALUES ('challenges', 1) ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,34 @@
+-- Migration script for challenge leaderboards
+
+CREATE TABLE IF NOT EXISTS challenge_rankings (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    scope VARCHAR NOT NULL, -- challenge type or 'global'
+    completions INTEGER NOT NULL DEFAULT 0,
+    progress INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    last_active_date DATE,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, scope)
+);
+
+-- Top-N lists are read backwards off these
+CREATE INDEX IF NOT EXISTS ix_challenge_rankings_scope_completions ON challenge_rankings(scope, completions, user_id);
+CREATE INDEX IF NOT EXISTS ix_challenge_rankings_scope_current_streak ON challenge_rankings(scope, current_streak, user_id);
+CREATE INDEX IF NOT EXISTS ix_challenge_rankings_scope_progress ON challenge_rankings(scope, progress, user_id);
+-- Workers sync their in-memory ranks from the rows changed since their last sync
+CREATE INDEX IF NOT EXISTS ix_challenge_rankings_updated_at ON challenge_rankings(updated_at);
+
+-- Backfill completions and progress; streaks start from the next progress update
+INSERT INTO challenge_rankings (user_id, scope, completions, progress)
+SELECT uc.user_id, c.type::text, COUNT(*) FILTER (WHERE uc.status = 'completed'), COALESCE(SUM(uc.current_progress), 0)
+FROM user_challenges uc JOIN challenges c ON c.id = uc.challenge_id
+WHERE uc.current_progress > 0 OR uc.status = 'completed'
+GROUP BY uc.user_id, c.type
+ON CONFLICT (user_id, scope) DO NOTHING;
+
+INSERT INTO challenge_rankings (user_id, scope, completions, progress)
+SELECT uc.user_id, 'global', COUNT(*) FILTER (WHERE uc.status = 'completed'), COALESCE(SUM(uc.current_progress), 0)
+FROM user_challenges uc
+WHERE uc.current_progress > 0 OR uc.status = 'completed'
+GROUP BY uc.user_id
+ON CONFLICT (user_id, scope) DO NOTHING;
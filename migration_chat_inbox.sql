@@ -0,0 +1,5 @@
+-- Migration script for the chat inbox
+
+-- Inbox keyset paging by most recent activity
+CREATE INDEX IF NOT EXISTS ix_chat_rooms_expert_active_updated ON chat_rooms(expert_id, is_active, updated_at, id);
+CREATE INDEX IF NOT EXISTS ix_chat_rooms_active_updated ON chat_rooms(is_active, updated_at, id);
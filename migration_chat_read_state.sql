@@ -0,0 +1,30 @@
+-- Migration script for chat read watermarks
+
+-- Per-user, per-room read watermark
+CREATE TABLE IF NOT EXISTS chat_read_states (
+    room_id INTEGER NOT NULL REFERENCES chat_rooms(id),
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    last_read_message_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (room_id, user_id)
+);
+
+-- Tables created before the cascade was added: a user's watermarks go with the user
+ALTER TABLE chat_read_states
+    DROP CONSTRAINT IF EXISTS chat_read_states_user_id_fkey,
+    ADD CONSTRAINT chat_read_states_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+-- Room history and unread counts above a watermark
+CREATE INDEX IF NOT EXISTS ix_messages_room_id_id ON messages(room_id, id);
+
+-- Seed watermarks from the legacy per-message is_read flags
+INSERT INTO chat_read_states (room_id, user_id, last_read_message_id, updated_at)
+SELECT p.room_id, p.user_id, MAX(m.id), NOW()
+FROM (
+    SELECT id AS room_id, user_id FROM chat_rooms
+    UNION
+    SELECT id AS room_id, expert_id AS user_id FROM chat_rooms WHERE expert_id IS NOT NULL
+) p
+JOIN messages m ON m.room_id = p.room_id AND m.sender_id <> p.user_id AND m.is_read = TRUE
+GROUP BY p.room_id, p.user_id
+ON CONFLICT (room_id, user_id) DO NOTHING;
@@ -0,0 +1,13 @@
+-- Migration script for chat full-text search (Postgres)
+
+-- Search vector over text messages, maintained by Postgres on insert/update.
+-- Adding a stored generated column rewrites the table, run it off-peak.
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', CASE WHEN type = 'text' THEN content ELSE '' END)) STORED;
+
+-- Use CREATE INDEX CONCURRENTLY outside a transaction on a busy database
+CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector);
+
+-- Local SQLite databases created before this change need the FTS5 table, triggers
+-- (see MESSAGE_SEARCH_DDL in app/models/chat.py) and a one-off backfill:
+--   INSERT INTO messages_fts(messages_fts) VALUES ('rebuild');
@@ -0,0 +1,25 @@
+-- Migration script for the multi-device FCM token registry
+
+CREATE TABLE IF NOT EXISTS device_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token VARCHAR NOT NULL UNIQUE,
+    platform VARCHAR,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_seen_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Tables created before the cascade was added: a user's devices go with the user
+ALTER TABLE device_tokens
+    DROP CONSTRAINT IF EXISTS device_tokens_user_id_fkey,
+    ADD CONSTRAINT device_tokens_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS ix_device_tokens_user_id ON device_tokens(user_id);
+CREATE INDEX IF NOT EXISTS ix_device_tokens_last_seen_at ON device_tokens(last_seen_at);
+
+-- Seed the registry with the single token each user had so far
+INSERT INTO device_tokens (user_id, token, created_at, last_seen_at)
+SELECT id, fcm_token, NOW(), NOW()
+FROM users
+WHERE fcm_token IS NOT NULL AND fcm_token <> ''
+ON CONFLICT (token) DO NOTHING;
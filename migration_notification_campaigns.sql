@@ -0,0 +1,36 @@
+-- Migration script for segmented notification campaigns
+
+CREATE TABLE IF NOT EXISTS notification_campaigns (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    title VARCHAR NOT NULL,
+    body VARCHAR NOT NULL,
+    segment TEXT NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'draft',
+    rate_per_minute INTEGER NOT NULL,
+    created_by INTEGER REFERENCES users(id),
+    cursor_user_id INTEGER NOT NULL DEFAULT 0,
+    total_targets INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    enqueued INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    retries INTEGER NOT NULL DEFAULT 0,
+    locked_by VARCHAR,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+ALTER TABLE notification_campaigns ADD COLUMN IF NOT EXISTS retries INTEGER NOT NULL DEFAULT 0;
+
+-- Runners look for running campaigns whose lease is free or expired
+CREATE INDEX IF NOT EXISTS ix_notification_campaigns_status_locked_until ON notification_campaigns(status, locked_until);
+
+-- Delivery stats per campaign
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS campaign_id INTEGER REFERENCES notification_campaigns(id);
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_campaign_id ON notification_outbox(campaign_id);
+
+-- Segment conditions
+CREATE INDEX IF NOT EXISTS ix_users_country_code ON users(country_code);
+CREATE INDEX IF NOT EXISTS ix_user_challenges_user_id_status ON user_challenges(user_id, status);
@@ -0,0 +1,26 @@
+-- Migration script for notification read state and unread counters
+
+-- Existing notifications start out read so badges don't jump to the whole history
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS is_read BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE notifications ALTER COLUMN is_read SET DEFAULT FALSE;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS read_at TIMESTAMP WITH TIME ZONE;
+
+-- A user's notifications, newest first, keyset-paged on (created_at, id)
+CREATE INDEX IF NOT EXISTS ix_notifications_target_user_created_at ON notifications(target_user_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS notification_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Tables created before the cascade was added: a user's counter goes with the user
+ALTER TABLE notification_counters
+    DROP CONSTRAINT IF EXISTS notification_counters_user_id_fkey,
+    ADD CONSTRAINT notification_counters_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+INSERT INTO notification_counters (user_id, unread_count)
+SELECT target_user_id, COUNT(*)
+FROM notifications
+WHERE is_read = FALSE
+GROUP BY target_user_id
+ON CONFLICT (user_id) DO UPDATE SET unread_count = EXCLUDED.unread_count;
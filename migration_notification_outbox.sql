@@ -0,0 +1,20 @@
+-- Migration script for the notification outbox
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id SERIAL PRIMARY KEY,
+    notification_id INTEGER REFERENCES notifications(id),
+    token VARCHAR NOT NULL,
+    title VARCHAR NOT NULL,
+    body VARCHAR NOT NULL,
+    data TEXT,
+    status VARCHAR NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    sent_at TIMESTAMP
+);
+
+-- Workers claim due rows by status and next_attempt_at
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_status_next_attempt ON notification_outbox(status, next_attempt_at);
@@ -0,0 +1,20 @@
+-- Migration script for coalesced chat pushes
+
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS group_key VARCHAR;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS group_count INTEGER NOT NULL DEFAULT 1;
+
+-- Finds the recipient's unread notification of a group to fold a new event into, and keeps
+-- it unique so concurrent first events of a group can't both create one.
+-- Duplicates created before the index stay unread but no longer fold.
+UPDATE notifications n SET group_key = NULL
+WHERE n.is_read = false AND n.group_key IS NOT NULL
+  AND EXISTS (
+    SELECT 1 FROM notifications newer
+    WHERE newer.target_user_id = n.target_user_id AND newer.group_key = n.group_key
+      AND newer.is_read = false AND newer.id > n.id
+  );
+DROP INDEX IF EXISTS ix_notifications_target_user_group_key;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_notifications_target_user_unread_group ON notifications(target_user_id, group_key)
+    WHERE is_read = false AND group_key IS NOT NULL;
+
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS collapse_key VARCHAR;
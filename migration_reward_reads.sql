@@ -0,0 +1,4 @@
+-- Migration script for side-effect free reward reads
+
+-- Active rewards of a user, read by the reward summaries
+CREATE INDEX IF NOT EXISTS ix_user_rewards_user_id_status_expires_at ON user_rewards(user_id, status, expires_at);
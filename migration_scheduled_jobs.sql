@@ -0,0 +1,19 @@
+-- Migration script for the scheduled job run history
+
+CREATE TABLE IF NOT EXISTS scheduled_job_runs (
+    id SERIAL PRIMARY KEY,
+    job_name VARCHAR NOT NULL,
+    scheduled_for TIMESTAMP NOT NULL,
+    triggered_by VARCHAR NOT NULL DEFAULT 'schedule',
+    status VARCHAR NOT NULL DEFAULT 'running',
+    worker VARCHAR,
+    result TEXT,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    duration_ms INTEGER,
+    -- A slot runs once even when several workers wake up for it
+    CONSTRAINT uq_scheduled_job_runs_job_name_scheduled_for UNIQUE (job_name, scheduled_for)
+);
+
+CREATE INDEX IF NOT EXISTS ix_scheduled_job_runs_job_name_started_at ON scheduled_job_runs(job_name, started_at);